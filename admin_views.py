@@ -1,78 +1,217 @@
 # admin_views.py
-# Handles admin interactions: view sales and manage discounts
+# Handles admin interactions: sales dashboard and discount management
 
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, ttk
 from datetime import datetime
+import metrics
+from discount_rules import DEFAULT_GROUP
 from gui_functions import clear_screen
+from virtual_list import VirtualList
 
 # Display the main admin menu with report and discount actions
-# tm: TicketManager instance; dm: DataManager instance
+# service: BookingService instance
 
-def show_admin_menu(admin, root, tm, dm):
+def show_admin_menu(admin, root, service):
     clear_screen(root)
     tk.Label(root, text=f"Admin: {admin.get_name()}", font=("Arial", 16)).pack(pady=10)
     tk.Button(
-        root, text="View Sales Report",
-        command=lambda: view_sales_report(root, tm)
+        root, text="Sales Dashboard",
+        command=lambda: view_sales_dashboard(admin, root, service)
     ).pack(pady=5)
     tk.Button(
         root, text="Manage Discounts",
-        command=lambda: manage_discounts(admin, root, tm, dm)
+        command=lambda: manage_discounts(admin, root, service)
     ).pack(pady=5)
     tk.Button(
         root, text="Logout",
         command=lambda: root.destroy()
     ).pack(pady=20)
 
-# Show a detailed sales report in a popup
+# Sales dashboard: one breakdown at a time in a scrollable table. The
+# figures are pre-aggregated as sales are recorded, so opening it does not
+# scan the sales history.
 
-def view_sales_report(root, tm):
+DASHBOARD_VIEWS = {
+    "Revenue by day": ("by_day", "Date"),
+    "Revenue by event": ("by_event", "Event"),
+    "Revenue by ticket type": ("by_ticket_type", "Ticket type"),
+    "Revenue by payment method": ("by_payment_method", "Payment method"),
+    "Discount usage": ("by_discount", "Discount"),
+}
+
+
+def view_sales_dashboard(admin, root, service):
     try:
-        sales = tm.get_sales_report()
-        if not sales:
-            raise ValueError("No sales data available.")
-        report = "\n".join([f"{date}: {count} tickets" for date, count in sales.items()])
-        messagebox.showinfo("Sales Report", report)
-    except ValueError as ve:
-        messagebox.showwarning("No Data", str(ve))
+        data = service.dashboard()
     except Exception as e:
-        messagebox.showerror("Error", f"Unable to load sales report: {e}")
+        messagebox.showerror("Error", f"Unable to load sales dashboard: {e}")
+        return
+    if not data["tickets"]:
+        messagebox.showwarning("No Data", "No sales data available.")
+        return
+
+    clear_screen(root)
+    tk.Label(root, text="Sales Dashboard", font=("Arial", 14)).pack(pady=10)
+    tk.Label(root, text=f"{data['tickets']} tickets | AED {data['revenue']:.2f}").pack()
+
+    view_var = tk.StringVar(value=next(iter(DASHBOARD_VIEWS)))
+    tk.OptionMenu(root, view_var, *DASHBOARD_VIEWS).pack(pady=5)
+
+    frame = tk.Frame(root)
+    frame.pack(fill="both", expand=True, padx=10)
+    table = ttk.Treeview(frame, columns=("name", "tickets", "revenue"), show="headings", height=10)
+    table.column("tickets", width=80, anchor="e")
+    table.column("revenue", width=110, anchor="e")
+    table.heading("tickets", text="Tickets")
+    table.heading("revenue", text="Revenue (AED)")
+    scrollbar = ttk.Scrollbar(frame, orient="vertical", command=table.yview)
+    table.configure(yscrollcommand=scrollbar.set)
+    table.pack(side="left", fill="both", expand=True)
+    scrollbar.pack(side="right", fill="y")
+
+    def show(*_):
+        key, heading = DASHBOARD_VIEWS[view_var.get()]
+        table.heading("name", text=heading)
+        table.delete(*table.get_children())
+        if key == "by_day":
+            rows = [(d["date"], d["tickets"], d["revenue"]) for d in data["by_day"]]
+        else:
+            rows = sorted((name, t["tickets"], t["revenue"]) for name, t in data[key].items())
+        for name, tickets, revenue in rows:
+            if not name:
+                name = "No discount" if key == "by_discount" else "Unspecified"
+            # Days from the old daily counts have no revenue recorded
+            table.insert("", "end", values=(name, tickets, "n/a" if revenue is None else f"{revenue:.2f}"))
+
+    view_var.trace_add("write", show)
+    show()
+
+    tk.Button(
+        root,
+        text="Back to Menu",
+        command=lambda: show_admin_menu(admin, root, service)
+    ).pack(pady=15)
 
-# GUI for managing discount activation and deactivation
+# Short description of a discount rule's conditions, "" when it has none
 
-def manage_discounts(admin, root, tm, dm):
+def rule_conditions(discount) -> str:
+    parts = []
+    if discount.get_group() != DEFAULT_GROUP:
+        parts.append(f"stacks as {discount.get_group()}")
+    if discount.get_priority():
+        parts.append(f"priority {discount.get_priority()}")
+    if discount.get_min_quantity() > 1:
+        parts.append(f"min {discount.get_min_quantity()}")
+    starts, ends = discount.get_window()
+    if starts and ends:
+        parts.append(f"{starts:%Y-%m-%d} to {ends:%Y-%m-%d}")
+    elif starts:
+        parts.append(f"from {starts:%Y-%m-%d}")
+    elif ends:
+        parts.append(f"until {ends:%Y-%m-%d}")
+    if discount.get_customer_ids() is not None:
+        parts.append(f"{len(discount.get_customer_ids())} customers")
+    return ", ".join(parts)
+
+# Discounts in a virtual list with status and text filters. Clicking a
+# heading sorts by that column (again to reverse); a toggle redraws only
+# the discount's own row.
+
+DISCOUNT_COLUMNS = [
+    ("name", "Discount", 160),
+    ("percentage", "Off", 60),
+    ("ticket_type", "Ticket type", 150),
+    ("status", "Status", 80),
+    ("conditions", "Conditions", 260),
+]
+DISCOUNT_SORT_KEYS = {
+    "name": lambda d: d.get_name().lower(),
+    "percentage": lambda d: d.get_percentage(),
+    "ticket_type": lambda d: d.get_ticket_type().lower(),
+    "status": lambda d: not d.is_active(),
+    "conditions": rule_conditions,
+}
+DISCOUNT_STATUSES = ("All", "Active", "Inactive")
+
+
+def discount_row(discount) -> tuple:
+    return (
+        discount.get_name(),
+        f"{discount.get_percentage()}%",
+        discount.get_ticket_type(),
+        "Active" if discount.is_active() else "Inactive",
+        rule_conditions(discount),
+    )
+
+
+def filter_discounts(discounts: list, query: str = "", status: str = "All",
+                     sort: str = "status", descending: bool = False) -> list:
+    # Discounts matching the status and (case-insensitive) text, sorted by
+    # a DISCOUNT_COLUMNS name; ties keep their original order
+    query = query.lower()
+    found = []
+    for d in discounts:
+        row = discount_row(d)
+        if status != "All" and row[3] != status:
+            continue
+        if query and not any(query in str(v).lower() for v in row):
+            continue
+        found.append(d)
+    found.sort(key=DISCOUNT_SORT_KEYS[sort], reverse=descending)
+    return found
+
+
+def manage_discounts(admin, root, service):
     clear_screen(root)
     tk.Label(root, text="Manage Discounts", font=("Arial", 14)).pack(pady=10)
 
-    discounts = tm.get_active_discounts() + [d for d in tm._TicketManager__discounts if not d.is_active()]
-    for discount in discounts:
-        frame = tk.Frame(root)
-        frame.pack(fill="x", padx=10, pady=3)
-
-        status = "Active" if discount.is_active() else "Inactive"
-        text = f"{discount.get_name()} ({discount.get_percentage()}% off on {discount.get_ticket_type()}) - {status}"
-        tk.Label(frame, text=text).pack(side="left", expand=True)
-
-        def toggle(d=discount):
-            try:
-                if d.is_active():
-                    d.deactivate()
-                else:
-                    d.activate()
-                dm.save_discounts(tm._TicketManager__discounts)
-                messagebox.showinfo(
-                    "Updated",
-                    f"{d.get_name()} is now {'Active' if d.is_active() else 'Inactive'}"
-                )
-                manage_discounts(admin, root, tm, dm)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to toggle discount: {e}")
-
-        tk.Button(frame, text="Toggle", command=toggle).pack(side="right")
+    controls = tk.Frame(root)
+    controls.pack(fill="x", padx=10)
+    tk.Label(controls, text="Show").pack(side="left")
+    status_var = tk.StringVar(value=DISCOUNT_STATUSES[0])
+    tk.OptionMenu(controls, status_var, *DISCOUNT_STATUSES).pack(side="left", padx=5)
+    tk.Label(controls, text="Search").pack(side="left", padx=(10, 0))
+    query_var = tk.StringVar()
+    tk.Entry(controls, textvariable=query_var).pack(side="left", fill="x", expand=True, padx=5)
+    order = {"sort": "status", "descending": False}
+
+    def source(offset, limit):
+        found = filter_discounts(service.get_discounts(), query_var.get().strip(), status_var.get(),
+                                 order["sort"], order["descending"])
+        return len(found), [(d.get_name(), discount_row(d)) for d in found[offset:offset + limit]]
+
+    def sort_by(column):
+        order["descending"] = order["sort"] == column and not order["descending"]
+        order["sort"] = column
+        table.refresh()
+
+    table = VirtualList(root, DISCOUNT_COLUMNS, source, height=12, on_sort=sort_by)
+    table.pack(fill="both", expand=True, padx=10, pady=5)
+    status_var.trace_add("write", lambda *_: table.refresh())
+    query_var.trace_add("write", lambda *_: table.refresh())
+    status_label = tk.Label(root, text="Select a discount and toggle it (or double-click it).")
+    status_label.pack()
+
+    @metrics.action("gui.toggle")
+    def toggle(*_):
+        name = table.selected()
+        if name is None:
+            messagebox.showwarning("No Selection", "Select a discount to toggle.")
+            return
+        try:
+            d = service.toggle_discount(name)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to toggle discount: {e}")
+            return
+        table.update_row(name, discount_row(d))
+        status_label.config(text=f"{d.get_name()} is now {'Active' if d.is_active() else 'Inactive'}")
 
+    tree = table.get_tree()
+    tree.bind("<Double-1>", lambda e: toggle() if tree.identify_region(e.x, e.y) == "cell" else None)
+    tk.Button(root, text="Toggle", command=toggle).pack(pady=5)
     tk.Button(
         root,
         text="Back to Menu",
-        command=lambda: show_admin_menu(admin, root, tm, dm)
+        command=lambda: show_admin_menu(admin, root, service)
     ).pack(pady=15)
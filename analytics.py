@@ -0,0 +1,321 @@
+# analytics.py
+# Columnar analytics over the reservation history (needs NumPy).
+#
+#     python analytics.py gui_data [--backend journal] [--output summary.json]
+#
+# The history is loaded once into parallel NumPy arrays with one row per
+# ticket line (BookingService books one line per reservation, so rows are
+# usually reservations): reservation number, booking time, event, ticket
+# type, customer, quantity, unit price and revenue. Events, ticket types
+# and customers are stored as small integer codes, and every query is a
+# handful of whole-array operations, so aggregates over millions of rows
+# take milliseconds.
+#
+# ReservationHistory.from_data_manager() works with any DataManager through
+# iter_reservations(); a backend that can produce the columns directly
+# (e.g. straight from SQL) can hand them to the constructor instead.
+
+import argparse
+import json
+from array import array
+from datetime import datetime, timedelta
+
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+# Keys the history can be grouped by
+GROUP_KEYS = ("event", "ticket_type", "customer", "hour", "weekday", "day", "week", "month")
+VALUES = ("revenue", "tickets", "reservations", "price")
+_PERIODS = ("day", "week", "month")
+# Above this many (customer, period) cells, cohort_retention() sorts
+# instead of marking a bitmap
+_BITMAP_LIMIT = 1 << 27
+_WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def _intern(names: list, index: dict, value) -> int:
+    code = index.get(value)
+    if code is None:
+        code = index[value] = len(names)
+        names.append(value)
+    return code
+
+
+def _event_date(value: str):
+    try:
+        return np.datetime64(value, "D")
+    except ValueError:  # free-text dates cannot be placed on a booking curve
+        return np.datetime64("NaT", "D")
+
+
+class ReservationHistory:
+    # columns: equal-length arrays keyed by COLUMNS
+    # events, ticket_types, customers: names for the integer codes
+    # event_dates: datetime64[D] per event code (NaT when unknown)
+    COLUMNS = ("reservation", "reserved_at", "event", "ticket_type", "customer",
+               "quantity", "price", "revenue")
+
+    def __init__(self, columns: dict, events: list, ticket_types: list, customers: list,
+                 event_dates=None):
+        self.__reservation = np.asarray(columns["reservation"], dtype=np.int64)
+        self.__reserved_at = np.asarray(columns["reserved_at"]).astype("datetime64[s]")
+        self.__event = np.asarray(columns["event"], dtype=np.int32)
+        self.__ticket_type = np.asarray(columns["ticket_type"], dtype=np.int32)
+        self.__customer = np.asarray(columns["customer"], dtype=np.int32)
+        self.__quantity = np.asarray(columns["quantity"], dtype=np.int32)
+        self.__price = np.asarray(columns["price"], dtype=np.float64)
+        self.__revenue = np.asarray(columns["revenue"], dtype=np.float64)
+        self.__names = {"event": list(events), "ticket_type": list(ticket_types),
+                        "customer": list(customers)}
+        if event_dates is None:
+            event_dates = [np.datetime64("NaT", "D")] * len(events)
+        self.__event_dates = np.asarray(event_dates, dtype="datetime64[D]")
+        # Lines of one reservation are adjacent; this marks the first of each
+        first = np.ones(len(self.__reservation), dtype=bool)
+        first[1:] = self.__reservation[1:] != self.__reservation[:-1]
+        self.__first_line = first
+
+    @classmethod
+    def from_reservations(cls, reservations) -> "ReservationHistory":
+        cols = {name: array(code) for name, code in (
+            ("reservation", "q"), ("reserved_at", "q"), ("event", "i"), ("ticket_type", "i"),
+            ("customer", "i"), ("quantity", "i"), ("price", "d"), ("revenue", "d"),
+        )}
+        names = {"event": ([], {}), "ticket_type": ([], {}), "customer": ([], {})}
+        event_dates = []
+        for number, res in enumerate(reservations):
+            event = res.get_event()
+            event_code = _intern(*names["event"], event.get_event_id())
+            if event_code == len(event_dates):
+                event_dates.append(_event_date(event.get_date()))
+            customer_code = _intern(*names["customer"], res.get_customer_id())
+            seconds = (res.get_reservation_time() - _EPOCH) // _SECOND
+            lines = res.get_ticket_lines()
+            # Spread the paid total (after discounts) over the lines by list price
+            listed = sum(price * qty for _, _, price, qty in lines)
+            scale = res.get_total_cost() / listed if listed else 0.0
+            for _, name, price, qty in lines:
+                cols["reservation"].append(number)
+                cols["reserved_at"].append(seconds)
+                cols["event"].append(event_code)
+                cols["ticket_type"].append(_intern(*names["ticket_type"], name))
+                cols["customer"].append(customer_code)
+                cols["quantity"].append(qty)
+                cols["price"].append(price)
+                cols["revenue"].append(price * qty * scale)
+        columns = {name: np.frombuffer(col, dtype=col.typecode) for name, col in cols.items()}
+        columns["reserved_at"] = columns["reserved_at"].astype("datetime64[s]")
+        return cls(columns, names["event"][0], names["ticket_type"][0], names["customer"][0],
+                   event_dates)
+
+    @classmethod
+    def from_data_manager(cls, dm, batch_size: int = 10000) -> "ReservationHistory":
+        return cls.from_reservations(dm.iter_reservations(batch_size=batch_size))
+
+    def __len__(self) -> int:
+        return int(self.__first_line.sum())
+
+    def line_count(self) -> int:
+        return len(self.__reservation)
+
+    def names(self, key: str) -> list:
+        return list(self.__names[key])
+
+    # ----------------------------
+    # Building blocks
+    # ----------------------------
+
+    def __values(self, value: str):
+        if value == "revenue":
+            return self.__revenue
+        if value == "tickets":
+            return self.__quantity
+        if value == "reservations":
+            return self.__first_line
+        if value == "price":
+            return self.__price
+        raise ValueError(f"Unknown value: {value}")
+
+    def __keys(self, by: str) -> tuple:
+        # (integer group code per row, label per code)
+        if by == "event":
+            return self.__event, self.__names["event"]
+        if by == "ticket_type":
+            return self.__ticket_type, self.__names["ticket_type"]
+        if by == "customer":
+            return self.__customer, self.__names["customer"]
+        if by == "hour":
+            hours = (self.__reserved_at.astype("datetime64[h]").astype(np.int64) % 24)
+            return hours, [f"{h:02d}:00" for h in range(24)]
+        if by == "weekday":
+            # 1970-01-01 was a Thursday
+            days = (self.__reserved_at.astype("datetime64[D]").astype(np.int64) + 3) % 7
+            return days, list(_WEEKDAYS)
+        if by in _PERIODS:
+            # Codes count periods from the earliest one, so they are dense
+            # and the distance between two codes is the number of periods
+            numbers, label = self.__periods(by)
+            if not len(numbers):
+                return numbers, []
+            lo = int(numbers.min())
+            return numbers - lo, [label(n) for n in range(lo, int(numbers.max()) + 1)]
+        raise ValueError(f"Unknown grouping: {by}")
+
+    def __periods(self, period: str) -> tuple:
+        # (period number per row, label for a period number)
+        if period == "month":
+            months = self.__reserved_at.astype("datetime64[M]").astype(np.int64)
+            return months, lambda n: str(np.datetime64(n, "M"))
+        days = self.__reserved_at.astype("datetime64[D]").astype(np.int64)
+        if period == "day":
+            return days, lambda n: str(np.datetime64(n, "D"))
+        # Weeks start on Monday and are labelled by it; day 0 was a Thursday
+        return (days + 3) // 7, lambda n: str(np.datetime64(n * 7 - 3, "D"))
+
+    # ----------------------------
+    # Queries
+    # ----------------------------
+
+    def group_by(self, by: str, value: str = "revenue") -> dict:
+        # label -> summed value, for groups with at least one row
+        codes, labels = self.__keys(by)
+        weights = self.__values(value)
+        totals = np.bincount(codes, weights=weights, minlength=len(labels))
+        present = np.bincount(codes, minlength=len(labels)) > 0
+        rounded = np.round(totals, 2) if value in ("revenue", "price") else totals.astype(np.int64)
+        return {labels[i]: rounded[i].item() for i in np.flatnonzero(present)}
+
+    def percentiles(self, value: str = "revenue", q=(50, 90, 99), by: str = None) -> dict:
+        # Linear-interpolated percentiles of a per-row value, overall or per group:
+        # {q: v} or {label: {q: v}}
+        if value == "reservations":
+            raise ValueError("Percentiles need a per-row value.")
+        values = self.__values(value).astype(np.float64)
+        q = list(q)
+        if by is None:
+            if not len(values):
+                return {}
+            return dict(zip(q, np.round(np.percentile(values, q), 2).tolist()))
+
+        codes, labels = self.__keys(by)
+        # Sort by value, then stably by group: each group's values end up
+        # together and in order
+        order = np.argsort(values)
+        order = order[np.argsort(codes[order], kind="stable")]
+        sorted_values = values[order]
+        counts = np.bincount(codes, minlength=len(labels))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        groups = np.flatnonzero(counts)
+        # Position of each percentile within each group's sorted slice
+        pos = starts[groups, None] + (counts[groups, None] - 1) * (np.array(q) / 100.0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        result = sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+        result = np.round(result, 2)
+        return {labels[g]: dict(zip(q, row.tolist())) for g, row in zip(groups, result)}
+
+    def booking_curve(self, event_id: str = None, max_days: int = 365) -> dict:
+        # Tickets sold N days before the event date, and the share of all
+        # tickets sold at least N days out, for N = 0..max_days. Bookings
+        # further out count as max_days; on or after the day as 0.
+        event_days = self.__event_dates[self.__event]
+        mask = ~np.isnat(event_days)
+        if event_id is not None:
+            code = self.__names["event"].index(event_id) if event_id in self.__names["event"] else -1
+            mask &= self.__event == code
+        days_before = (event_days[mask] - self.__reserved_at[mask].astype("datetime64[D]")).astype(np.int64)
+        days_before = np.clip(days_before, 0, max_days)
+        sold = np.bincount(days_before, weights=self.__quantity[mask], minlength=max_days + 1)
+        total = sold.sum()
+        # Reverse cumulative sum: everything sold at least N days out
+        by_then = np.cumsum(sold[::-1])[::-1]
+        share = by_then / total if total else np.zeros_like(by_then)
+        return {
+            "days_before": list(range(max_days + 1)),
+            "tickets": sold.astype(np.int64).tolist(),
+            "cumulative_share": np.round(share, 4).tolist(),
+        }
+
+    def repeat_customer_rate(self) -> float:
+        # Share of customers with more than one reservation
+        per_customer = np.bincount(self.__customer[self.__first_line],
+                                   minlength=len(self.__names["customer"]))
+        active = np.count_nonzero(per_customer)
+        return round(np.count_nonzero(per_customer > 1) / active, 4) if active else 0.0
+
+    def cohort_retention(self, period: str = "month") -> dict:
+        # Customers grouped by the period of their first booking; retention[i][k]
+        # is the share of cohort i that booked again k periods later
+        if period not in ("week", "month"):
+            raise ValueError(f"Unknown period: {period}")
+        steps, labels = self.__keys(period)
+        if not len(steps):
+            return {"cohorts": [], "sizes": [], "retention": []}
+
+        customers = self.__customer
+        first = np.full(len(self.__names["customer"]), np.iinfo(np.int64).max)
+        np.minimum.at(first, customers, steps)
+        offset = steps - first[customers]
+        span = int(offset.max()) + 1
+        # Each (customer, offset) pair counts once however many bookings it has
+        keys = customers.astype(np.int64) * span + offset
+        if len(first) * span <= _BITMAP_LIMIT:
+            seen = np.zeros(len(first) * span, dtype=bool)
+            seen[keys] = True
+            pairs = np.flatnonzero(seen)
+        else:
+            pairs = np.unique(keys)
+        cohort = first[pairs // span]
+        matrix = np.bincount(cohort * span + pairs % span, minlength=len(labels) * span)
+        matrix = matrix.reshape(len(labels), span)
+        cohorts = np.flatnonzero(matrix[:, 0])
+        matrix = matrix[cohorts]
+
+        sizes = matrix[:, 0]
+        return {
+            "cohorts": [labels[s] for s in cohorts.tolist()],
+            "sizes": sizes.tolist(),
+            "retention": np.round(matrix / sizes[:, None], 4).tolist(),
+        }
+
+    def summary(self) -> dict:
+        return {
+            "reservations": len(self),
+            "tickets": int(self.__quantity.sum()),
+            "revenue": round(float(self.__revenue.sum()), 2),
+            "revenue_by_event": self.group_by("event"),
+            "revenue_by_ticket_type": self.group_by("ticket_type"),
+            "revenue_by_month": self.group_by("month"),
+            "revenue_percentiles": self.percentiles("revenue"),
+            "repeat_customer_rate": self.repeat_customer_rate(),
+            "cohort_retention": self.cohort_retention("month"),
+        }
+
+
+def main():
+    from load_test import BACKENDS, open_store
+
+    parser = argparse.ArgumentParser(description="Summarise the reservation history.")
+    parser.add_argument("folder", help="data folder")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal")
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    dm = open_store(args.backend, args.folder)
+    try:
+        history = ReservationHistory.from_data_manager(dm)
+    finally:
+        if hasattr(dm, "close"):
+            dm.close()
+    text = json.dumps(history.summary(), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# app_setup.py
+# Builds the ticket catalogue, events and BookingService shared by the
+# tkinter GUI and the HTTP booking server.
+#
+# Building only reads the store, except on first run, when the default
+# discounts and admin account are saved.
+
+import threading
+import uuid
+
+from classes import (
+    Admin, TicketManager, UserRegistry,
+    SingleRaceTicket, WeekendPass, GroupTicket, GroupTicketProduct, SeasonMembership, Event, Discount
+)
+from booking_service import BookingService
+from seat_inventory import SeatInventory
+
+# Seats per tier for each sample event
+EVENT_CAPACITY = {"standard": 5000, "premium": 1500, "vip": 300, "paddock": 100}
+
+
+def _sample_event(date: str, location: str) -> Event:
+    # Ids are derived from location and date so they stay the same across
+    # runs and existing reservations can be counted against each event's seats
+    event_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"grand-prix-event:{location}:{date}"))
+    return Event(date=date, location=location, capacity=EVENT_CAPACITY, event_id=event_id)
+
+
+def sample_events() -> list:
+    # Sample events (could be loaded/persisted similarly)
+    return [
+        _sample_event("2025-05-10", "Yas Marina Circuit"),
+        _sample_event("2025-05-11", "Yas Marina Circuit"),
+        _sample_event("2025-05-12", "Yas Marina Circuit"),
+    ]
+
+
+# The ticket the "Group Saver" default named before group tickets came in
+# every size
+_OLD_GROUP_SAVER_TYPE = "Group Ticket (4)"
+
+
+def default_discounts() -> list:
+    # Group Saver names the group product, so it covers every group size
+    return [
+        Discount("Weekend Promo", 20, "Weekend Pass"),
+        Discount("Group Saver", 15, GroupTicket.PRODUCT_NAME)
+    ]
+
+
+def build_ticket_manager(dm) -> TicketManager:
+    tm = TicketManager()
+    tm.register_ticket(SingleRaceTicket())
+    tm.register_ticket(WeekendPass())
+    tm.register_ticket(SeasonMembership())
+    # "Group Ticket (N)" for any N from 2 to 50, built on first use
+    tm.register_product(GroupTicketProduct())
+
+    # Load persisted discounts and sales. Discounts can be toggled but not
+    # deleted, so an empty list means the store has never been seeded.
+    discounts = dm.load_discounts()
+    if not discounts:
+        discounts = default_discounts()
+        dm.save_discounts(discounts)
+    for d in discounts:
+        if d.get_name() == "Group Saver" and d.get_ticket_type() == _OLD_GROUP_SAVER_TYPE:
+            # Stores seeded with the old default: widen it to every group size
+            d.set_ticket_type(GroupTicket.PRODUCT_NAME)
+            dm.save_discount(d)
+        tm.add_discount(d)
+    tm.set_sales_log(dm.load_sales())
+    tm.set_ledger(dm.load_ledger())
+    return tm
+
+
+def build_seat_inventory(dm, events: list, tm: TicketManager) -> SeatInventory:
+    # Seeded with seats already sold for these events; tickets are looked up
+    # by name in tm, which also builds group tickets of any size
+    inventory = SeatInventory()
+    for ev in events:
+        inventory.add_event(ev)
+    event_ids = {ev.get_event_id() for ev in events}
+    inventory.add_reservations(dm.iter_reservations(lambda r: r.get_event().get_event_id() in event_ids),
+                               ticket_for=tm.get_ticket_by_name)
+    return inventory
+
+
+def build_service(dm, events: list = None) -> BookingService:
+    events = sample_events() if events is None else events
+    tm = build_ticket_manager(dm)
+    tm.set_seat_inventory(build_seat_inventory(dm, events, tm))
+
+    # Load users into the email/id index
+    registry = UserRegistry(dm.load_users())
+
+    # Ensure at least one admin
+    if not registry.admins():
+        default_admin = Admin("Admin", "admin@example.com", "admin123", admin_code="ADMIN001")
+        registry.add(default_admin)
+        dm.save_user(default_admin)
+
+    return BookingService(tm, dm, registry=registry, events=events)
+
+
+class ServiceLoader:
+    # Opens the store and builds the service on a background thread, so a
+    # window can be shown before any data is read.
+    # open_store: callable returning a DataManager
+    def __init__(self, open_store, events: list = None):
+        self.__open_store = open_store
+        self.__events = events
+        self.__service = None
+        self.__error = None
+        self.__done = threading.Event()
+        self.__thread = threading.Thread(target=self.__load, name="service-loader", daemon=True)
+        self.__thread.start()
+
+    def __load(self):
+        try:
+            self.__service = build_service(self.__open_store(), self.__events)
+        except Exception as e:
+            self.__error = e
+        finally:
+            self.__done.set()
+
+    def is_ready(self) -> bool:
+        return self.__done.is_set()
+
+    def wait(self, timeout: float = None) -> BookingService:
+        # Raises whatever stopped the load
+        if not self.__done.wait(timeout):
+            raise TimeoutError("Data is still loading.")
+        if self.__error is not None:
+            raise self.__error
+        return self.__service
+
+    def close(self):
+        # For shutting down before the service was ever used
+        self.__done.wait()
+        if self.__service is not None:
+            dm = self.__service.get_data_manager()
+            if hasattr(dm, "close"):
+                dm.close()
@@ -0,0 +1,91 @@
+# bench_codec.py
+# record_codec against pickle for the data we store.
+#     python bench_codec.py [--sizes 1000 10000 100000] [--history 2] [--json]
+#
+# For each size, synthetic customers (with about `history` reservations
+# each) are written and read back both ways:
+#   users file        one payload for the whole list vs one pickle
+#   reservation rows  one record per reservation, as in a reservation file,
+#                     the journal or SQLite (dumps_many / loads_many vs a
+#                     pickle per reservation)
+# Times are the best of --repeat runs.
+
+import argparse
+import json
+import pickle
+import random
+import shutil
+import tempfile
+import time
+
+import record_codec
+from classes import DataManager
+from load_test import load_events, seed
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _case(name: str, n: int, dump_pickle, load_pickle, dump_codec, load_codec, repeat: int) -> dict:
+    pickled, encoded = dump_pickle(), dump_codec()
+    return {
+        "case": name,
+        "records": n,
+        "pickle_bytes": len(pickled) if isinstance(pickled, bytes) else sum(map(len, pickled)),
+        "codec_bytes": len(encoded) if isinstance(encoded, bytes) else sum(map(len, encoded)),
+        "pickle_save": _best(dump_pickle, repeat),
+        "codec_save": _best(dump_codec, repeat),
+        "pickle_load": _best(lambda: load_pickle(pickled), repeat),
+        "codec_load": _best(lambda: load_codec(encoded), repeat),
+    }
+
+
+def measure(users: int, history: float = 2.0, repeat: int = 3) -> list:
+    folder = tempfile.mkdtemp(prefix="bench_codec_")
+    try:
+        seed(DataManager(folder=folder), users, history, load_events(), random.Random(1))
+        dm = DataManager(folder=folder)
+        customers, reservations = dm.load_users(), dm.load_reservations()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return [
+        _case("users file", len(customers),
+              lambda: pickle.dumps(customers), pickle.loads,
+              lambda: record_codec.encode("users", customers), record_codec.decode, repeat),
+        _case("reservation rows", len(reservations),
+              lambda: [pickle.dumps(r) for r in reservations], lambda rows: [pickle.loads(r) for r in rows],
+              lambda: record_codec.dumps_many(reservations), record_codec.loads_many, repeat),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare record_codec with pickle.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--history", type=float, default=2.0,
+                        help="past reservations per customer")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        results += measure(n, args.history, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'case':<17} {'records':>8} {'size':>6} {'save (ms)':>19} {'load (ms)':>19}")
+    print(f"{'':<17} {'':>8} {'ratio':>6} {'pickle':>9} {'codec':>9} {'pickle':>9} {'codec':>9}")
+    for r in results:
+        print(f"{r['case']:<17} {r['records']:>8} {r['codec_bytes'] / r['pickle_bytes']:>6.2f} "
+              f"{r['pickle_save'] * 1000:>9.1f} {r['codec_save'] * 1000:>9.1f} "
+              f"{r['pickle_load'] * 1000:>9.1f} {r['codec_load'] * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
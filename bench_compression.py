@@ -0,0 +1,130 @@
+# bench_compression.py
+# Size, save time and load time of the DataManager files per compression.
+#     python bench_compression.py [--sizes 1000 10000 100000] [--history 2]
+#                                 [--appends 500] [--json]
+#
+# For each size a set of synthetic customers (with about `history` past
+# reservations each) is saved as plain pickles and with every codec, then
+# users.pkl and reservations.pkl are loaded back from a fresh DataManager.
+# Times are the best of --repeat runs.
+#
+# The append workload books --appends reservations one add_reservation()
+# at a time into an empty folder, as the GUI does; "save" is the time for
+# all of them (including any recompression they trigger) and "load" reads
+# the result back.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from classes import DataManager, Event, Reservation, SingleRaceTicket
+from compressed_files import CODECS
+from load_test import load_events, seed
+
+FILES = ("users", "reservations")
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(users: int, history: float = 2.0, repeat: int = 3) -> list:
+    source = tempfile.mkdtemp(prefix="bench_compression_")
+    results = []
+    try:
+        seed(DataManager(folder=source), users, history, load_events(), random.Random(1))
+        data = DataManager(folder=source)
+        loaded = {"users": data.load_users(), "reservations": data.load_reservations()}
+        for codec in (None,) + CODECS:
+            folder = os.path.join(source, codec or "plain")
+            os.mkdir(folder)
+            dm = DataManager(folder=folder, compression=codec)
+            for key in FILES:
+                save = getattr(dm, f"save_{key}")
+                save_time = _best(lambda: save(loaded[key]), repeat)
+                load = getattr(DataManager(folder=folder), f"load_{key}")
+                load_time = _best(load, repeat)
+                results.append({
+                    "users": users,
+                    "file": key,
+                    "codec": codec or "plain",
+                    "bytes": os.path.getsize(os.path.join(folder, f"{key}.pkl")),
+                    "save": save_time,
+                    "load": load_time,
+                })
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+    return results
+
+
+def measure_appends(appends: int, repeat: int = 3) -> list:
+    source = tempfile.mkdtemp(prefix="bench_compression_")
+    event = Event("2025-05-10", "Yas")
+    reservations = [Reservation(f"c{i}", [SingleRaceTicket()], event, "Cash") for i in range(appends)]
+    results = []
+    try:
+        for codec in (None,) + CODECS:
+            folder = os.path.join(source, codec or "plain")
+
+            def book():
+                shutil.rmtree(folder, ignore_errors=True)
+                os.mkdir(folder)
+                dm = DataManager(folder=folder, compression=codec)
+                for r in reservations:
+                    dm.add_reservation(r)
+
+            save_time = _best(book, repeat)
+            load_time = _best(DataManager(folder=folder).load_reservations, repeat)
+            results.append({
+                "users": appends,
+                "file": "appends",
+                "codec": codec or "plain",
+                "bytes": os.path.getsize(os.path.join(folder, "reservations.pkl")),
+                "save": save_time,
+                "load": load_time,
+            })
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare compressed and plain data files.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--history", type=float, default=2.0,
+                        help="past reservations per customer")
+    parser.add_argument("--appends", type=int, default=500,
+                        help="reservations added one at a time in the append workload (0 to skip)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        results += measure(n, args.history, args.repeat)
+    if args.appends:
+        results += measure_appends(args.appends, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    plain = {(r["users"], r["file"]): r for r in results if r["codec"] == "plain"}
+    print(f"{'users':>8} {'file':<13} {'codec':<6} {'size (KB)':>10} {'ratio':>6} "
+          f"{'save (ms)':>10} {'load (ms)':>10}")
+    for r in results:
+        base = plain[r["users"], r["file"]]
+        print(f"{r['users']:>8} {r['file']:<13} {r['codec']:<6} {r['bytes'] / 1024:>10.1f} "
+              f"{r['bytes'] / base['bytes']:>6.2f} {r['save'] * 1000:>10.1f} "
+              f"{r['load'] * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
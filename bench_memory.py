@@ -0,0 +1,103 @@
+# bench_memory.py
+# Per-object memory of the __slots__ domain classes against the previous
+# dict-based layout (string UUIDs and datetime objects).
+#     python bench_memory.py [--count 100000]
+
+import argparse
+import gc
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from classes import Customer, Discount, Event, Reservation, SingleRaceTicket, Ticket
+
+
+_SHARED_TICKETS = [SingleRaceTicket()]
+_SHARED_EVENT = Event("2025-05-10", "Yas Marina Circuit")
+
+
+# The dict-backed layout the domain classes used before __slots__
+class _DictRecord:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def _legacy_customer(i: int):
+    return _DictRecord(
+        _User__user_id=str(uuid.uuid4()), _User__name=f"Customer {i}",
+        _User__email=f"customer{i}@example.com", _User__password="pw",
+        _User__created_at=datetime.now(), _Customer__reservations=[],
+    )
+
+
+def _legacy_ticket(i: int):
+    return _DictRecord(
+        _Ticket__ticket_id=str(uuid.uuid4()), _Ticket__name="Single Race Ticket",
+        _Ticket__price=300.0, _Ticket__valid_days=1, _Ticket__features=[],
+    )
+
+
+def _legacy_event(i: int):
+    return _DictRecord(
+        _Event__event_id=str(uuid.uuid4()), _Event__date="2025-05-10",
+        _Event__location="Yas Marina Circuit",
+    )
+
+
+def _legacy_reservation(i: int):
+    return _DictRecord(
+        _Reservation__reservation_id=str(uuid.uuid4()), _Reservation__customer_id=str(uuid.uuid4()),
+        _Reservation__tickets=_SHARED_TICKETS, _Reservation__event=_SHARED_EVENT,
+        _Reservation__total_cost=300.0, _Reservation__payment_method="Credit Card",
+        _Reservation__reservation_time=datetime.now(),
+    )
+
+
+def _legacy_discount(i: int):
+    return _DictRecord(
+        _Discount__name=f"Promo {i}", _Discount__percentage=10,
+        _Discount__ticket_type="Weekend Pass", _Discount__active=True,
+    )
+
+
+CASES = [
+    ("Customer", _legacy_customer,
+     lambda i: Customer(f"Customer {i}", f"customer{i}@example.com", "pw")),
+    ("Ticket", _legacy_ticket,
+     lambda i: Ticket("Single Race Ticket", 300.0, 1, [])),
+    ("Event", _legacy_event,
+     lambda i: Event("2025-05-10", "Yas Marina Circuit")),
+    ("Reservation", _legacy_reservation,
+     lambda i: Reservation(str(uuid.uuid4()), _SHARED_TICKETS, _SHARED_EVENT, "Credit Card", 300.0)),
+    ("Discount", _legacy_discount,
+     lambda i: Discount(f"Promo {i}", 10, "Weekend Pass")),
+]
+
+
+def bytes_per_object(factory, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Don't count the list holding them
+    overhead = objects.__sizeof__()
+    del objects
+    return (after - before - overhead) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-object memory of domain classes.")
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'class':<12} {'dict (B)':>10} {'slots (B)':>10} {'saved':>8}")
+    for name, legacy, current in CASES:
+        old = bytes_per_object(legacy, args.count)
+        new = bytes_per_object(current, args.count)
+        print(f"{name:<12} {old:>10.0f} {new:>10.0f} {1 - new / old:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench_startup.py
+# Cold-start time of the GUI against the size of the data folder.
+#     python bench_startup.py [--sizes 1000 10000 100000] [--json]
+#
+# For each size a journal store is seeded with synthetic users, then a
+# fresh interpreter imports main_gui and starts the background loader the
+# way main() does. "window" is the time until the login window can be
+# drawn (Tk itself is not started, so this runs without a display); "data"
+# is the time until the catalog, discounts and user index are loaded.
+# The window time should stay flat as the data grows.
+
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from journal_storage import JournalDataManager
+from load_test import load_events, seed
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main_gui
+from app_setup import ServiceLoader
+from journal_storage import JournalDataManager
+loader = ServiceLoader(lambda: JournalDataManager(folder=sys.argv[1]))
+window = time.perf_counter() - start
+loader.wait()
+data = time.perf_counter() - start
+loader.close()
+print(json.dumps({"window": window, "data": data}))
+"""
+
+
+def cold_start(folder: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE, folder],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def measure(users: int, history: float = 0.5) -> dict:
+    folder = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        dm = JournalDataManager(folder=folder, fsync=False)
+        seed(dm, users, history, load_events(), random.Random(1))
+        dm.compact()
+        dm.close()
+        return dict(cold_start(folder), users=users)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GUI cold start against data size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    results = [measure(n) for n in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'users':>10} {'window (ms)':>12} {'data (ms)':>12}")
+    for r in results:
+        print(f"{r['users']:>10} {r['window'] * 1000:>12.1f} {r['data'] * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# benchmarks.py
+# Microbenchmarks for the hot paths in classes.py, checked against stored
+# baselines.
+#
+#     python benchmarks.py                  # compare with benchmark_baselines.json
+#     python benchmarks.py --threshold 15   # fail if anything is >15% slower
+#     python benchmarks.py --update         # record new baselines
+#     python benchmarks.py -k discount      # only benchmarks whose name matches
+#
+# Each benchmark reports the median per-call time over several timeit
+# runs. A short pure-Python calibration loop is timed in runs alternating
+# with the benchmark's and stored with it; baseline times are scaled by how
+# fast that loop runs now, so a baseline recorded on another machine (or
+# while this one was busy) is still a fair comparison. Exits with status
+# 1 when any benchmark is slower than its baseline by more than the
+# threshold (default 25%, or BENCH_THRESHOLD from the environment) plus
+# NOISE_FLOOR: sub-microsecond calls jitter by more than 25% from run to
+# run without any code change.
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+from classes import (
+    Customer, DataManager, Discount, Event, Reservation, TicketManager,
+    SingleRaceTicket, WeekendPass, GroupTicket, SeasonMembership
+)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+DATA_SIZES = (100, 1000, 10000)
+NOISE_FLOOR = 0.5e-6  # seconds per call a benchmark may drift on top of the threshold
+
+
+def _calibration():
+    total = 0
+    for i in range(1000):
+        total += i * i
+    return total
+
+
+def _ticket_manager() -> TicketManager:
+    tm = TicketManager()
+    for ticket in (SingleRaceTicket(), WeekendPass(), GroupTicket(4), GroupTicket(10), SeasonMembership()):
+        tm.register_ticket(ticket)
+    tm.add_discount(Discount("Weekend Promo", 20, "Weekend Pass"))
+    tm.add_discount(Discount("Group Saver", 15, "Group Ticket (4)"))
+    for i in range(50):
+        inactive = Discount(f"Inactive {i}", 5, "Weekend Pass")
+        inactive.deactivate()
+        tm.add_discount(inactive)
+    return tm
+
+
+def _customers(n: int) -> list:
+    return [Customer(f"Customer {i}", f"customer{i}@example.com", "pw") for i in range(n)]
+
+
+def build_benchmarks() -> dict:
+    # name -> (setup() returning state, stmt(state)); stmt is what gets timed
+    benchmarks = {}
+
+    def tm_setup():
+        tm = _ticket_manager()
+        return tm, tm.get_ticket_by_name("Weekend Pass"), Event("2025-05-10", "Yas")
+
+    benchmarks["tm.apply_discount"] = (tm_setup, lambda s: s[0].apply_discount(s[1]))
+    benchmarks["tm.get_ticket_by_name"] = (tm_setup, lambda s: s[0].get_ticket_by_name("Group Ticket (10)"))
+    benchmarks["tm.record_sale"] = (tm_setup, lambda s: s[0].record_sale(2, ticket=s[1], event=s[2], revenue=1200.0))
+
+    def quote_setup():
+        # A 20-line basket against conditional and stacking rules
+        tm = _ticket_manager()
+        tm.add_discount(Discount("Bulk", 10, "Single Race Ticket", min_quantity=4))
+        tm.add_discount(Discount("Season Sale", 5, "Weekend Pass", group="season",
+                                 starts=datetime(2000, 1, 1), ends=datetime(2100, 1, 1)))
+        tickets = [tm.get_ticket_by_name(n) for n in tm.get_ticket_types()]
+        return tm, [(tickets[i % len(tickets)], 1 + i % 5) for i in range(20)]
+
+    benchmarks["tm.quote[20 lines]"] = (quote_setup, lambda s: s[0].quote(s[1], "customer"))
+
+    def reservation_setup():
+        return [WeekendPass(), SingleRaceTicket(), GroupTicket(4)], Event("2025-05-10", "Yas")
+
+    benchmarks["Reservation.__init__"] = (
+        reservation_setup,
+        lambda s: Reservation("7b2c2b36-8a4e-4f7e-9a51-1d0c1c1e2f3a", s[0], s[1], "Credit Card"),
+    )
+
+    def customer_setup():
+        cust = Customer("Bob", "bob@example.com", "pw")
+        tickets, event = reservation_setup()
+        reservations = [Reservation(cust.get_id(), tickets, event, "Credit Card") for _ in range(100)]
+        return cust, reservations
+
+    def delete_and_readd(s):
+        cust, reservations = s
+        res = reservations[0]
+        cust.delete_reservation(res.get_reservation_id())
+        cust.add_reservation(res)
+        reservations.append(reservations.pop(0))
+
+    benchmarks["Customer.delete_reservation+add"] = (customer_setup, delete_and_readd)
+
+    for n in DATA_SIZES:
+        def dm_setup(n=n):
+            folder = tempfile.mkdtemp(prefix="bench_")
+            dm = DataManager(folder=folder)
+            users = _customers(n)
+            dm.save_users(users)
+            return folder, dm, users
+
+        benchmarks[f"DataManager.save_users[{n}]"] = (dm_setup, lambda s: s[1].save_users(s[2]))
+        benchmarks[f"DataManager.load_users[{n}]"] = (dm_setup, lambda s: s[1].load_users())
+
+        def res_setup(n=n):
+            folder = tempfile.mkdtemp(prefix="bench_")
+            dm = DataManager(folder=folder)
+            tickets, event = reservation_setup()
+            reservations = [Reservation(f"customer-{i % 50}", tickets[:1 + i % 3], event, "Credit Card")
+                            for i in range(n)]
+            dm.save_reservations(reservations)
+            return folder, dm, reservations
+
+        benchmarks[f"DataManager.save_reservations[{n}]"] = (res_setup, lambda s: s[1].save_reservations(s[2]))
+        benchmarks[f"DataManager.load_reservations[{n}]"] = (res_setup, lambda s: s[1].load_reservations())
+
+    # One event's reservations out of ten events' worth, with and without shards
+    n = DATA_SIZES[-1]
+    for label, shard_by in (("", None), (", sharded", "event")):
+        def event_setup(shard_by=shard_by):
+            folder = tempfile.mkdtemp(prefix="bench_")
+            dm = DataManager(folder=folder, shard_by=shard_by)
+            tickets, _ = reservation_setup()
+            events = [Event(f"2025-05-{d:02d}", "Yas") for d in range(1, 11)]
+            dm.save_reservations([Reservation(f"customer-{i % 50}", tickets[:1 + i % 3], events[i % 10],
+                                              "Credit Card") for i in range(n)])
+            return folder, dm, events[0].get_event_id()
+
+        benchmarks[f"DataManager.reservations_for_event[{n}{label}]"] = (
+            event_setup, lambda s: s[1].reservations_for_event(s[2])
+        )
+    return benchmarks
+
+
+def _cleanup(state):
+    # DataManager benchmarks keep their data in a temporary folder
+    if isinstance(state, tuple) and state and isinstance(state[0], str) and os.path.isdir(state[0]):
+        shutil.rmtree(state[0], ignore_errors=True)
+
+
+def _number(timer: timeit.Timer, min_time: float) -> int:
+    # Calls per run so that one run takes at least min_time
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2 if number < 8 else 4
+    return number
+
+
+def measure(setup, stmt, repeat: int = 15, min_time: float = 0.05) -> tuple:
+    # Median seconds per call of stmt and of the calibration loop over
+    # `repeat` runs each, alternated so both see the same machine state
+    state = setup()
+    try:
+        timer = timeit.Timer(lambda: stmt(state))
+        calibration = timeit.Timer(_calibration)
+        number, calibration_number = _number(timer, min_time), _number(calibration, min_time)
+        times, calibrations = [], []
+        for _ in range(repeat):
+            calibrations.append(calibration.timeit(calibration_number) / calibration_number)
+            times.append(timer.timeit(number) / number)
+        return statistics.median(times), statistics.median(calibrations)
+    finally:
+        _cleanup(state)
+
+
+def run(selected: list = None, repeat: int = 15, min_time: float = 0.05) -> dict:
+    # name -> {"seconds": per call, "calibration": calibration loop seconds}
+    results = {}
+    for name, (setup, stmt) in build_benchmarks().items():
+        if selected and not any(s in name for s in selected):
+            continue
+        seconds, calibration = measure(setup, stmt, repeat, min_time)
+        results[name] = {"seconds": seconds, "calibration": calibration}
+    return results
+
+
+def compare(results: dict, baselines: dict, threshold: float) -> list:
+    # [(name, baseline s, current s, change, regressed), ...] for every
+    # benchmark that has a baseline; change is the slowdown as a fraction
+    # (0.1 = 10% slower) and regressed is whether it is past the threshold
+    # and also more than NOISE_FLOOR slower per call
+    rows = []
+    for name, current in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        expected = baseline["seconds"] * current["calibration"] / baseline["calibration"]
+        change = current["seconds"] / expected - 1
+        regressed = change > threshold and current["seconds"] - expected > NOISE_FLOOR
+        rows.append((name, expected, current["seconds"], change, regressed))
+    return rows
+
+
+def load_baselines(path: str = BASELINE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def save_baselines(results: dict, path: str = BASELINE_FILE):
+    merged = dict(load_baselines(path))
+    merged.update(results)
+    with open(path, "w") as f:
+        json.dump({"python": sys.version.split()[0], "results": merged}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run hot-path microbenchmarks against baselines.")
+    parser.add_argument("-k", dest="selected", action="append", help="only run benchmarks matching this")
+    parser.add_argument("--threshold", type=float, default=float(os.environ.get("BENCH_THRESHOLD", 25)),
+                        help="allowed slowdown in percent before failing (default 25)")
+    parser.add_argument("--update", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timing run")
+    parser.add_argument("--baselines", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    results = run(args.selected, args.repeat, args.min_time)
+    if args.update:
+        save_baselines(results, args.baselines)
+        for name, result in results.items():
+            print(f"{name:<36} {result['seconds'] * 1e6:>12.3f} us")
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+        return
+
+    rows = compare(results, load_baselines(args.baselines), args.threshold / 100)
+    print(f"{'benchmark':<36} {'baseline (us)':>14} {'now (us)':>12} {'change':>8}")
+    for name, expected, current, change, regressed in rows:
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{name:<36} {expected * 1e6:>14.3f} {current * 1e6:>12.3f} {change:>+8.1%}{flag}")
+    missing = [n for n in results if n not in {r[0] for r in rows}]
+    if missing:
+        print(f"No baseline for: {', '.join(missing)} (run with --update)")
+    if any(r[4] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# booking_server.py
+# Headless booking server: BookingService over a small local HTTP/JSON
+# protocol, served with asyncio so many clients can be connected at once.
+#
+#     python booking_server.py [--folder gui_data] [--host 127.0.0.1] [--port 8080]
+#
+# Routes (request and response bodies are JSON):
+#     POST /register        {"name", "email", "password"}
+#     POST /login           {"email", "password"} -> {"token", ...}
+#     GET  /events
+#     GET  /quote?ticket=Weekend%20Pass&quantity=2
+#     POST /reservations    {"event_id", "ticket", "quantity", "payment_method"}
+#                           or {"items": [{"event_id", "ticket", "quantity"}, ...],
+#                               "payment_method"}
+#     GET  /reservations
+#     GET  /sales-report    (admins only)
+#     GET  /dashboard       (admins only)
+# Routes other than register, login, events and quote need the header
+# "Authorization: Bearer <token>" with a token returned by /login. Tokens
+# expire session_ttl seconds after login. Quotes include customer-only
+# discounts when the header is sent.
+#
+# The event loop only parses requests and writes responses. Every service
+# call (pricing, booking, persistence, reports) runs in a thread pool.
+
+import argparse
+import asyncio
+import json
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from classes import Admin, Customer
+from booking_service import event_summary, reservation_summary
+
+MAX_BODY = 1 << 20
+SESSION_TTL = 12 * 3600  # seconds a login token stays valid
+
+_REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized",
+    403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _user_summary(user) -> dict:
+    return {
+        "user_id": user.get_id(),
+        "name": user.get_name(),
+        "email": user.get_email(),
+        "role": "admin" if isinstance(user, Admin) else "customer",
+    }
+
+
+async def _readline(reader) -> bytes:
+    # readline() raises ValueError for a line longer than the stream limit
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HTTPError(431, "Request line or header too long.")
+
+
+async def _read_request(reader):
+    # Returns (method, target, headers, body), or None when the client
+    # closed the connection between requests
+    line = await _readline(reader)
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+    headers = {}
+    while True:
+        line = await _readline(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Malformed Content-Length header.")
+    if length < 0:
+        raise HTTPError(400, "Malformed Content-Length header.")
+    if length > MAX_BODY:
+        raise HTTPError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+class BookingServer:
+    def __init__(self, service, workers: int = 8, session_ttl: float = SESSION_TTL):
+        self.__service = service
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="booking")
+        # token -> (user id, expiry time); in login order, which is also
+        # expiry order since every token lives session_ttl
+        self.__sessions = {}
+        self.__session_ttl = session_ttl
+        self.__server = None
+        self.__routes = {
+            ("POST", "/register"): self.__register,
+            ("POST", "/login"): self.__login,
+            ("GET", "/events"): self.__events,
+            ("GET", "/quote"): self.__quote,
+            ("POST", "/reservations"): self.__reserve,
+            ("GET", "/reservations"): self.__reservations,
+            ("GET", "/sales-report"): self.__sales_report,
+            ("GET", "/dashboard"): self.__dashboard,
+        }
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        self.__server = await asyncio.start_server(self.__handle, host, port)
+        return self.__server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    async def stop(self):
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+        self.__executor.shutdown(wait=True)
+
+    async def __run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, fn, *args)
+
+    # ----------------------------
+    # Connection handling
+    # ----------------------------
+
+    async def __handle(self, reader, writer):
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await self.__dispatch(method, target, headers, body)
+                except HTTPError as e:
+                    status, payload, keep_alive = e.status, {"error": str(e)}, False
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def __dispatch(self, method: str, target: str, headers: dict, body: bytes):
+        url = urlsplit(target)
+        handler = self.__routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.__routes):
+                raise HTTPError(405, f"{method} not allowed on {url.path}.")
+            raise HTTPError(404, f"No route for {url.path}.")
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON.")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object.")
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            return await handler(data, query, headers)
+        except HTTPError:
+            raise
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"Internal error: {e}"}
+
+    def __expire_sessions(self):
+        now = time.monotonic()
+        while self.__sessions:
+            token = next(iter(self.__sessions))
+            if self.__sessions[token][1] > now:
+                break
+            del self.__sessions[token]
+
+    def __user_for(self, headers: dict):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        self.__expire_sessions()
+        session = self.__sessions.get(token) if scheme.lower() == "bearer" else None
+        user = self.__service.get_user(session[0]) if session else None
+        if user is None:
+            raise HTTPError(401, "Login required.")
+        return user
+
+    def __customer_for(self, headers: dict) -> Customer:
+        user = self.__user_for(headers)
+        if not isinstance(user, Customer):
+            raise HTTPError(403, "Only customers can make reservations.")
+        return user
+
+    # ----------------------------
+    # Routes
+    # ----------------------------
+
+    async def __register(self, data, query, headers):
+        customer = await self.__run(
+            self.__service.register, data.get("name", ""), data.get("email", ""), data.get("password", "")
+        )
+        return 201, _user_summary(customer)
+
+    async def __login(self, data, query, headers):
+        try:
+            user = await self.__run(self.__service.login, data.get("email", ""), data.get("password", ""))
+        except ValueError as e:
+            raise HTTPError(401, str(e))
+        token = secrets.token_urlsafe(24)
+        self.__expire_sessions()
+        self.__sessions[token] = (user.get_id(), time.monotonic() + self.__session_ttl)
+        return 200, dict(_user_summary(user), token=token)
+
+    async def __events(self, data, query, headers):
+        return 200, [event_summary(e) for e in self.__service.get_events()]
+
+    async def __quote(self, data, query, headers):
+        quantity = int(query.get("quantity", 1))
+        customer = self.__customer_for(headers) if "authorization" in headers else None
+        return 200, await self.__run(self.__service.quote, query.get("ticket", ""), quantity, customer)
+
+    async def __reserve(self, data, query, headers):
+        customer = self.__customer_for(headers)
+        items = data.get("items") or [data]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise HTTPError(400, "items must be a list of JSON objects.")
+        lines = [
+            (self.__service.get_event(item.get("event_id")), item.get("ticket", ""),
+             item.get("quantity", 1))
+            for item in items
+        ]
+        reservations = await self.__run(
+            self.__service.reserve_batch, customer, lines, data.get("payment_method", "")
+        )
+        return 201, [reservation_summary(r) for r in reservations]
+
+    async def __reservations(self, data, query, headers):
+        customer = self.__customer_for(headers)
+        return 200, await self.__run(self.__service.list_reservations, customer)
+
+    async def __sales_report(self, data, query, headers):
+        if not isinstance(self.__user_for(headers), Admin):
+            raise HTTPError(403, "Admins only.")
+        return 200, await self.__run(self.__service.sales_report)
+
+    async def __dashboard(self, data, query, headers):
+        if not isinstance(self.__user_for(headers), Admin):
+            raise HTTPError(403, "Admins only.")
+        return 200, await self.__run(self.__service.dashboard)
+
+
+async def _serve(args):
+    import metrics
+    from app_setup import build_service
+    from journal_storage import JournalDataManager
+
+    metrics.enable_from_env()
+
+    dm = JournalDataManager(folder=args.folder)
+    server = BookingServer(build_service(dm), workers=args.workers, session_ttl=args.session_ttl)
+    host, port = await server.start(args.host, args.port)
+    print(f"Booking server listening on http://{host}:{port}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+        dm.close()
+        metrics.stop_dump()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve bookings over HTTP/JSON.")
+    parser.add_argument("--folder", default="gui_data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--session-ttl", type=float, default=SESSION_TTL,
+                        help="seconds a login token stays valid")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
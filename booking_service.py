@@ -0,0 +1,347 @@
+# booking_service.py
+# Booking operations shared by the GUI, the HTTP server and batch callers.
+#
+# tm: TicketManager instance; dm: DataManager instance (any backend);
+# registry: UserRegistry for register/login; events: list of Event
+#
+# Methods return domain objects or plain dicts/lists that can be sent as
+# JSON as they are. The service may be called from several threads at once
+# (the server runs it in an executor); changes to shared state are made
+# under one lock, while seat holds use the inventory's own locks.
+
+import threading
+from datetime import datetime
+
+from classes import Customer, Event, Reservation, Ticket
+from seat_inventory import seats_for_ticket
+
+# Orders accepted by BookingService.reservations_page()
+RESERVATION_SORTS = ("newest", "oldest", "event date", "total")
+
+
+def reservation_summary(res: Reservation) -> dict:
+    event = res.get_event()
+    return {
+        "reservation_id": res.get_reservation_id(),
+        "event_id": event.get_event_id(),
+        "date": event.get_date(),
+        "location": event.get_location(),
+        "tickets": [
+            {"ticket": name, "quantity": qty, "price": price}
+            for _, name, price, qty in res.get_ticket_lines()
+        ],
+        "total_cost": res.get_total_cost(),
+        "payment_method": res.get_payment_method(),
+        "reserved_at": res.get_reservation_time().isoformat(),
+    }
+
+
+def _matches(summary: dict, query: str) -> bool:
+    # Case-insensitive search over what a reservation list shows
+    fields = [summary["reservation_id"], summary["date"], summary["location"],
+              str(summary["payment_method"])] + [t["ticket"] for t in summary["tickets"]]
+    return query.lower() in " ".join(fields).lower()
+
+
+def event_summary(event: Event) -> dict:
+    return {
+        "event_id": event.get_event_id(),
+        "date": event.get_date(),
+        "location": event.get_location(),
+    }
+
+
+class BookingService:
+    def __init__(self, tm, dm, registry=None, events: list = None):
+        self.__tm = tm
+        self.__dm = dm
+        self.__registry = registry
+        self.__events = {e.get_event_id(): e for e in events or []}
+        self.__lock = threading.RLock()
+
+    def get_ticket_manager(self):
+        return self.__tm
+
+    def get_data_manager(self):
+        return self.__dm
+
+    def set_data_manager(self, dm):
+        self.__dm = dm
+
+    def get_events(self) -> list:
+        return list(self.__events.values())
+
+    def get_event(self, event_id: str) -> Event:
+        event = self.__events.get(event_id)
+        if event is None:
+            raise ValueError("Invalid event selected.")
+        return event
+
+    def get_ticket_types(self) -> list:
+        return self.__tm.get_ticket_types()
+
+    def get_products(self) -> list:
+        # Ticket families such as GroupTicketProduct, booked by generated name
+        return self.__tm.get_products()
+
+    # ----------------------------
+    # Accounts
+    # ----------------------------
+
+    def __require_registry(self):
+        if self.__registry is None:
+            raise RuntimeError("No user registry configured.")
+        return self.__registry
+
+    def register(self, name: str, email: str, password: str) -> Customer:
+        registry = self.__require_registry()
+        name, email = name.strip(), email.strip()
+        if not name or not email or not password:
+            raise ValueError("All fields are required.")
+        with self.__lock:
+            if registry.is_email_taken(email):
+                raise ValueError("Email already registered.")
+            customer = Customer(name, email, password)
+            registry.add(customer)
+            self.__dm.save_user(customer)
+        return customer
+
+    def login(self, email: str, password: str):
+        user = self.__require_registry().authenticate(email.strip(), password)
+        if user is None:
+            raise ValueError("Invalid credentials")
+        return user
+
+    def get_user(self, user_id: str):
+        return self.__require_registry().get(user_id)
+
+    def update_details(self, user, name: str, email: str, password: str = None):
+        with self.__lock:
+            # The registry normalizes addresses, so changing only the case
+            # of one's own email is not a clash
+            if self.__registry is not None and self.__registry.find_by_email(email) not in (None, user):
+                raise ValueError("Email already registered.")
+            user.set_name(name)
+            user.set_email(email)
+            if password:
+                user.set_password(password)
+            self.__dm.save_user(user)
+
+    # ----------------------------
+    # Booking
+    # ----------------------------
+
+    def quote(self, ticket, quantity: int = 1, customer: Customer = None) -> dict:
+        if not isinstance(quantity, int) or quantity < 1:
+            raise ValueError(f"Invalid quantity: {quantity}")
+        ticket = self.__resolve_ticket(ticket)
+        with self.__lock:
+            return self.__tm.quote([(ticket, quantity)], customer)[0]
+
+    def reserve(self, customer: Customer, event_id: str, ticket, quantity: int,
+                payment_method: str) -> Reservation:
+        return self.reserve_batch(customer, [(self.get_event(event_id), ticket, quantity)],
+                                  payment_method)[0]
+
+    def list_reservations(self, customer: Customer) -> list:
+        return [reservation_summary(r) for r in customer.get_reservations()]
+
+    def reservations_page(self, customer: Customer, offset: int, limit: int,
+                          sort: str = "newest", query: str = "") -> dict:
+        # {"total": matching reservations, "reservations": summaries of one
+        # page}. Newest or oldest first without a query fetches just that
+        # page; other orders and searches need every reservation once.
+        if sort not in RESERVATION_SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        if sort in ("newest", "oldest") and not query:
+            page = customer.get_reservations_page(offset, limit, newest_first=sort == "newest")
+            return {
+                "total": len(customer.get_reservation_ids()),
+                "reservations": [reservation_summary(r) for r in page],
+            }
+        rows = self.list_reservations(customer)
+        if query:
+            rows = [r for r in rows if _matches(r, query)]
+        if sort == "newest":
+            rows.reverse()
+        elif sort == "event date":
+            rows.sort(key=lambda r: r["date"])
+        elif sort == "total":
+            rows.sort(key=lambda r: r["total_cost"], reverse=True)
+        return {"total": len(rows), "reservations": rows[offset:offset + limit]}
+
+    def __resolve_ticket(self, ticket) -> Ticket:
+        if isinstance(ticket, Ticket):
+            return ticket
+        found = self.__tm.get_ticket_by_name(ticket)
+        if found is None:
+            raise ValueError(f"Invalid ticket type selected: {ticket}")
+        return found
+
+    def reserve_batch(self, customer: Customer, items: list, payment_method: str) -> list:
+        # items: [(event, ticket or ticket name, quantity), ...]
+        # Everything is validated before any state changes, and the whole
+        # order is persisted in one transaction.
+        if not items:
+            raise ValueError("No tickets selected.")
+        if not payment_method:
+            raise ValueError("Payment method is required.")
+
+        lines = []
+        for event, ticket, quantity in items:
+            if not isinstance(event, Event):
+                raise ValueError("Invalid event selected.")
+            if not isinstance(quantity, int) or quantity < 1:
+                raise ValueError(f"Invalid quantity: {quantity}")
+            lines.append((event, self.__resolve_ticket(ticket), quantity))
+
+        # Take the seats first; a sold-out tier rejects the whole order
+        holds = self.__hold_seats(lines)
+        inventory = self.__tm.get_seat_inventory()
+        try:
+            reservations = self.__book(customer, lines, payment_method, holds)
+        except Exception:
+            for hold_id, _, _ in holds:
+                inventory.release(hold_id)
+            raise
+        # The order is saved: nothing below may fail it
+        for hold_id, event_id, seats in holds:
+            try:
+                inventory.confirm(hold_id)
+            except KeyError:
+                # The hold lapsed after the commit; the seats are sold anyway
+                inventory.record_sold(event_id, seats)
+        return reservations
+
+    def __hold_seats(self, lines: list) -> list:
+        inventory = self.__tm.get_seat_inventory()
+        if inventory is None:
+            return []
+        per_event = {}
+        for event, ticket, quantity in lines:
+            seats = per_event.setdefault(event.get_event_id(), {})
+            for tier, n in seats_for_ticket(ticket, quantity).items():
+                seats[tier] = seats.get(tier, 0) + n
+        holds = []  # [(hold id, event id, {tier: seats})]
+        try:
+            for event_id, seats in per_event.items():
+                holds.append((inventory.hold(event_id, seats), event_id, seats))
+        except Exception:
+            for hold_id, _, _ in holds:
+                inventory.release(hold_id)
+            raise
+        return holds
+
+    def __book(self, customer: Customer, lines: list, payment_method: str, holds: list) -> list:
+        with self.__lock:
+            return self.__book_locked(customer, lines, payment_method, holds)
+
+    def __book_locked(self, customer: Customer, lines: list, payment_method: str,
+                      holds: list) -> list:
+        quotes = self.__tm.quote([(ticket, quantity) for _, ticket, quantity in lines], customer)
+        reservations = []
+        for (event, ticket, quantity), quote in zip(lines, quotes):
+            reservations.append(Reservation(
+                customer_id=customer.get_id(),
+                tickets=[ticket] * quantity,
+                event=event,
+                payment_method=payment_method,
+                total_cost=quote["total"],
+            ))
+
+        # Sales reach the TicketManager only once the transaction has
+        # committed, so a failed booking leaves the report and ledger alone
+        sales = [
+            self.__tm.sale_entry(quantity, ticket=ticket, event=event,
+                                 revenue=res.get_total_cost(),
+                                 payment_method=payment_method,
+                                 discount=", ".join(quote["discounts"]))
+            for (event, ticket, quantity), res, quote in zip(lines, reservations, quotes)
+        ]
+        date_str = datetime.fromtimestamp(sales[0][0]).strftime("%Y-%m-%d")
+        # Renew the seat holds so they cannot lapse before reserve_batch
+        # confirms them; one that already has fails the order unsaved
+        inventory = self.__tm.get_seat_inventory()
+        for hold_id, _, _ in holds:
+            inventory.extend(hold_id)
+        for res in reservations:
+            customer.add_reservation(res)
+        try:
+            with self.__dm.transaction():
+                self.__dm.save_user(customer)
+                for res in reservations:
+                    self.__dm.add_reservation(res)
+                self.__dm.record_sales(date_str, sum(q for _, _, q in lines))
+                for sale in sales:
+                    self.__dm.add_sale_entry(sale)
+        except Exception:
+            for res in reservations:
+                customer.delete_reservation(res.get_reservation_id())
+            raise
+        for sale in sales:
+            self.__tm.add_sale_entry(sale)
+        return reservations
+
+    # ----------------------------
+    # Admin
+    # ----------------------------
+
+    def sales_report(self) -> dict:
+        # Tickets per day, with revenue for days the ledger covers, plus
+        # totals by ticket type
+        with self.__lock:
+            sales = self.__tm.get_sales_report()
+            if not sales:
+                return {"days": [], "revenue": 0.0, "by_ticket_type": {}}
+            revenue = {
+                row["period"].strftime("%Y-%m-%d"): row["revenue"]
+                for row in self.__tm.sales_between(min(sales), max(sales), group_by="day")
+            }
+            totals = self.__tm.get_ledger().totals()
+        return {
+            "days": [
+                {"date": date, "tickets": count, "revenue": revenue.get(date)}
+                for date, count in sales.items()
+            ],
+            "revenue": totals["revenue"],
+            "by_ticket_type": {name or "": t for name, t in totals["by_ticket_type"].items()},
+        }
+
+    def dashboard(self) -> dict:
+        # Revenue by day, event, ticket type, payment method and discount,
+        # read from totals kept up to date as sales are recorded. Events
+        # are labelled with their date and location. Days only in the older
+        # daily sales counts are listed with their tickets and revenue None.
+        with self.__lock:
+            data = self.__tm.get_ledger().dashboard()
+            sales = self.__tm.get_sales_report()
+        covered = {day["date"] for day in data["by_day"]}
+        legacy = [{"date": date, "tickets": count, "revenue": None}
+                  for date, count in sales.items() if date not in covered]
+        if legacy:
+            data["by_day"] = sorted(data["by_day"] + legacy, key=lambda day: day["date"])
+            data["tickets"] += sum(day["tickets"] for day in legacy)
+        by_event = {}
+        for event_id, t in data["by_event"].items():
+            event = self.__events.get(event_id)
+            label = f"{event.get_date()} {event.get_location()}" if event else event_id
+            by_event[label] = t
+        data["by_event"] = by_event
+        return data
+
+    def get_discounts(self) -> list:
+        # Active discounts first
+        discounts = self.__tm.get_discounts()
+        return [d for d in discounts if d.is_active()] + [d for d in discounts if not d.is_active()]
+
+    def toggle_discount(self, name: str):
+        with self.__lock:
+            discount = next((d for d in self.__tm.get_discounts() if d.get_name() == name), None)
+            if discount is None:
+                raise ValueError(f"Unknown discount: {name}")
+            if discount.is_active():
+                discount.deactivate()
+            else:
+                discount.activate()
+            self.__dm.save_discount(discount)
+        return discount
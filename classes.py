@@ -1,25 +1,148 @@
 # classes.py
 
+import sys
 import uuid
 import pickle
 import os
-from datetime import datetime
+import struct
+import contextlib
+import functools
+import itertools
+from datetime import datetime, timedelta
+
+from compressed_files import check_codec, file_codec, open_read, open_write, should_recompress
+from discount_rules import DEFAULT_GROUP, DiscountRules
+from sales_ledger import SalesLedger
 
 # ----------------------------
 # Domain Classes
 # ----------------------------
 
-class User:
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _pack_id(value):
+    # 16 raw bytes instead of a 36-char string; non-UUID ids are kept as-is
+    if isinstance(value, str):
+        try:
+            return uuid.UUID(value).bytes
+        except ValueError:
+            return value
+    return value
+
+
+def _unpack_id(value) -> str:
+    return str(uuid.UUID(bytes=value)) if isinstance(value, bytes) else value
+
+
+def _pack_time(value):
+    # Whole microseconds since 1970-01-01, naive like datetime.now()
+    if isinstance(value, datetime):
+        return (value - _EPOCH) // _MICROSECOND
+    return value
+
+
+def _unpack_time(value) -> datetime:
+    return _EPOCH + value * _MICROSECOND if isinstance(value, int) else value
+
+
+@functools.lru_cache(maxsize=None)
+def _product_key(key: str) -> bytes:
+    # Stable ticket-type id for the built-in products, the same on every
+    # run, packed; computed once per product (and group size)
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"grand-prix-ticket:{key}").bytes
+
+
+_PACKERS = {"id": _pack_id, "time": _pack_time}
+_LAYOUTS = {}  # class -> (slot names, {slot name: packer})
+
+
+def _layout(cls) -> tuple:
+    layout = _LAYOUTS.get(cls)
+    if layout is None:
+        names, packers = [], {}
+        for klass in reversed(cls.__mro__):
+            prefix = "_" + klass.__name__.lstrip("_")
+            for name in klass.__dict__.get("__slots__", ()):
+                # Single-underscore slots are runtime-only and never pickled
+                if name.startswith("__"):
+                    names.append(prefix + name)
+            for name, kind in klass.__dict__.get("_PACKED", {}).items():
+                packers[prefix + name] = _PACKERS[kind]
+        layout = _LAYOUTS[cls] = (tuple(names), packers)
+    return layout
+
+
+class _Record:
+    # Base for the __slots__ domain classes. Pickled state is a dict of
+    # (name-mangled) slot names, the same shape the old dict-based classes
+    # pickled, so existing data files still load. Ids and timestamps listed
+    # in _PACKED are converted to their compact form on load.
+    __slots__ = ()
+    _PACKED = {}
+
+    def __getstate__(self):
+        state = {}
+        for name in _layout(type(self))[0]:
+            try:
+                state[name] = getattr(self, name)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # (dict state, slot state) as written by default slot pickling
+            merged = {}
+            for part in state:
+                merged.update(part or {})
+            state = merged
+        packers = _layout(type(self))[1]
+        for name, value in state.items():
+            packer = packers.get(name)
+            try:
+                setattr(self, name, packer(value) if packer else value)
+            except AttributeError:
+                pass  # field that no longer exists
+
+
+class _Observable(_Record):
+    # Lets in-memory indexes hear about changes to the fields they are keyed
+    # on. Observers are runtime-only and never pickled.
+    __slots__ = ("_observers",)
+
+    def _add_observer(self, observer):
+        observers = getattr(self, "_observers", None)
+        if observers is None:
+            observers = self._observers = []
+        if observer not in observers:
+            observers.append(observer)
+
+    def _remove_observer(self, observer):
+        observers = getattr(self, "_observers", None)
+        if observers and observer in observers:
+            observers.remove(observer)
+
+    def _notify(self, event: str, *args):
+        for observer in getattr(self, "_observers", ()):
+            getattr(observer, event)(self, *args)
+
+
+class User(_Observable):
+    __slots__ = ("__user_id", "__name", "__email", "__password", "__created_at")
+    _PACKED = {"__user_id": "id", "__created_at": "time"}
+
     def __init__(self, name: str, email: str, password: str):
-        self.__user_id = str(uuid.uuid4())
+        self.__user_id = uuid.uuid4().bytes
         self.__name = name
         self.__email = email
         self.__password = password
-        self.__created_at = datetime.now()
+        self.__created_at = _pack_time(datetime.now())
 
     # Getters
     def get_id(self) -> str:
-        return self.__user_id
+        return _unpack_id(self.__user_id)
 
     def get_name(self) -> str:
         return self.__name
@@ -28,13 +151,15 @@ class User:
         return self.__email
 
     def get_created_at(self) -> datetime:
-        return self.__created_at
+        return _unpack_time(self.__created_at)
 
     # Setters
     def set_name(self, name: str):
         self.__name = name
 
     def set_email(self, email: str):
+        if email != self.__email:
+            self._notify("on_email_change", self.__email, email)
         self.__email = email
 
     def set_password(self, password: str):
@@ -46,23 +171,71 @@ class User:
 
 
 class Customer(User):
+    # Only reservation ids are persisted with the customer. The reservations
+    # themselves live in the reservation store and are fetched on first use.
+    __slots__ = ("__reservation_ids", "_loaded", "_store")
+
     def __init__(self, name: str, email: str, password: str):
         super().__init__(name, email, password)
-        self.__reservations = []
+        self.__reservation_ids = []
+        self._loaded = {}
+        self._store = None
+
+    def __setstate__(self, state):
+        reservations = None
+        if isinstance(state, dict) and "_Customer__reservations" in state:
+            # Older files embed the full reservation objects
+            state = dict(state)
+            reservations = state.pop("_Customer__reservations")
+            state["_Customer__reservation_ids"] = [
+                _pack_id(r.get_reservation_id()) for r in reservations
+            ]
+        super().__setstate__(state)
+        self._loaded = {}
+        self._store = None
+        for r in reservations or ():
+            self._loaded[_pack_id(r.get_reservation_id())] = r
+
+    def attach_store(self, store):
+        # store: anything with get_reservations_by_ids(ids), e.g. a DataManager
+        self._store = store
+
+    def get_reservation_ids(self) -> list:
+        return [_unpack_id(key) for key in self.__reservation_ids]
 
     def get_reservations(self) -> list:
-        return list(self.__reservations)
+        return self.__fetch(self.__reservation_ids)
+
+    def get_reservations_page(self, offset: int, limit: int, newest_first: bool = False) -> list:
+        # Only the page's reservations are fetched from the store
+        keys = self.__reservation_ids[::-1] if newest_first else self.__reservation_ids
+        return self.__fetch(keys[offset:offset + limit])
+
+    def __fetch(self, keys: list) -> list:
+        missing = [key for key in keys if key not in self._loaded]
+        if missing and self._store is not None:
+            for r in self._store.get_reservations_by_ids([_unpack_id(k) for k in missing]):
+                self._loaded[_pack_id(r.get_reservation_id())] = r
+        return [self._loaded[key] for key in keys if key in self._loaded]
+
+    def get_loaded_reservations(self) -> list:
+        # Reservations already in memory, without asking the store
+        return list(self._loaded.values())
 
     def add_reservation(self, res):
-        self.__reservations.append(res)
+        key = _pack_id(res.get_reservation_id())
+        self.__reservation_ids.append(key)
+        self._loaded[key] = res
 
     def delete_reservation(self, res_id: str):
-        self.__reservations = [
-            r for r in self.__reservations if r.get_reservation_id() != res_id
-        ]
+        key = _pack_id(res_id)
+        self.__reservation_ids = [k for k in self.__reservation_ids if k != key]
+        self._loaded.pop(key, None)
 
 
 class Admin(User):
+    __slots__ = ("__admin_code",)
+
     def __init__(self, name: str, email: str, password: str, admin_code: str):
         super().__init__(name, email, password)
         self.__admin_code = admin_code
@@ -74,22 +247,41 @@ class Admin(User):
         self.__admin_code = code
 
 
-class Ticket:
-    def __init__(self, name: str, price: float, valid_days: int, features: list):
-        self.__ticket_id = str(uuid.uuid4())
+class Ticket(_Observable):
+    __slots__ = ("__ticket_id", "__name", "__price", "__valid_days", "__features")
+    _PACKED = {"__ticket_id": "id"}
+
+    def __init__(self, name: str, price: float, valid_days: int, features: list,
+                 ticket_id: str = None):
+        self.__ticket_id = _pack_id(ticket_id) if ticket_id else uuid.uuid4().bytes
         self.__name = name
         self.__price = price
         self.__valid_days = valid_days
         self.__features = features
 
     def get_ticket_id(self) -> str:
-        return self.__ticket_id
+        return _unpack_id(self.__ticket_id)
+
+    # Id shared by every ticket of the same kind; reservations refer to it
+    def get_type_id(self) -> str:
+        return _unpack_id(self._type_key())
+
+    # get_type_id() packed, as catalogs and reservations store it
+    def _type_key(self):
+        return _pack_id(self.__ticket_id)
+
+    # Discounts for the product apply to every ticket it generates
+    def get_product_name(self) -> str:
+        return self.__name
 
     def get_name(self) -> str:
         return self.__name
 
     def set_name(self, name: str):
+        old = self.__name
         self.__name = name
+        if name != old:
+            self._notify("on_ticket_rename", old, name)
 
     def get_price(self) -> float:
         return self.__price
@@ -111,6 +303,8 @@ class Ticket:
 
 
 class SingleRaceTicket(Ticket):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             name="Single Race Ticket",
@@ -119,8 +313,13 @@ class SingleRaceTicket(Ticket):
             features=["Access to one race", "Standard seating"]
         )
 
+    def _type_key(self) -> bytes:
+        return _product_key("SingleRaceTicket")
+
 
 class WeekendPass(Ticket):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             name="Weekend Pass",
@@ -129,13 +328,22 @@ class WeekendPass(Ticket):
             features=["All weekend races", "Premium seating"]
         )
 
+    def _type_key(self) -> bytes:
+        return _product_key("WeekendPass")
+
 
 class GroupTicket(Ticket):
+    __slots__ = ("__group_size",)
+    PRODUCT_NAME = "Group Ticket"
+
+    @staticmethod
+    def unit_price(group_size: int) -> float:
+        return max(250.0, 300.0 - group_size * 5)
+
     def __init__(self, group_size: int):
-        unit_price = max(250.0, 300.0 - group_size * 5)
-        total_price = unit_price * group_size
+        total_price = self.unit_price(group_size) * group_size
         super().__init__(
-            name=f"Group Ticket ({group_size})",
+            name=f"{self.PRODUCT_NAME} ({group_size})",
             price=total_price,
             valid_days=1,
             features=["Group seating", "Discounted rate"]
@@ -148,8 +356,56 @@ class GroupTicket(Ticket):
     def set_group_size(self, size: int):
         self.__group_size = size
 
+    def _type_key(self) -> bytes:
+        return _product_key(f"GroupTicket:{self.__group_size}")
+
+    def get_product_name(self) -> str:
+        return self.PRODUCT_NAME
+
+
+class GroupTicketProduct:
+    # Group tickets for any size from min_size to max_size, priced with
+    # GroupTicket's unit-price formula. Each size is built once on first
+    # use and the same instance is returned from then on.
+    def __init__(self, min_size: int = 2, max_size: int = 50):
+        self.__min_size = min_size
+        self.__max_size = max_size
+        self.__tickets = {}  # size -> GroupTicket
+
+    def get_name(self) -> str:
+        return GroupTicket.PRODUCT_NAME
+
+    def get_size_range(self) -> tuple:
+        return self.__min_size, self.__max_size
+
+    def ticket(self, group_size: int) -> GroupTicket:
+        ticket = self.__tickets.get(group_size)
+        if ticket is None:
+            if not isinstance(group_size, int) or not self.__min_size <= group_size <= self.__max_size:
+                raise ValueError(
+                    f"Group size must be between {self.__min_size} and {self.__max_size}."
+                )
+            ticket = self.__tickets[group_size] = GroupTicket(group_size)
+            TICKET_CATALOG.intern(ticket)
+        return ticket
+
+    def ticket_for_name(self, name: str):
+        # "Group Ticket (7)" -> the size-7 ticket; None for other names
+        prefix = GroupTicket.PRODUCT_NAME + " ("
+        if not (name.startswith(prefix) and name.endswith(")")):
+            return None
+        size = name[len(prefix):-1]
+        if not size.isdigit():
+            return None
+        try:
+            return self.ticket(int(size))
+        except ValueError:
+            return None
+
 
 class SeasonMembership(Ticket):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             name="Season Membership",
@@ -158,14 +414,21 @@ class SeasonMembership(Ticket):
             features=["Year-round access", "VIP seating", "Paddock access", "Meet & greet sessions"]
         )
 
-class Event:
-    def __init__(self, date: str, location: str):
-        self.__event_id = str(uuid.uuid4())
+    def _type_key(self) -> bytes:
+        return _product_key("SeasonMembership")
+
+class Event(_Record):
+    __slots__ = ("__event_id", "__date", "__location", "__capacity")
+    _PACKED = {"__event_id": "id"}
+
+    def __init__(self, date: str, location: str, capacity: dict = None, event_id: str = None):
+        self.__event_id = _pack_id(event_id) if event_id else uuid.uuid4().bytes
         self.__date = date
         self.__location = location
+        self.__capacity = dict(capacity) if capacity else {}  # seating tier -> seats
 
     def get_event_id(self) -> str:
-        return self.__event_id
+        return _unpack_id(self.__event_id)
 
     def get_date(self) -> str:
         return self.__date
@@ -179,29 +442,133 @@ class Event:
     def set_location(self, location: str):
         self.__location = location
 
+    def get_capacity(self) -> dict:
+        try:
+            return dict(self.__capacity)
+        except AttributeError:  # events saved before capacities existed
+            return {}
+
+    def set_capacity(self, capacity: dict):
+        self.__capacity = dict(capacity)
 
-class Reservation:
-    def __init__(self, customer_id: str, tickets: list, event: Event, payment_method: str):
-        self.__reservation_id = str(uuid.uuid4())
-        self.__customer_id = customer_id
-        self.__tickets = tickets
+
+class TicketCatalog:
+    # One shared Ticket per ticket type. Reservations only keep the type id,
+    # a price snapshot and a quantity, and resolve tickets through here.
+    # Each TicketManager owns a catalog of the tickets it registered;
+    # TICKET_CATALOG is the fallback for reservations resolved without one,
+    # and only ever interns, so no reservation replaces a ticket in it.
+    def __init__(self):
+        self.__tickets = {}  # packed type id -> Ticket
+        self.__keys = {}  # packed type id -> the one key object handed out
+
+    def key_for(self, key):
+        # Canonical key object, so every reservation shares the same bytes
+        return self.__keys.setdefault(key, key)
+
+    def put(self, ticket: Ticket):
+        # Make this instance the canonical ticket for its type
+        key = self.key_for(ticket._type_key())
+        self.__tickets[key] = ticket
+        return key
+
+    def intern(self, ticket: Ticket):
+        # Like put(), but an already catalogued ticket wins
+        key = ticket._type_key()
+        if key not in self.__tickets:
+            key = self.key_for(key)
+            self.__tickets[key] = ticket
+        return self.__keys[key]
+
+    def get(self, type_id):
+        return self.__tickets.get(_pack_id(type_id))
+
+    def __len__(self) -> int:
+        return len(self.__tickets)
+
+
+TICKET_CATALOG = TicketCatalog()
+
+
+def _ticket_lines(tickets: list, add) -> list:
+    # Collapse a ticket list into [type key, name, unit price, quantity] lines
+    lines = []
+    by_type = {}
+    for t in tickets:
+        key = add(t)
+        price = t.get_price()
+        line = by_type.get((key, price))
+        if line is None:
+            line = by_type[(key, price)] = [key, sys.intern(t.get_name()), price, 0]
+            lines.append(line)
+        line[3] += 1
+    return [tuple(line) for line in lines]
+
+
+class Reservation(_Record):
+    __slots__ = (
+        "__reservation_id", "__customer_id", "__lines", "__event",
+        "__total_cost", "__payment_method", "__reservation_time",
+    )
+    _PACKED = {"__reservation_id": "id", "__customer_id": "id", "__reservation_time": "time"}
+
+    def __init__(self, customer_id: str, tickets: list, event: Event, payment_method: str,
+                 total_cost: float = None):
+        self.__reservation_id = uuid.uuid4().bytes
+        self.__customer_id = _pack_id(customer_id)
+        self.__lines = _ticket_lines(tickets, TICKET_CATALOG.intern)
         self.__event = event
-        self.__total_cost = sum(t.get_price() for t in tickets)
+        # Callers that already priced the tickets (e.g. after discounts) pass the total
+        if total_cost is None:
+            total_cost = self.__line_total()
+        self.__total_cost = total_cost
         self.__payment_method = payment_method
-        self.__reservation_time = datetime.now()
+        self.__reservation_time = _pack_time(datetime.now())
+
+    def __setstate__(self, state):
+        if isinstance(state, dict) and "_Reservation__tickets" in state:
+            # Older files embed full Ticket objects; keep only references
+            state = dict(state)
+            tickets = state.pop("_Reservation__tickets")
+            state["_Reservation__lines"] = _ticket_lines(tickets, TICKET_CATALOG.intern)
+        super().__setstate__(state)
+        # Share the catalog's key objects instead of one copy per reservation
+        self.__lines = tuple(
+            (TICKET_CATALOG.key_for(key), sys.intern(name), price, qty)
+            for key, name, price, qty in self.__lines
+        )
+
+    def __line_total(self) -> float:
+        return sum(price * qty for _, _, price, qty in self.__lines)
 
     def get_reservation_id(self) -> str:
-        return self.__reservation_id
+        return _unpack_id(self.__reservation_id)
 
     def get_customer_id(self) -> str:
-        return self.__customer_id
-
-    def get_tickets(self) -> list:
-        return list(self.__tickets)
+        return _unpack_id(self.__customer_id)
+
+    def get_ticket_lines(self) -> list:
+        # [(type id, ticket name, unit price at purchase, quantity), ...]
+        return [(_unpack_id(key), name, price, qty) for key, name, price, qty in self.__lines]
+
+    def get_tickets(self, catalog: TicketCatalog = None) -> list:
+        # catalog: e.g. a TicketManager's, tried before the shared one
+        tickets = []
+        for key, name, price, qty in self.__lines:
+            ticket = catalog.get(key) if catalog is not None else None
+            if ticket is None:
+                ticket = TICKET_CATALOG.get(key)
+            if ticket is None:
+                # Type not catalogued in this process: a stand-in with the
+                # line's name and price, left out of the catalog so it never
+                # shadows the real ticket once that is built
+                ticket = Ticket(name, price, 0, [], ticket_id=_unpack_id(key))
+            tickets.extend([ticket] * qty)
+        return tickets
 
     def set_tickets(self, tickets: list):
-        self.__tickets = tickets
-        self.__total_cost = sum(t.get_price() for t in tickets)
+        self.__lines = _ticket_lines(tickets, TICKET_CATALOG.intern)
+        self.__total_cost = self.__line_total()
 
     def get_event(self) -> Event:
         return self.__event
@@ -219,15 +586,43 @@ class Reservation:
         self.__payment_method = method
 
     def get_reservation_time(self) -> datetime:
-        return self.__reservation_time
-
-
-class Discount:
-    def __init__(self, name: str, percentage: int, ticket_type: str):
+        return _unpack_time(self.__reservation_time)
+
+
+class Discount(_Observable):
+    # A pricing rule for one ticket type. Discounts in the same group are
+    # exclusive (the highest priority, then the biggest, applies); discounts
+    # in different groups stack. starts/ends bound when it is valid (end
+    # exclusive), min_quantity is per line, and customer_ids limits it to
+    # those customers. Changes are reported to TicketManager so it only
+    # recompiles the rules for this ticket type.
+    __slots__ = (
+        "__name", "__percentage", "__ticket_type", "__active", "__priority", "__group",
+        "__starts", "__ends", "__min_quantity", "__customer_ids",
+    )
+
+    def __init__(self, name: str, percentage: int, ticket_type: str, priority: int = 0,
+                 group: str = DEFAULT_GROUP, starts: datetime = None, ends: datetime = None,
+                 min_quantity: int = 1, customer_ids=None):
         self.__name = name
         self.__percentage = percentage
         self.__ticket_type = ticket_type
         self.__active = True
+        self.__priority = priority
+        self.__group = group
+        self.__starts = starts
+        self.__ends = ends
+        self.__min_quantity = min_quantity
+        self.__customer_ids = frozenset(customer_ids) if customer_ids is not None else None
+
+    def __setstate__(self, state):
+        # Discounts saved before rules had these fields get the defaults
+        self.__priority = 0
+        self.__group = DEFAULT_GROUP
+        self.__starts = self.__ends = None
+        self.__min_quantity = 1
+        self.__customer_ids = None
+        super().__setstate__(state)
 
     def get_name(self) -> str:
         return self.__name
@@ -240,21 +635,82 @@ class Discount:
 
     def set_percentage(self, pct: int):
         self.__percentage = pct
+        self._notify("on_discount_change", self.__ticket_type)
 
     def get_ticket_type(self) -> str:
         return self.__ticket_type
 
     def set_ticket_type(self, ttype: str):
+        old = self.__ticket_type
         self.__ticket_type = ttype
+        if ttype != old:
+            self._notify("on_discount_change", old)
 
     def is_active(self) -> bool:
         return self.__active
 
     def activate(self):
-        self.__active = True
+        if not self.__active:
+            self.__active = True
+            self._notify("on_discount_change", self.__ticket_type)
 
     def deactivate(self):
-        self.__active = False
+        if self.__active:
+            self.__active = False
+            self._notify("on_discount_change", self.__ticket_type)
+
+    def get_priority(self) -> int:
+        return self.__priority
+
+    def set_priority(self, priority: int):
+        self.__priority = priority
+        self._notify("on_discount_change", self.__ticket_type)
+
+    def get_group(self) -> str:
+        return self.__group
+
+    def set_group(self, group: str):
+        self.__group = group
+        self._notify("on_discount_change", self.__ticket_type)
+
+    def get_window(self) -> tuple:
+        return self.__starts, self.__ends
+
+    def set_window(self, starts: datetime = None, ends: datetime = None):
+        self.__starts, self.__ends = starts, ends
+        self._notify("on_discount_change", self.__ticket_type)
+
+    def get_min_quantity(self) -> int:
+        return self.__min_quantity
+
+    def set_min_quantity(self, quantity: int):
+        self.__min_quantity = quantity
+        self._notify("on_discount_change", self.__ticket_type)
+
+    def get_customer_ids(self):
+        # None when every customer is eligible
+        return self.__customer_ids
+
+    def set_customer_ids(self, customer_ids):
+        self.__customer_ids = frozenset(customer_ids) if customer_ids is not None else None
+        self._notify("on_discount_change", self.__ticket_type)
+
+    def is_conditional(self) -> bool:
+        return (self.__starts is not None or self.__ends is not None
+                or self.__min_quantity > 1 or self.__customer_ids is not None)
+
+    def applies_to(self, quantity: int = 1, customer_id: str = None, at: datetime = None) -> bool:
+        if not self.__active or quantity < self.__min_quantity:
+            return False
+        if self.__customer_ids is not None and customer_id not in self.__customer_ids:
+            return False
+        if self.__starts is not None or self.__ends is not None:
+            at = at or datetime.now()
+            if self.__starts is not None and at < self.__starts:
+                return False
+            if self.__ends is not None and at >= self.__ends:
+                return False
+        return True
 
     def apply_discount(self, price: float) -> float:
         if self.__active:
@@ -266,71 +722,422 @@ class Discount:
 # Management Classes
 # ----------------------------
 
+class UserRegistry:
+    # Email and id indexes over every loaded user. Emails are matched
+    # case-insensitively and the index follows User.set_email.
+    def __init__(self, users: list = None):
+        self.__by_email = {}
+        self.__by_id = {}
+        self.__customers = {}
+        self.__admins = {}
+        for u in users or []:
+            # Keep the first account if legacy data has clashing emails
+            self.__by_email.setdefault(self.normalize_email(u.get_email()), u)
+            self.__index(u)
+
+    @staticmethod
+    def normalize_email(email: str) -> str:
+        return email.strip().lower()
+
+    def __index(self, user: User):
+        self.__by_id[user.get_id()] = user
+        if isinstance(user, Admin):
+            self.__admins[user.get_id()] = user
+        elif isinstance(user, Customer):
+            self.__customers[user.get_id()] = user
+        user._add_observer(self)
+
+    def add(self, user: User):
+        key = self.normalize_email(user.get_email())
+        existing = self.__by_email.get(key)
+        if existing is not None and existing is not user:
+            raise ValueError("Email already registered.")
+        self.__by_email[key] = user
+        self.__index(user)
+
+    def remove(self, user_id: str):
+        user = self.__by_id.pop(user_id, None)
+        if user is None:
+            return
+        self.__customers.pop(user_id, None)
+        self.__admins.pop(user_id, None)
+        key = self.normalize_email(user.get_email())
+        if self.__by_email.get(key) is user:
+            del self.__by_email[key]
+        user._remove_observer(self)
+
+    def get(self, user_id: str):
+        return self.__by_id.get(user_id)
+
+    def find_by_email(self, email: str):
+        return self.__by_email.get(self.normalize_email(email))
+
+    def is_email_taken(self, email: str) -> bool:
+        return self.normalize_email(email) in self.__by_email
+
+    def authenticate(self, email: str, password: str):
+        user = self.find_by_email(email)
+        if user is not None and user.check_password(password):
+            return user
+        return None
+
+    # Live views, not copies
+    def users(self):
+        return self.__by_id.values()
+
+    def customers(self):
+        return self.__customers.values()
+
+    def admins(self):
+        return self.__admins.values()
+
+    def __len__(self) -> int:
+        return len(self.__by_id)
+
+    def on_email_change(self, user: User, old: str, new: str):
+        new_key = self.normalize_email(new)
+        owner = self.__by_email.get(new_key)
+        if owner is not None and owner is not user:
+            raise ValueError("Email already registered.")
+        old_key = self.normalize_email(old)
+        if self.__by_email.get(old_key) is user:
+            del self.__by_email[old_key]
+        self.__by_email[new_key] = user
+
+
 class TicketManager:
     def __init__(self):
         self.__ticket_types = []
-        self.__discounts = []
+        self.__tickets_by_name = {}
+        self.__products = []  # e.g. GroupTicketProduct, for names not registered
+        self.__rules = DiscountRules()
         self.__sales_log = {}  # date_str -> int
+        self.__ledger = SalesLedger()
+        self.__seat_inventory = None
+        self.__catalog = TicketCatalog()
 
     def register_ticket(self, ticket: Ticket):
         self.__ticket_types.append(ticket)
+        self.__catalog.put(ticket)
+        TICKET_CATALOG.intern(ticket)
+        self.__tickets_by_name.setdefault(ticket.get_name(), ticket)
+        ticket._add_observer(self)
+
+    def register_product(self, product):
+        self.__products.append(product)
+
+    def get_products(self) -> list:
+        return list(self.__products)
 
     def get_ticket_by_name(self, name: str):
-        for t in self.__ticket_types:
-            if t.get_name() == name:
-                return t
-        return None
+        ticket = self.__tickets_by_name.get(name)
+        if ticket is None:
+            for product in self.__products:
+                ticket = product.ticket_for_name(name)
+                if ticket is not None:
+                    self.__catalog.intern(ticket)
+                    break
+        return ticket
+
+    def get_seat_inventory(self):
+        return self.__seat_inventory
+
+    def set_seat_inventory(self, inventory):
+        self.__seat_inventory = inventory
+
+    def get_catalog(self) -> TicketCatalog:
+        return self.__catalog
+
+    def get_ticket_by_type_id(self, type_id: str):
+        return self.__catalog.get(type_id)
 
     def get_ticket_types(self) -> list:
         return [t.get_name() for t in self.__ticket_types]
 
     def add_discount(self, discount: Discount):
-        self.__discounts.append(discount)
+        self.__rules.add(discount)
+        discount._add_observer(self)
+
+    def get_discounts(self) -> list:
+        return self.__rules.get_discounts()
 
     def get_active_discounts(self) -> list:
-        return [d for d in self.__discounts if d.is_active()]
+        return [d for d in self.__rules.get_discounts() if d.is_active()]
+
+    def get_discount_rules(self) -> DiscountRules:
+        return self.__rules
+
+    def on_discount_change(self, discount: Discount, old_type: str):
+        # Only the compiled rules for these ticket types are rebuilt
+        self.__rules.invalidate(old_type, discount.get_ticket_type())
+
+    def on_ticket_rename(self, ticket: Ticket, old: str, new: str):
+        if self.__tickets_by_name.get(old) is ticket:
+            del self.__tickets_by_name[old]
+            # Another ticket registered under the old name takes over
+            for t in self.__ticket_types:
+                if t is not ticket and t.get_name() == old:
+                    self.__tickets_by_name[old] = t
+                    break
+        self.__tickets_by_name.setdefault(new, ticket)
 
     def apply_discount(self, ticket: Ticket) -> float:
-        for d in self.__discounts:
-            if d.get_ticket_type() == ticket.get_name() and d.is_active():
-                return d.apply_discount(ticket.get_price())
-        return ticket.get_price()
+        # Single ticket, no customer, now
+        return self.__rules.price(ticket.get_name(), ticket.get_price(),
+                                  product=ticket.get_product_name())[0]
+
+    def price_many(self, tickets: list) -> list:
+        # Final price for each ticket in a basket, resolving each
+        # (ticket type, base price) pair only once
+        resolved = {}
+        prices = []
+        for t in tickets:
+            key = (t.get_name(), t.get_price())
+            if key not in resolved:
+                resolved[key] = self.__rules.price(*key, product=t.get_product_name())[0]
+            prices.append(resolved[key])
+        return prices
+
+    def quote(self, basket: list, customer=None, at_time: datetime = None) -> list:
+        # basket: [(ticket, quantity), ...]; customer: Customer, id or None.
+        # One dict per line with the unit price and the discounts applied.
+        customer_id = customer.get_id() if isinstance(customer, User) else customer
+        at_time = at_time or datetime.now()
+        resolved = {}
+        lines = []
+        for ticket, quantity in basket:
+            key = (ticket.get_name(), ticket.get_price(), quantity)
+            if key not in resolved:
+                resolved[key] = self.__rules.price(*key, customer_id=customer_id, at=at_time,
+                                                   product=ticket.get_product_name())
+            unit_price, rules = resolved[key]
+            lines.append({
+                "ticket": key[0],
+                "quantity": quantity,
+                "base_price": key[1],
+                "unit_price": unit_price,
+                "total": round(unit_price * quantity, 2),
+                "discounts": [r.get_name() for r in rules],
+            })
+        return lines
+
+    def record_sale(self, quantity: int = 1, ticket: Ticket = None, event: Event = None,
+                    revenue: float = 0.0, payment_method: str = "",
+                    discount: str = "") -> tuple:
+        # discount: name(s) of the discounts applied
+        return self.add_sale_entry(self.sale_entry(quantity, ticket, event, revenue,
+                                                   payment_method, discount))
+
+    @staticmethod
+    def sale_entry(quantity: int = 1, ticket: Ticket = None, event: Event = None,
+                   revenue: float = 0.0, payment_method: str = "",
+                   discount: str = "") -> tuple:
+        # The ledger entry record_sale would add, without adding it; pass it
+        # to add_sale_entry once the sale is stored
+        return (
+            datetime.now().timestamp(),
+            ticket.get_name() if ticket else "",
+            event.get_event_id() if event else "",
+            quantity,
+            revenue,
+            payment_method,
+            discount,
+        )
 
-    def record_sale(self, quantity: int = 1):
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        self.__sales_log[date_str] = self.__sales_log.get(date_str, 0) + quantity
+    def add_sale_entry(self, entry: tuple) -> tuple:
+        date_str = datetime.fromtimestamp(entry[0]).strftime("%Y-%m-%d")
+        self.__sales_log[date_str] = self.__sales_log.get(date_str, 0) + entry[3]
+        return self.__ledger.add_entry(entry)
 
     def get_sales_report(self) -> dict:
         return dict(self.__sales_log)
 
+    def set_sales_log(self, sales: dict):
+        self.__sales_log = dict(sales)
+
+    def get_ledger(self) -> SalesLedger:
+        return self.__ledger
+
+    def set_ledger(self, ledger: SalesLedger):
+        self.__ledger = ledger
+
+    def sales_between(self, start, end, group_by: str = "day") -> list:
+        return self.__ledger.sales_between(start, end, group_by)
+
+
+# Record files start with this marker followed by length-prefixed records
+# (record_codec payloads, or pickles in older files), so they can be
+# appended to and read one record at a time
+_RECORD_MAGIC = b"GPREC1\n"
+_RECORD_LEN = struct.Struct(">I")
+
+
+def _is_record_file(f) -> bool:
+    head = f.read(len(_RECORD_MAGIC))
+    if head == _RECORD_MAGIC:
+        return True
+    f.seek(0)
+    return False
+
+
+def _write_records(f, items):
+    for payload in record_codec.dumps_many(items):
+        f.write(_RECORD_LEN.pack(len(payload)))
+        f.write(payload)
+
+
+def _read_records(f, skip: int = 0):
+    # Yields raw payloads; the first `skip` are seeked over undecoded
+    while True:
+        try:
+            header = f.read(_RECORD_LEN.size)
+            if len(header) < _RECORD_LEN.size:
+                return
+            (length,) = _RECORD_LEN.unpack(header)
+            if skip:
+                f.seek(length, os.SEEK_CUR)
+                skip -= 1
+                continue
+            payload = f.read(length)
+        except EOFError:
+            return  # a compressed member cut short, like a torn record
+        if len(payload) < length:
+            return
+        yield payload
+
 
 class DataManager:
-    def __init__(self, folder: str = "."):
+    # compression: None, a codec name ("lzma", "gzip", "zlib") for every file,
+    # or a dict {file key: codec} for some of them. It only affects writing;
+    # files are read in whatever format their header says.
+    # shard_by: None, or "event" / "date" to split reservations into one file
+    # per event or event date under folder/reservations/ (reservation_shards).
+    # A store that still has a reservations.pkl is seeded from it on first use.
+    def __init__(self, folder: str = ".", compression=None, shard_by: str = None):
         self.__folder = folder
         self.__files = {
             "users": os.path.join(folder, "users.pkl"),
             "reservations": os.path.join(folder, "reservations.pkl"),
             "discounts": os.path.join(folder, "discounts.pkl"),
-            "sales": os.path.join(folder, "sales.pkl")
+            "sales": os.path.join(folder, "sales.pkl"),
+            "ledger": os.path.join(folder, "sales_ledger.pkl")
         }
+        # Lists stored as record files instead of one big pickle
+        self.__record_keys = {"reservations"}
+        if isinstance(compression, dict):
+            unknown = set(compression) - set(self.__files)
+            if unknown:
+                raise ValueError(f"Unknown data files: {', '.join(sorted(unknown))}")
+            self.__codecs = {k: check_codec(compression.get(k)) for k in self.__files}
+        else:
+            self.__codecs = dict.fromkeys(self.__files, check_codec(compression))
+        self.__shards = None
+        if shard_by is not None:
+            self.__shards = reservation_shards.ReservationShards(
+                os.path.join(folder, "reservations"), shard_by, self.__codecs["reservations"]
+            )
+        self.__pending = None  # key -> data buffered by transaction()
+        self.__appends = {}  # key -> records to append when the transaction ends
+        self.__appendable = set()  # keys whose file was checked to take appends as-is
 
     def __load_data(self, key: str):
-        path = self.__files[key]
+        if self.__pending is not None and key in self.__pending:
+            return self.__pending[key]
+        if self.__is_sharded(key):
+            data = record_codec.loads_many(self.__sharded().payloads())
+        else:
+            data = self.__read_file(self.__files[key])
+        return data + self.__appends.get(key, []) if key in self.__appends else data
+
+    @staticmethod
+    def __read_file(path: str):
         if not os.path.exists(path):
             return []
-        with open(path, "rb") as f:
-            return pickle.load(f)
+        with open_read(path) as f:
+            if _is_record_file(f):
+                return record_codec.loads_many(_read_records(f))
+            return record_codec.load(f)
+
+    def __is_sharded(self, key: str) -> bool:
+        return key == "reservations" and self.__shards is not None
+
+    def __sharded(self):
+        # The shard store, seeded from reservations.pkl the first time
+        shards = self.__shards
+        legacy = self.__files["reservations"]
+        if not shards.exists() and os.path.exists(legacy):
+            shards.save(self.__read_file(legacy))
+        return shards
 
     def __save_data(self, key: str, data):
+        if self.__pending is not None:
+            self.__pending[key] = data
+            self.__appends.pop(key, None)
+            return
+        if self.__is_sharded(key):
+            self.__shards.save(data)
+            return
+        # Write to a temp file first so a crash never leaves a half-written file
         path = self.__files[key]
-        with open(path, "wb") as f:
-            pickle.dump(data, f)
+        tmp = path + ".tmp"
+        with open_write(tmp, self.__codecs.get(key)) as f:
+            if key in self.__record_keys:
+                f.write(_RECORD_MAGIC)
+                _write_records(f, data)
+            elif key in record_codec.SCHEMAS:
+                record_codec.dump(key, data, f)
+            else:
+                pickle.dump(data, f)
+        os.replace(tmp, path)
+
+    def __append_records(self, key: str, items: list):
+        if self.__pending is not None:
+            if key in self.__pending:
+                self.__pending[key].extend(items)
+            else:
+                self.__appends.setdefault(key, []).extend(items)
+            return
+        if self.__is_sharded(key):
+            self.__sharded().append(items)
+            return
+        path = self.__files[key]
+        codec = self.__codecs.get(key)
+        if key not in self.__appendable and os.path.exists(path):
+            with open_read(path) as f:
+                is_records = _is_record_file(f)
+            if not is_records or file_codec(path) != codec:
+                # Convert an old single-pickle file, or one compressed
+                # differently, before appending to it
+                self.__save_data(key, self.__load_data(key))
+            self.__appendable.add(key)
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open_write(path, codec, append=True) as f:
+            if fresh:
+                f.write(_RECORD_MAGIC)
+            _write_records(f, items)
+        if codec is not None and should_recompress(path):
+            # Appends to a compressed file stay uncompressed until a rewrite
+            self.__save_data(key, self.__load_data(key))
+
+    def __iter_records(self, key: str, skip: int = 0):
+        # Raw payloads from a record file, or encoded items from an old file
+        if self.__is_sharded(key):
+            yield from self.__sharded().payloads(skip=skip)
+            return
+        path = self.__files[key]
+        if not os.path.exists(path):
+            return
+        with open_read(path) as f:
+            if _is_record_file(f):
+                yield from _read_records(f, skip)
+                return
+        yield from record_codec.dumps_many(self.__load_data(key)[skip:])
 
     def save_users(self, users: list):
         self.__save_data("users", users)
 
     def load_users(self) -> list:
-        return self.__load_data("users")
+        return self._attach(self.__load_data("users"))
 
     def save_reservations(self, reservations: list):
         self.__save_data("reservations", reservations)
@@ -351,3 +1158,182 @@ class DataManager:
         data = self.__load_data("sales")
         return data if isinstance(data, dict) else {}
 
+    def save_ledger(self, ledger: SalesLedger):
+        self.__save_data("ledger", ledger)
+
+    def load_ledger(self) -> SalesLedger:
+        data = self.__load_data("ledger")
+        return data if isinstance(data, SalesLedger) else SalesLedger()
+
+    def _attach(self, users: list) -> list:
+        # Let loaded customers fetch their reservations from this store
+        for u in users:
+            if isinstance(u, Customer):
+                u.attach_store(self)
+        return users
+
+    @staticmethod
+    def embedded_reservations(users: list, reservations: list) -> list:
+        # Reservations that older files only kept inside their Customer
+        known = {r.get_reservation_id() for r in reservations}
+        found = []
+        for u in users:
+            if isinstance(u, Customer):
+                for r in u.get_loaded_reservations():
+                    if r.get_reservation_id() not in known:
+                        known.add(r.get_reservation_id())
+                        found.append(r)
+        return found
+
+    def iter_reservations(self, filter=None, batch_size: int = 1000):
+        # Decodes batch_size records at a time, so memory stays flat however
+        # long the history is. filter: optional callable(Reservation) -> bool
+        payloads = self.__iter_records("reservations")
+        while True:
+            batch = record_codec.loads_many(itertools.islice(payloads, batch_size))
+            if not batch:
+                return
+            for res in batch:
+                if filter is None or filter(res):
+                    yield res
+
+    def page_reservations(self, offset: int, limit: int) -> list:
+        # Records before the page are skipped without being decoded
+        payloads = self.__iter_records("reservations", skip=offset)
+        return record_codec.loads_many(itertools.islice(payloads, limit))
+
+    def count_reservations(self) -> int:
+        if self.__shards is not None:
+            return self.__sharded().count()
+        return sum(1 for _ in self.__iter_records("reservations"))
+
+    def get_reservations_by_ids(self, ids: list) -> list:
+        wanted = set(ids)
+        found = {}
+        for r in self.iter_reservations(lambda r: r.get_reservation_id() in wanted):
+            found[r.get_reservation_id()] = r
+        return [found[i] for i in ids if i in found]
+
+    def reservations_for_customer(self, customer_id: str) -> list:
+        return list(self.iter_reservations(lambda r: r.get_customer_id() == customer_id))
+
+    def reservations_for_event(self, event_id: str) -> list:
+        return self.__select_reservations(
+            lambda r: r.get_event().get_event_id() == event_id, event_id=event_id
+        )
+
+    def reservations_for_event_dates(self, start: str, end: str) -> list:
+        # Inclusive range on the event date, "YYYY-MM-DD" strings
+        return self.__select_reservations(
+            lambda r: start <= r.get_event().get_date() <= end, start=start, end=end
+        )
+
+    def __select_reservations(self, filter, **prune) -> list:
+        # With shards, only those the manifest matches with `prune` are read
+        if self.__shards is None:
+            return list(self.iter_reservations(filter))
+        shards = self.__sharded()
+        return [r for r in record_codec.loads_many(shards.payloads(shards.select(**prune))) if filter(r)]
+
+    def seal_past_shards(self, today: str = None) -> list:
+        # Makes the shards of events before today ("YYYY-MM-DD") read-only;
+        # returns their keys
+        if self.__shards is None:
+            return []
+        return self.__sharded().seal_past(today)
+
+    def get_shards(self) -> dict:
+        # The shard manifest, {} when reservations are not sharded
+        return self.__sharded().manifest() if self.__shards is not None else {}
+
+    def get_compression(self) -> dict:
+        return dict(self.__codecs)
+
+    def migrate(self) -> list:
+        # Reload and rewrite every existing file in the current format (and
+        # with the configured compression)
+        migrated = []
+        with self.transaction():
+            reservations = self.load_reservations()
+            orphans = self.embedded_reservations(self.load_users(), reservations)
+            if orphans:
+                self.save_reservations(reservations + orphans)
+            for key, path in self.__files.items():
+                sharded = self.__is_sharded(key) and self.__shards.exists()
+                if os.path.exists(path) or key in self.__pending or sharded:
+                    self.__save_data(key, self.__load_data(key))
+                    migrated.append(key)
+        return migrated
+
+    # Changes made inside the block are buffered and each touched file is
+    # written once when it exits; nothing is written if it raises.
+    @contextlib.contextmanager
+    def transaction(self):
+        if self.__pending is not None:
+            yield self
+            return
+        self.__pending = {}
+        try:
+            yield self
+        except BaseException:
+            self.__pending = None
+            self.__appends = {}
+            raise
+        pending, self.__pending = self.__pending, None
+        appends, self.__appends = self.__appends, {}
+        for key, data in pending.items():
+            self.__save_data(key, data)
+        for key, items in appends.items():
+            self.__append_records(key, items)
+
+    # Single-record operations. Most still rewrite the whole file here;
+    # reservations are appended as one record. Other backends override these.
+
+    def save_user(self, user: User):
+        users = self.load_users()
+        for i, u in enumerate(users):
+            if u.get_id() == user.get_id():
+                users[i] = user
+                break
+        else:
+            users.append(user)
+        self.save_users(users)
+
+    def delete_user(self, user_id: str):
+        self.save_users([u for u in self.load_users() if u.get_id() != user_id])
+
+    def add_reservation(self, reservation: Reservation):
+        self.__append_records("reservations", [reservation])
+
+    def delete_reservation(self, res_id: str):
+        if self.__shards is not None and self.__pending is None:
+            self.__sharded().delete(res_id)
+            return
+        self.save_reservations([
+            r for r in self.load_reservations() if r.get_reservation_id() != res_id
+        ])
+
+    def save_discount(self, discount: Discount):
+        discounts = self.load_discounts()
+        for i, d in enumerate(discounts):
+            if d.get_name() == discount.get_name():
+                discounts[i] = discount
+                break
+        else:
+            discounts.append(discount)
+        self.save_discounts(discounts)
+
+    def record_sales(self, date_str: str, quantity: int = 1):
+        sales = self.load_sales()
+        sales[date_str] = sales.get(date_str, 0) + quantity
+        self.save_sales(sales)
+
+    def add_sale_entry(self, entry: tuple):
+        ledger = self.load_ledger()
+        ledger.add_entry(entry)
+        self.save_ledger(ledger)
+
+
+# Imported last: record_codec builds its schemas from the classes above
+import record_codec  # noqa: E402
+import reservation_shards  # noqa: E402
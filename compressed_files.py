@@ -0,0 +1,321 @@
+# compressed_files.py
+# Optional lzma/gzip/zlib compression for the DataManager data files.
+#
+# A compressed file starts with a short header naming its codec and the
+# length of the compressed body (b"GPZ2 lzma 00000000000004d2\n"), followed
+# by that body. Files without the header are read as they are, so plain and
+# compressed files can sit side by side and be told apart without any
+# configuration. Data is compressed and decompressed as it is pickled and
+# unpickled, so the whole file never exists in memory in both forms.
+#
+# Appends are written uncompressed after the body (the "tail") and read
+# back as if they were part of it: compressing every small append as its
+# own member made files bigger and appends slower than plain files. The
+# tail is compressed when the file is next rewritten; callers rewrite once
+# should_recompress() says the tail has grown past TAIL_LIMIT and the body.
+# Files from before the length field (b"GPZ1 lzma\n") are still read, and
+# appends to them add another compressed member as they used to.
+
+import contextlib
+import gzip
+import io
+import lzma
+import os
+import zlib
+
+CODECS = ("lzma", "gzip", "zlib")
+TAIL_LIMIT = 256 * 1024  # uncompressed tail bytes always allowed before a rewrite
+_HEADER_PREFIX = b"GPZ2 "
+_MEMBERS_PREFIX = b"GPZ1 "  # older files: compressed members up to the end
+_LENGTH_DIGITS = 16
+_CHUNK = 64 * 1024
+
+
+def header(codec: str, body_length: int = 0) -> bytes:
+    return b"%s%s %0*x\n" % (_HEADER_PREFIX, codec.encode("ascii"), _LENGTH_DIGITS, body_length)
+
+
+def check_codec(codec):
+    if codec is not None and codec not in CODECS:
+        raise ValueError(f"Unknown compression: {codec} (expected one of {', '.join(CODECS)})")
+    return codec
+
+
+def read_header(f) -> tuple:
+    # (codec, compressed body length) from the header at the start of f,
+    # leaving f just past it. The length is None for an older file whose
+    # members run to the end; (None, None) and f rewound for a plain file.
+    prefix = f.read(len(_HEADER_PREFIX))
+    if prefix not in (_HEADER_PREFIX, _MEMBERS_PREFIX):
+        f.seek(0)
+        return None, None
+    fields = f.readline(32).rstrip(b"\n").decode("ascii", "replace").split(" ")
+    codec = fields[0]
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression in file header: {codec}")
+    if prefix == _MEMBERS_PREFIX:
+        return codec, None
+    try:
+        return codec, int(fields[1], 16)
+    except (IndexError, ValueError):
+        raise ValueError("Malformed compressed file header.")
+
+
+def read_codec(f):
+    return read_header(f)[0]
+
+
+def file_codec(path: str):
+    with open(path, "rb") as f:
+        return read_codec(f)
+
+
+def tail_size(path: str) -> int:
+    # Uncompressed bytes appended after a compressed file's body
+    with open(path, "rb") as f:
+        codec, length = read_header(f)
+        if length is None:
+            return 0
+        return max(os.fstat(f.fileno()).st_size - f.tell() - length, 0)
+
+
+def should_recompress(path: str) -> bool:
+    # True once the uncompressed tail outgrows both TAIL_LIMIT and the
+    # compressed body, so rewrites get rarer as the file grows
+    with open(path, "rb") as f:
+        codec, length = read_header(f)
+        if length is None:
+            return False
+        tail = os.fstat(f.fileno()).st_size - f.tell() - length
+    return tail > max(TAIL_LIMIT, length)
+
+
+class _Body(io.RawIOBase):
+    # The part of a file after its header (up to `length` bytes of it), seen
+    # as a file of its own; the lzma and gzip readers rewind their source to
+    # 0 when seeking backwards
+    def __init__(self, f, length: int = None):
+        self.__f = f
+        self.__start = f.tell()
+        self.__end = None if length is None else self.__start + length
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.__end is not None:
+            left = self.__end - self.__f.tell()
+            if left <= 0:
+                return 0
+            if left < len(buffer):
+                buffer = memoryview(buffer)[:left]
+        return self.__f.readinto(buffer)
+
+    def tell(self) -> int:
+        return self.__f.tell() - self.__start
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            offset += self.__start
+        return self.__f.seek(offset, whence) - self.__start
+
+
+class _ZlibReader(io.RawIOBase):
+    # Streaming zlib decompression over a file object. Seeking works like
+    # GzipFile's: backwards restarts from the beginning, forwards reads on.
+    def __init__(self, f):
+        self.__f = f
+        self.__start = f.tell()
+        self.__decompressor = zlib.decompressobj()
+        self.__pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__pos
+
+    def readinto(self, buffer) -> int:
+        while True:
+            d = self.__decompressor
+            if d.eof:
+                # Another member may follow an append
+                chunk = d.unused_data or self.__f.read(_CHUNK)
+                if not chunk:
+                    return 0
+                d = self.__decompressor = zlib.decompressobj()
+            else:
+                chunk = d.unconsumed_tail or self.__f.read(_CHUNK)
+                if not chunk:
+                    return 0  # truncated stream: stop like a torn record
+            out = d.decompress(chunk, len(buffer))
+            if out:
+                buffer[:len(out)] = out
+                self.__pos += len(out)
+                return len(out)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.__pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Cannot seek from the end of a compressed file.")
+        if offset < self.__pos:
+            self.__f.seek(self.__start)
+            self.__decompressor = zlib.decompressobj()
+            self.__pos = 0
+        scratch = bytearray(min(_CHUNK, max(offset - self.__pos, 1)))
+        while self.__pos < offset:
+            view = memoryview(scratch)[:min(len(scratch), offset - self.__pos)]
+            if not self.readinto(view):
+                break
+        return self.__pos
+
+
+class _ZlibWriter(io.RawIOBase):
+    def __init__(self, f, level: int = 6):
+        self.__f = f
+        self.__compressor = zlib.compressobj(level)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.__f.write(self.__compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.__f.write(self.__compressor.flush())
+        super().close()
+
+
+class _WithTail(io.RawIOBase):
+    # A decompressed body followed by the plain tail that starts at byte
+    # tail_start of f. Seeking works like _ZlibReader's.
+    def __init__(self, body, f, tail_start: int):
+        self.__body = body
+        self.__f = f
+        self.__tail_start = tail_start
+        self.__in_tail = False
+        self.__pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__pos
+
+    def readinto(self, buffer) -> int:
+        if not self.__in_tail:
+            n = self.__body.readinto(buffer)
+            if n:
+                self.__pos += n
+                return n
+            self.__in_tail = True
+            self.__f.seek(self.__tail_start)
+        n = self.__f.readinto(buffer)
+        self.__pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.__pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Cannot seek from the end of a compressed file.")
+        if offset < self.__pos:
+            self.__body.seek(0)
+            self.__in_tail = False
+            self.__pos = 0
+        if self.__in_tail:
+            self.__f.seek(offset - self.__pos, io.SEEK_CUR)
+            self.__pos = offset
+            return self.__pos
+        scratch = bytearray(min(_CHUNK, max(offset - self.__pos, 1)))
+        while self.__pos < offset:
+            view = memoryview(scratch)[:min(len(scratch), offset - self.__pos)]
+            if not self.readinto(view):
+                break
+        return self.__pos
+
+    def close(self):
+        if not self.closed:
+            self.__body.close()
+        super().close()
+
+
+def _reader(codec: str, f):
+    if codec == "lzma":
+        return lzma.LZMAFile(f, "rb")
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    return io.BufferedReader(_ZlibReader(f), _CHUNK)
+
+
+def _writer(codec: str, f):
+    if codec == "lzma":
+        return lzma.LZMAFile(f, "wb", preset=6)
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6, mtime=0)
+    return io.BufferedWriter(_ZlibWriter(f), _CHUNK)
+
+
+@contextlib.contextmanager
+def open_read(path: str):
+    # The decompressed contents of a data file, whatever its codec
+    with open(path, "rb") as f:
+        codec, length = read_header(f)
+        if codec is None:
+            yield f
+            return
+        if length is None:
+            stream = _reader(codec, _Body(f))
+        else:
+            body = _reader(codec, _Body(f, length)) if length else io.BytesIO()
+            stream = io.BufferedReader(_WithTail(body, f, f.tell() + length), _CHUNK)
+        try:
+            yield stream
+        finally:
+            stream.close()
+
+
+@contextlib.contextmanager
+def open_write(path: str, codec: str = None, append: bool = False):
+    # A stream whose writes end up in path, compressed with codec. Appends
+    # to a compressed file go to its plain tail, whatever codec is passed.
+    with open(path, "ab" if append else "wb") as f:
+        if codec is None:
+            yield f
+            return
+        if append:
+            if f.tell() == 0:
+                f.write(header(codec))  # empty body; everything goes in the tail
+                yield f
+                return
+            with open(path, "rb") as existing:
+                existing_codec, length = read_header(existing)
+            if length is not None or existing_codec is None:
+                yield f
+                return
+            codec = existing_codec  # older file: add a member in its codec
+        else:
+            f.write(header(codec))
+        start = f.tell()
+        stream = _writer(codec, f)
+        try:
+            yield stream
+        finally:
+            stream.close()
+        if not append:
+            end = f.tell()
+            f.seek(0)
+            f.write(header(codec, end - start))
+            f.seek(end)
@@ -3,28 +3,29 @@
 
 import tkinter as tk
 from tkinter import messagebox
-from datetime import datetime  # for timestamping sales
-from classes import Reservation
+import metrics
+from booking_service import RESERVATION_SORTS
 from gui_functions import clear_screen
+from virtual_list import VirtualList
 
 # Display the main customer menu with reservation actions
-# tm: TicketManager instance; dm: DataManager instance; events: list of Event
+# service: BookingService instance; all booking logic lives there
 
-def show_customer_menu(customer, root, tm, dm, events):
+def show_customer_menu(customer, root, service):
     clear_screen(root)
     tk.Label(root, text=f"Welcome, {customer.get_name()}", font=("Arial", 16)).pack(pady=10)
-    tk.Button(root, text="Edit My Details", command=lambda: edit_customer_details(customer, root, tm, dm, events)).pack(pady=5)
+    tk.Button(root, text="Edit My Details", command=lambda: edit_customer_details(customer, root, service)).pack(pady=5)
     tk.Button(
         root, text="My Reservations",
-        command=lambda: show_reservations(customer, root, tm, dm, events)
+        command=lambda: show_reservations(customer, root, service)
     ).pack(pady=5)
     tk.Button(
         root, text="Make Reservation",
-        command=lambda: make_reservation(customer, root, tm, dm, events)
+        command=lambda: make_reservation(customer, root, service)
     ).pack(pady=5)
     tk.Button(root, text="Logout", command=lambda: root.destroy()).pack(pady=20)
 
-def edit_customer_details(customer, root, tm, dm, events):
+def edit_customer_details(customer, root, service):
     clear_screen(root)
     tk.Label(root, text="Edit Account Details", font=("Arial", 14)).pack(pady=10)
 
@@ -42,127 +43,141 @@ def edit_customer_details(customer, root, tm, dm, events):
     pw_entry = tk.Entry(root, show="*")
     pw_entry.pack()
 
+    @metrics.action("gui.save_details")
     def save_changes():
         try:
-            customer.set_name(name_entry.get())
-            customer.set_email(email_entry.get())
-            if pw_entry.get():  # optional
-                customer.set_password(pw_entry.get())
-
-            # Persist changes
-            users = dm.load_users()
-            for i, u in enumerate(users):
-                if u.get_id() == customer.get_id():
-                    users[i] = customer
-            dm.save_users(users)
-
+            # Password is optional
+            service.update_details(customer, name_entry.get(), email_entry.get(), pw_entry.get())
             messagebox.showinfo("Success", "Your account details were updated.")
-            show_customer_menu(customer, root, tm, dm, events)
+            show_customer_menu(customer, root, service)
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
     tk.Button(root, text="Save", command=save_changes).pack(pady=10)
-    tk.Button(root, text="Back", command=lambda: show_customer_menu(customer, root, tm, dm, events)).pack()
-
-
-# Show a list of current reservations with summary info
-
-def show_reservations(customer, root, tm, dm, events):
+    tk.Button(root, text="Back", command=lambda: show_customer_menu(customer, root, service)).pack()
+
+
+# Reservations in a virtual list: only the visible rows are drawn, and
+# pages are fetched from the service as the list scrolls
+
+RESERVATION_COLUMNS = [
+    ("event", "Event", 190),
+    ("tickets", "Tickets", 220),
+    ("total", "Total (AED)", 90),
+    ("payment", "Payment", 100),
+    ("reserved", "Reserved", 120),
+    ("id", "ID", 260),
+]
+# Clicking a heading sorts by it; "reserved" flips newest/oldest
+HEADING_SORTS = {"event": "event date", "total": "total"}
+
+
+def reservation_row(res: dict) -> tuple:
+    tickets = ", ".join(
+        f"{t['ticket']} x{t['quantity']}" if t["quantity"] > 1 else t["ticket"]
+        for t in res["tickets"]
+    )
+    return (
+        f"{res['date']} at {res['location']}",
+        tickets,
+        f"{res['total_cost']:.2f}",
+        res["payment_method"],
+        res["reserved_at"][:16].replace("T", " "),
+        res["reservation_id"],
+    )
+
+
+def show_reservations(customer, root, service):
     clear_screen(root)
     tk.Label(root, text="Your Reservations", font=("Arial", 14)).pack(pady=10)
-    reservations = customer.get_reservations()
-    if not reservations:
-        tk.Label(root, text="No reservations found.").pack(pady=10)
-    else:
-        for res in reservations:
-            summary = (
-                f"ID: {res.get_reservation_id()} | "
-                f"Event: {res.get_event().get_date()} at {res.get_event().get_location()} | "
-                f"Tickets: {', '.join(t.get_name() for t in res.get_tickets())} | "
-                f"Total: AED {res.get_total_cost()}"
-            )
-            tk.Label(root, text=summary, anchor="w", justify="left").pack(fill="x", padx=10, pady=2)
-    tk.Button(root, text="Back", command=lambda: show_customer_menu(customer, root, tm, dm, events)).pack(pady=20)
+
+    controls = tk.Frame(root)
+    controls.pack(fill="x", padx=10)
+    tk.Label(controls, text="Sort").pack(side="left")
+    sort_var = tk.StringVar(value=RESERVATION_SORTS[0])
+    tk.OptionMenu(controls, sort_var, *RESERVATION_SORTS).pack(side="left", padx=5)
+    tk.Label(controls, text="Search").pack(side="left", padx=(10, 0))
+    query_var = tk.StringVar()
+    tk.Entry(controls, textvariable=query_var).pack(side="left", fill="x", expand=True, padx=5)
+    count_label = tk.Label(root, anchor="w")
+    count_label.pack(fill="x", padx=10)
+
+    def source(offset, limit):
+        page = service.reservations_page(customer, offset, limit, sort_var.get(), query_var.get().strip())
+        count_label.config(text="No reservations found." if not page["total"]
+                           else f"{page['total']} reservation(s)")
+        return page["total"], [(r["reservation_id"], reservation_row(r)) for r in page["reservations"]]
+
+    def sort_by(column):
+        if column in HEADING_SORTS:
+            sort_var.set(HEADING_SORTS[column])
+        elif column == "reserved":
+            sort_var.set("oldest" if sort_var.get() == "newest" else "newest")
+
+    table = VirtualList(root, RESERVATION_COLUMNS, source, on_sort=sort_by)
+    table.pack(fill="both", expand=True, padx=10, pady=5)
+    sort_var.trace_add("write", lambda *_: table.refresh())
+
+    # Search once typing pauses rather than on every key
+    pending = []
+
+    def search(*_):
+        if pending:
+            root.after_cancel(pending.pop())
+        # The screen may have been left by then
+        pending.append(root.after(250, lambda: table.winfo_exists() and table.refresh()))
+
+    query_var.trace_add("write", search)
+    tk.Button(root, text="Back", command=lambda: show_customer_menu(customer, root, service)).pack(pady=20)
 
 # GUI to create a new reservation for a selected event and ticket
 
-def make_reservation(customer, root, tm, dm, events):
+def make_reservation(customer, root, service):
     clear_screen(root)
     tk.Label(root, text="Make Reservation", font=("Arial", 14)).pack(pady=10)
 
     # Event selection by ID - use human-readable later
     tk.Label(root, text="Select Event").pack()
+    events = service.get_events()
     event_var = tk.StringVar(value=events[0].get_event_id())
     tk.OptionMenu(root, event_var, *[e.get_event_id() for e in events]).pack()
 
-    # Ticket type selection
+    # Ticket type selection; products such as group tickets also need a size
     tk.Label(root, text="Select Ticket Type").pack()
-    types = tm.get_ticket_types()
+    products = {p.get_name(): p for p in service.get_products()}
+    types = service.get_ticket_types() + list(products)
     ticket_var = tk.StringVar(value=types[0] if types else "")
     tk.OptionMenu(root, ticket_var, *types).pack()
 
+    size_var = tk.IntVar(value=4)
+    if products:
+        low, high = next(iter(products.values())).get_size_range()
+        tk.Label(root, text="Group Size (group tickets only)").pack()
+        tk.Spinbox(root, from_=low, to=high, textvariable=size_var, width=5).pack()
+
+    def selected_ticket():
+        product = products.get(ticket_var.get())
+        return product.ticket(size_var.get()) if product else ticket_var.get()
+
     # Payment method selection
     tk.Label(root, text="Payment Method").pack()
     pay_var = tk.StringVar(value="Credit Card")
     tk.OptionMenu(root, pay_var, "Credit Card", "Debit Card", "Apple Pay", "Google Pay").pack()
 
+    @metrics.action("gui.confirm")
     def confirm():
         try:
-            # Find the actual Event object
-            ev = next((e for e in events if e.get_event_id() == event_var.get()), None)
-            if ev is None:
-                raise ValueError("Invalid event selected.")
-
-            ticket = tm.get_ticket_by_name(ticket_var.get())
-            if ticket is None:
-                raise ValueError("Invalid ticket type selected.")
-
-            # Calculate price with discounts
-            price = tm.apply_discount(ticket)
-            method = pay_var.get()
-
-            # Create reservation object
-            reservation = Reservation(
-                customer_id=customer.get_id(),
-                tickets=[ticket],
-                event=ev,
-                payment_method=method
-            )
-
-            # Update in-memory state
-            customer.add_reservation(reservation)
-            tm.record_sale(1)
-
-            # Persist customers
-            users = dm.load_users()
-            updated = False
-            for idx, u in enumerate(users):
-                if u.get_id() == customer.get_id():
-                    users[idx] = customer
-                    updated = True
-            if not updated:
-                users.append(customer)
-            dm.save_users(users)
-
-            # Persist reservations list
-            all_res = dm.load_reservations()
-            if not isinstance(all_res, list):
-                all_res = []
-            all_res.append(reservation)
-            dm.save_reservations(all_res)
-
-            # Persist sales log safely
-            sales = dm.load_sales()
-            if not isinstance(sales, dict):
-                sales = {}
-            date_str = datetime.now().strftime("%Y-%m-%d")
-            sales[date_str] = sales.get(date_str, 0) + 1
-            dm.save_sales(sales)
-
-            messagebox.showinfo("Success", f"Reserved {ticket.get_name()} on {ev.get_date()} for AED {price}")
-            show_customer_menu(customer, root, tm, dm, events)
+            # Price, record and persist the booking in one commit
+            ticket = selected_ticket()
+            reservation = service.reserve(customer, event_var.get(), ticket, 1, pay_var.get())
+            ev = reservation.get_event()
+            price = reservation.get_total_cost()
+            name = ticket if isinstance(ticket, str) else ticket.get_name()
+
+            messagebox.showinfo("Success", f"Reserved {name} on {ev.get_date()} for AED {price}")
+            show_customer_menu(customer, root, service)
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
     tk.Button(root, text="Confirm", command=confirm).pack(pady=10)
-    tk.Button(root, text="Back", command=lambda: show_customer_menu(customer, root, tm, dm, events)).pack(pady=5)
+    tk.Button(root, text="Back", command=lambda: show_customer_menu(customer, root, service)).pack(pady=5)
@@ -0,0 +1,149 @@
+# discount_rules.py
+# Compiled discount rules for TicketManager.
+#
+# Each Discount is a rule for one ticket type (or a whole product, such as
+# every "Group Ticket" size) with a priority, an exclusive group, an
+# optional validity window, a minimum line quantity and an optional set of
+# eligible customer ids. Per ticket type the active rules are compiled into
+# groups sorted best-first: within a group only the first eligible rule
+# applies, and the winners of different groups stack (percentages
+# multiply). Rules in the default group therefore behave like the old
+# single best discount.
+#
+# A ticket type's compiled entry is dropped when one of its rules changes
+# and rebuilt on the next lookup, so pricing never scans the rule list.
+# Prices are also kept in a bounded LRU cache keyed by ticket name and base
+# price (plus quantity and customer only when some rule depends on them);
+# prices from time-windowed rules are not cached.
+
+from collections import OrderedDict
+from datetime import datetime
+
+DEFAULT_GROUP = "default"
+QUOTE_CACHE_SIZE = 1024
+
+
+class _Compiled:
+    __slots__ = ("groups", "fixed", "timed", "by_quantity", "by_customer")
+
+    def __init__(self, rules: list):
+        groups = {}
+        for rule in rules:
+            groups.setdefault(rule.get_group(), []).append(rule)
+        # Best rule first: higher priority, then the bigger discount
+        self.groups = [
+            tuple(sorted(g, key=lambda r: (-r.get_priority(), -r.get_percentage())))
+            for g in groups.values()
+        ]
+        # Without conditions the winners never change; keep them ready
+        if all(not r.is_conditional() for g in self.groups for r in g):
+            self.fixed = tuple(g[0] for g in self.groups)
+        else:
+            self.fixed = None
+        self.timed = any(r.get_window() != (None, None) for r in rules)
+        self.by_quantity = any(r.get_min_quantity() > 1 for r in rules)
+        self.by_customer = any(r.get_customer_ids() is not None for r in rules)
+
+    def winners(self, quantity: int, customer_id: str, at: datetime) -> tuple:
+        if self.fixed is not None:
+            return self.fixed
+        at = at or datetime.now()
+        found = []
+        for group in self.groups:
+            for rule in group:
+                if rule.applies_to(quantity, customer_id, at):
+                    found.append(rule)
+                    break
+        return tuple(found)
+
+
+_NO_RULES = _Compiled([])
+
+
+class DiscountRules:
+    def __init__(self, cache_size: int = QUOTE_CACHE_SIZE):
+        self.__discounts = []
+        self.__by_type = {}  # ticket or product name -> discounts for it, active or not
+        self.__compiled = {}  # ticket name -> _Compiled, built on demand
+        self.__members = {}  # product name -> ticket names compiled with its rules
+        self.__cache = OrderedDict()  # (name, price, quantity, customer) -> (price, rules)
+        self.__cache_size = cache_size
+
+    def add(self, discount):
+        self.__discounts.append(discount)
+        self.__by_type.setdefault(discount.get_ticket_type(), []).append(discount)
+        self.__drop(discount.get_ticket_type())
+
+    def get_discounts(self) -> list:
+        return list(self.__discounts)
+
+    def invalidate(self, *ticket_types):
+        # A rule for these types changed (or moved between them)
+        for name in set(ticket_types):
+            rules = [d for d in self.__discounts if d.get_ticket_type() == name]
+            if rules:
+                self.__by_type[name] = rules
+            else:
+                self.__by_type.pop(name, None)
+            self.__drop(name)
+
+    def __drop(self, name: str):
+        # The compiled entry and cached prices for a ticket name, or for
+        # every ticket of a product
+        names = {name} | self.__members.pop(name, set())
+        for n in names:
+            self.__compiled.pop(n, None)
+        if self.__cache:
+            for key in [k for k in self.__cache if k[0] in names]:
+                del self.__cache[key]
+
+    def clear_cache(self):
+        self.__cache.clear()
+
+    def cache_info(self) -> dict:
+        return {"size": len(self.__cache), "max_size": self.__cache_size}
+
+    def compiled(self, ticket_type: str, product: str = None) -> _Compiled:
+        entry = self.__compiled.get(ticket_type)
+        if entry is None:
+            rules = [d for d in self.__by_type.get(ticket_type, ()) if d.is_active()]
+            if product is not None and product != ticket_type:
+                rules += [d for d in self.__by_type.get(product, ()) if d.is_active()]
+                self.__members.setdefault(product, set()).add(ticket_type)
+            entry = self.__compiled[ticket_type] = _Compiled(rules) if rules else _NO_RULES
+        return entry
+
+    def compiled_count(self) -> int:
+        return len(self.__compiled)
+
+    def price(self, ticket_type: str, price: float, quantity: int = 1,
+              customer_id: str = None, at: datetime = None, product: str = None) -> tuple:
+        # (unit price after discounts, the discounts that applied)
+        entry = self.compiled(ticket_type, product)
+        if entry.timed:
+            return self.__evaluate(entry, price, quantity, customer_id, at)
+        key = (ticket_type, price,
+               quantity if entry.by_quantity else None,
+               customer_id if entry.by_customer else None)
+        cache = self.__cache
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+            return hit
+        hit = cache[key] = self.__evaluate(entry, price, quantity, customer_id, at)
+        if len(cache) > self.__cache_size:
+            cache.popitem(last=False)
+        return hit
+
+    @staticmethod
+    def __evaluate(entry: _Compiled, price: float, quantity: int, customer_id: str,
+                   at: datetime) -> tuple:
+        rules = entry.winners(quantity, customer_id, at)
+        if not rules:
+            return price, ()
+        if len(rules) == 1:
+            return rules[0].apply_discount(price), rules
+        factor = 1.0
+        for rule in rules:
+            factor *= 1 - rule.get_percentage() / 100
+        return round(price * factor, 2), rules
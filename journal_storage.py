@@ -0,0 +1,326 @@
+# journal_storage.py
+# Append-only journaled backend for DataManager.
+#
+# Every change is written as one framed record at the end of journal.log
+# instead of rewriting a whole pickle file. On startup the last snapshot is
+# loaded and the journal is replayed on top of it. Once enough records have
+# piled up the state is compacted into a fresh snapshot and the log is reset.
+
+import itertools
+import os
+import pickle
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+
+import record_codec
+from classes import DataManager, User, Reservation, Discount
+from sales_ledger import SalesLedger
+
+# Frame header: payload length and crc32 of the payload
+_FRAME = struct.Struct(">II")
+
+ENTITIES = ("users", "reservations", "discounts", "sales", "ledger")
+
+
+def _key_of(entity: str, obj):
+    if entity == "users":
+        return obj.get_id()
+    if entity == "reservations":
+        return obj.get_reservation_id()
+    if entity == "discounts":
+        return obj.get_name()
+    raise KeyError(entity)
+
+
+class JournalDataManager(DataManager):
+    def __init__(self, folder: str = ".", compact_every: int = 1000, fsync: bool = True):
+        super().__init__(folder)
+        self.__log_path = os.path.join(folder, "journal.log")
+        self.__snap_path = os.path.join(folder, "snapshot.pkl")
+        self.__compact_every = compact_every
+        self.__fsync = fsync
+        # entity -> {key: pickled record}; sales values are plain counts and
+        # ledger values are sale entry tuples keyed by position
+        self.__state = {e: {} for e in ENTITIES}
+        self.__seq = 0
+        self.__since_snapshot = 0
+        self.__batch = None
+        self.__log = None
+        # Writers hold __write_lock for a whole append or transaction; readers
+        # only wait on __state_lock while a finished frame is applied, so a
+        # background writer never blocks them on the fsync
+        self.__write_lock = threading.RLock()
+        self.__state_lock = threading.Lock()
+        self.__open()
+
+    # ----------------------------
+    # Startup / replay
+    # ----------------------------
+
+    def __open(self):
+        has_snapshot = os.path.exists(self.__snap_path)
+        has_log = os.path.exists(self.__log_path)
+        if has_snapshot:
+            with open(self.__snap_path, "rb") as f:
+                snap = pickle.load(f)
+            self.__seq = snap["seq"]
+            self.__state = snap["state"]
+            for e in ENTITIES:
+                self.__state.setdefault(e, {})
+        if has_log:
+            self.__replay()
+        if not has_snapshot and not has_log:
+            self.__import_legacy()
+        self.__log = open(self.__log_path, "ab")
+
+    def __replay(self):
+        snapshot_seq = self.__seq
+        good_end = 0
+        with open(self.__log_path, "rb") as f:
+            while True:
+                header = f.read(_FRAME.size)
+                if len(header) < _FRAME.size:
+                    break
+                length, crc = _FRAME.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                seq, ops = pickle.loads(payload)
+                good_end = f.tell()
+                self.__since_snapshot += 1
+                if seq <= snapshot_seq:
+                    continue
+                self.__apply(ops)
+                self.__seq = seq
+        # Drop a torn trailing frame left behind by a crash mid-append
+        if os.path.getsize(self.__log_path) > good_end:
+            with open(self.__log_path, "r+b") as f:
+                f.truncate(good_end)
+
+    def __import_legacy(self):
+        # Seed from the plain pickle files written by DataManager, if any
+        users = super().load_users()
+        reservations = super().load_reservations()
+        legacy = {
+            "users": users,
+            "reservations": reservations + self.embedded_reservations(users, reservations),
+            "discounts": super().load_discounts(),
+        }
+        for entity, items in legacy.items():
+            for obj, data in zip(items, record_codec.dumps_many(items)):
+                self.__state[entity][_key_of(entity, obj)] = data
+        self.__state["sales"] = dict(super().load_sales())
+        self.__state["ledger"] = dict(enumerate(super().load_ledger().entries()))
+        if any(self.__state.values()):
+            self.__write_snapshot()
+
+    def __apply(self, ops):
+        with self.__state_lock:
+            for entity, op, key, data in ops:
+                table = self.__state[entity]
+                if op == "delete":
+                    table.pop(key, None)
+                else:
+                    table[key] = data
+
+    # ----------------------------
+    # Writing
+    # ----------------------------
+
+    def __append(self, ops):
+        if not ops:
+            return
+        with self.__write_lock:
+            if self.__batch is not None:
+                self.__batch.extend(ops)
+                return
+            self.__write_frame(ops)
+
+    def __check_open(self):
+        if self.__log is None:
+            raise ValueError("Journal is closed.")
+
+    def __write_frame(self, ops):
+        self.__check_open()
+        self.__seq += 1
+        payload = pickle.dumps((self.__seq, ops))
+        self.__log.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        self.__log.flush()
+        if self.__fsync:
+            os.fsync(self.__log.fileno())
+        self.__apply(ops)
+        self.__since_snapshot += 1
+        if self.__since_snapshot >= self.__compact_every:
+            self.compact()
+
+    def __write_snapshot(self):
+        tmp = self.__snap_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"seq": self.__seq, "state": self.__state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.__snap_path)
+
+    def compact(self):
+        with self.__write_lock:
+            self.__check_open()
+            self.__write_snapshot()
+            # Frames up to the snapshot seq are now redundant
+            self.__log.close()
+            self.__log = open(self.__log_path, "wb")
+            self.__since_snapshot = 0
+
+    def close(self):
+        with self.__write_lock:
+            if self.__log is not None:
+                self.__log.close()
+                self.__log = None
+
+    @contextmanager
+    def transaction(self):
+        # Collect every change made inside the block into a single frame
+        with self.__write_lock:
+            if self.__batch is not None:
+                yield self
+                return
+            self.__batch = []
+            try:
+                yield self
+            except BaseException:
+                self.__batch = None
+                raise
+            ops, self.__batch = self.__batch, None
+            self.__append(ops)
+
+    def __upsert_ops(self, entity: str, obj, data: bytes = None):
+        key = _key_of(entity, obj)
+        if data is None:
+            data = record_codec.dumps(obj)
+        old = self.__state[entity].get(key)
+        if old == data:
+            return []
+        return [(entity, "add" if old is None else "update", key, data)]
+
+    def __replace_all(self, entity: str, items: list):
+        ops = []
+        keys = set()
+        for obj, data in zip(items, record_codec.dumps_many(items)):
+            keys.add(_key_of(entity, obj))
+            ops.extend(self.__upsert_ops(entity, obj, data))
+        for key in self.__state[entity]:
+            if key not in keys:
+                ops.append((entity, "delete", key, None))
+        self.__append(ops)
+
+    def __records(self, entity: str) -> list:
+        with self.__state_lock:
+            return list(self.__state[entity].values())
+
+    def __load_all(self, entity: str) -> list:
+        return record_codec.loads_many(self.__records(entity))
+
+    # ----------------------------
+    # DataManager API
+    # ----------------------------
+
+    def save_users(self, users: list):
+        self.__replace_all("users", users)
+
+    def load_users(self) -> list:
+        return self._attach(self.__load_all("users"))
+
+    def save_reservations(self, reservations: list):
+        self.__replace_all("reservations", reservations)
+
+    def load_reservations(self) -> list:
+        return self.__load_all("reservations")
+
+    def save_discounts(self, discounts: list):
+        self.__replace_all("discounts", discounts)
+
+    def load_discounts(self) -> list:
+        return self.__load_all("discounts")
+
+    def save_sales(self, sales: dict):
+        current = self.__state["sales"]
+        ops = [("sales", "update", k, v) for k, v in sales.items() if current.get(k) != v]
+        ops += [("sales", "delete", k, None) for k in current if k not in sales]
+        self.__append(ops)
+
+    def load_sales(self) -> dict:
+        with self.__state_lock:
+            return dict(self.__state["sales"])
+
+    def save_ledger(self, ledger: SalesLedger):
+        current = self.__state["ledger"]
+        entries = list(ledger.entries())
+        ops = [("ledger", "update" if i in current else "add", i, e)
+               for i, e in enumerate(entries) if current.get(i) != e]
+        ops += [("ledger", "delete", i, None) for i in current if i >= len(entries)]
+        self.__append(ops)
+
+    def load_ledger(self) -> SalesLedger:
+        return SalesLedger.from_entries(self.__records("ledger"))
+
+    def iter_reservations(self, filter=None, batch_size: int = 1000):
+        records = iter(self.__records("reservations"))
+        while True:
+            batch = record_codec.loads_many(itertools.islice(records, batch_size))
+            if not batch:
+                return
+            for res in batch:
+                if filter is None or filter(res):
+                    yield res
+
+    def page_reservations(self, offset: int, limit: int) -> list:
+        with self.__state_lock:
+            records = list(itertools.islice(self.__state["reservations"].values(), offset, offset + limit))
+        return record_codec.loads_many(records)
+
+    def count_reservations(self) -> int:
+        return len(self.__state["reservations"])
+
+    def get_reservations_by_ids(self, ids: list) -> list:
+        table = self.__state["reservations"]
+        with self.__state_lock:
+            records = [table[i] for i in ids if i in table]
+        return record_codec.loads_many(records)
+
+    def reservations_for_customer(self, customer_id: str) -> list:
+        return [r for r in self.load_reservations() if r.get_customer_id() == customer_id]
+
+    def save_user(self, user: User):
+        self.__append(self.__upsert_ops("users", user))
+
+    def delete_user(self, user_id: str):
+        if user_id in self.__state["users"]:
+            self.__append([("users", "delete", user_id, None)])
+
+    def add_reservation(self, reservation: Reservation):
+        self.__append(self.__upsert_ops("reservations", reservation))
+
+    def delete_reservation(self, res_id: str):
+        if res_id in self.__state["reservations"]:
+            self.__append([("reservations", "delete", res_id, None)])
+
+    def save_discount(self, discount: Discount):
+        self.__append(self.__upsert_ops("discounts", discount))
+
+    def record_sales(self, date_str: str, quantity: int = 1):
+        with self.__write_lock:
+            pending = self.__state["sales"].get(date_str, 0)
+            if self.__batch:
+                # Account for increments already queued in this transaction
+                for entity, _, key, value in self.__batch:
+                    if entity == "sales" and key == date_str:
+                        pending = value
+            self.__append([("sales", "update", date_str, pending + quantity)])
+
+    def add_sale_entry(self, entry: tuple):
+        with self.__write_lock:
+            position = len(self.__state["ledger"])
+            if self.__batch:
+                position += sum(1 for op in self.__batch if op[0] == "ledger")
+            self.__append([("ledger", "add", position, tuple(entry))])
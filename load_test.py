@@ -0,0 +1,237 @@
+# load_test.py
+# End-to-end load test of the reservation flow.
+#
+# Seeds a data folder with synthetic users (and optionally past
+# reservations), then runs N concurrent simulated customers through
+# register -> login -> make reservation(s) -> view reservations using the
+# real BookingService, TicketManager and DataManager code. Each operation
+# runs as its own phase so its latency and memory can be read separately.
+# Results are written as JSON for comparing runs.
+#
+#     python load_test.py --users 100000 --customers 32 --backend journal --output run.json
+#
+# Throughput is operations per second of wall time across all customers.
+# Peak memory is the Python heap high-water mark during the phase as seen
+# by tracemalloc; pass --no-trace-memory for throughput numbers without
+# its overhead.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from classes import Customer, DataManager, Event, Reservation, SingleRaceTicket, WeekendPass
+from app_setup import build_service
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+BACKENDS = ("file", "journal", "sqlite")
+PAYMENT_METHODS = ("Credit Card", "Debit Card", "Apple Pay", "Google Pay")
+
+
+def open_store(backend: str, folder: str):
+    if backend == "file":
+        return DataManager(folder=folder)
+    if backend == "journal":
+        from journal_storage import JournalDataManager
+        return JournalDataManager(folder=folder, fsync=False)
+    if backend == "sqlite":
+        from sqlite_storage import SQLiteDataManager
+        return SQLiteDataManager(folder=folder)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def load_events() -> list:
+    # No seat limits, so the run measures the booking path rather than
+    # selling out
+    return [Event(f"2025-05-{day:02d}", "Yas Marina Circuit") for day in (10, 11, 12)]
+
+
+def seed(dm, users: int, history: float, events: list, rng: random.Random):
+    # Synthetic customers; about `history` past reservations each
+    tickets = [SingleRaceTicket(), WeekendPass()]
+    customers, reservations = [], []
+    for i in range(users):
+        cust = Customer(f"Seed Customer {i}", f"seed{i}@example.com", f"pw{i}")
+        for _ in range(int(history) + (rng.random() < history % 1)):
+            res = Reservation(cust.get_id(), [rng.choice(tickets)], rng.choice(events),
+                              rng.choice(PAYMENT_METHODS))
+            cust.add_reservation(res)
+            reservations.append(res)
+        customers.append(cust)
+    with dm.transaction():
+        dm.save_users(customers)
+        dm.save_reservations(reservations)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_phase(name: str, jobs: list, workers: int, trace_memory: bool) -> dict:
+    # jobs: zero-argument callables, shared out over `workers` threads
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    it = iter(jobs)
+
+    def worker():
+        mine, failed = [], 0
+        while True:
+            with lock:
+                job = next(it, None)
+            if job is None:
+                break
+            start = time.perf_counter()
+            try:
+                job()
+            except Exception:
+                failed += 1
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    if trace_memory:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    threads = [threading.Thread(target=worker, name=f"load-{name}-{i}") for i in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "count": len(latencies),
+        "errors": sum(errors),
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_memory_bytes": tracemalloc.get_traced_memory()[1] - base if trace_memory else None,
+    }
+
+
+def run(users: int = 1000, customers: int = 16, reservations: int = 2, history: float = 0.0,
+        backend: str = "journal", folder: str = None, seed_value: int = 1,
+        trace_memory: bool = True) -> dict:
+    rng = random.Random(seed_value)
+    own_folder = folder is None
+    folder = tempfile.mkdtemp(prefix="load_test_") if own_folder else folder
+    os.makedirs(folder, exist_ok=True)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        events = load_events()
+        dm = open_store(backend, folder)
+        started = time.perf_counter()
+        seed(dm, users, history, events, rng)
+        seed_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        service = build_service(dm, events=events)
+        startup_seconds = time.perf_counter() - started
+
+        # One simulated customer per slot; they register fresh accounts, and
+        # half of the logins are existing seeded users
+        ticket_types = ["Single Race Ticket", "Weekend Pass", "Group Ticket (4)"]
+        accounts = [(f"Load Customer {i}", f"load{i}@example.com", f"pw{i}") for i in range(customers)]
+        logged_in = [None] * customers
+
+        def register(i):
+            name, email, pw = accounts[i]
+            return lambda: service.register(name, email, pw)
+
+        def login(i):
+            j = rng.randrange(users) if users else None
+
+            def job():
+                logged_in[i] = service.login(accounts[i][1], accounts[i][2])
+                if j is not None:
+                    service.login(f"seed{j}@example.com", f"pw{j}")
+            return job
+
+        def reserve(i, k):
+            event_id = events[k % len(events)].get_event_id()
+            ticket = ticket_types[(i + k) % len(ticket_types)]
+            payment = PAYMENT_METHODS[k % len(PAYMENT_METHODS)]
+            return lambda: service.reserve(logged_in[i], event_id, ticket, 1, payment)
+
+        def view(i):
+            return lambda: service.list_reservations(logged_in[i])
+
+        phases = [
+            ("register", [register(i) for i in range(customers)]),
+            ("login", [login(i) for i in range(customers)]),
+            ("reserve", [reserve(i, k) for k in range(reservations) for i in range(customers)]),
+            ("view_reservations", [view(i) for i in range(customers)]),
+        ]
+        results = {name: run_phase(name, jobs, customers, trace_memory) for name, jobs in phases}
+        if hasattr(dm, "close"):
+            dm.close()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        if own_folder:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    max_rss = None
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss = max_rss if sys.platform == "darwin" else max_rss * 1024
+    return {
+        "config": {
+            "users": users, "customers": customers, "reservations_per_customer": reservations,
+            "history": history, "backend": backend, "seed": seed_value,
+            "trace_memory": trace_memory, "python": sys.version.split()[0],
+        },
+        "seed_seconds": round(seed_seconds, 4),
+        "startup_seconds": round(startup_seconds, 4),
+        "operations": results,
+        "max_rss_bytes": max_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the reservation flow.")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic users to seed (1k to 1M)")
+    parser.add_argument("--customers", type=int, default=16, help="concurrent simulated customers")
+    parser.add_argument("--reservations", type=int, default=2, help="reservations per customer")
+    parser.add_argument("--history", type=float, default=0.0, help="past reservations per seeded user")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal")
+    parser.add_argument("--folder", default=None, help="data folder (default: a temporary one)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false")
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    result = run(args.users, args.customers, args.reservations, args.history, args.backend,
+                 args.folder, args.seed, args.trace_memory)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
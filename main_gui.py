@@ -1,60 +1,73 @@
 # main_gui.py
+import sys
 import tkinter as tk
 from tkinter import messagebox
 
-from classes import (
-    Customer, Admin, TicketManager, DataManager,
-    SingleRaceTicket, WeekendPass, GroupTicket, SeasonMembership, Event, Reservation, Discount
-)
+import metrics
+from classes import Customer
 from gui_functions import clear_screen
+from journal_storage import JournalDataManager
+from write_behind import WriteBehindDataManager
+from app_setup import ServiceLoader
 from customer_views import show_customer_menu
 from admin_views import show_admin_menu
 
-# Initialize managers
-tm = TicketManager()
-dm = DataManager(folder="gui_data")
-
-# Register ticket types
-tm.register_ticket(SingleRaceTicket())
-tm.register_ticket(WeekendPass())
-tm.register_ticket(GroupTicket(4))
-tm.register_ticket(GroupTicket(10))
-tm.register_ticket(SeasonMembership()) 
-
-discounts = [
-    Discount("Weekend Promo", 20, "Weekend Pass"),
-    Discount("Group Saver", 15, "Group Ticket (4)")
-]
-dm.save_discounts(discounts)
-
-# Load persisted discounts and sales
-for d in dm.load_discounts():
-    tm.add_discount(d)
-tm._TicketManager__sales_log = dm.load_sales()
-
-# Define some sample events (could be loaded/persisted similarly)
-events = [
-    Event(date="2025-05-10", location="Yas Marina Circuit"),
-    Event(date="2025-05-11", location="Yas Marina Circuit"),
-    Event(date="2025-05-12", location="Yas Marina Circuit"),
-]
-
-# Load users
-users = dm.load_users()
-customers = [u for u in users if isinstance(u, Customer)]
-admins    = [u for u in users if isinstance(u, Admin)]
-
-# Ensure at least one admin
-if not admins:
-    default_admin = Admin("Admin", "admin@example.com", "admin123", admin_code="ADMIN001")
-    users.append(default_admin)
-    admins.append(default_admin)
-    dm.save_users(users)
-
-# Set up main window
-root = tk.Tk()
-root.title("Grand Prix Ticketing System")
-root.geometry("500x450")
+TITLE = "Grand Prix Ticketing System"
+DATA_FOLDER = "gui_data"
+
+# Set by main(). Importing this module has no side effects.
+root = None
+loader = None  # ServiceLoader opening the store and building the service
+service = None  # BookingService, once loaded
+dm = None  # write-behind store, once loaded
+_waiting = []  # actions requested before loading finished
+
+
+# Save progress is shown in the title bar
+def show_save_status(pending, failed):
+    status = []
+    if pending:
+        status.append(f"saving {pending}…")
+    if failed:
+        status.append(f"{failed} save(s) failed")
+    root.title(f"{TITLE} — {', '.join(status)}" if status else TITLE)
+
+
+def report_save_failure(failure):
+    if messagebox.askretrycancel("Save Failed", f"Could not save {failure.label}: {failure.error}"):
+        dm.retry_failed()
+
+
+# -------------------------
+# Background loading
+# -------------------------
+def check_loaded():
+    global service, dm
+    if not loader.is_ready():
+        root.after(50, check_loaded)
+        return
+    try:
+        service = loader.wait()
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not load data: {e}")
+        root.destroy()
+        return
+    # From here on writes are queued and saved on a background thread, so
+    # the window never waits on disk; reads still go straight to the journal
+    dm = WriteBehindDataManager(service.get_data_manager())
+    service.set_data_manager(dm)
+    dm.attach(root, on_status=show_save_status, on_failure=report_save_failure)
+    root.title(TITLE)
+    while _waiting:
+        _waiting.pop(0)()
+
+
+def when_ready(action):
+    # Run now if the data is loaded, otherwise as soon as it is
+    if service is not None:
+        action()
+    else:
+        _waiting.append(action)
 
 # -------------------------
 # Registration Screen
@@ -75,30 +88,22 @@ def show_registration():
     pass_entry = tk.Entry(root, show="*")
     pass_entry.pack()
 
-    def register_action():
-        name = name_entry.get().strip()
-        email = email_entry.get().strip()
-        pwd  = pass_entry.get()
-
-        if not name or not email or not pwd:
-            messagebox.showerror("Error", "All fields are required.")
-            return
-
-        # Prevent duplicate emails
-        if any(u.get_email()==email for u in customers+admins):
-            messagebox.showerror("Error", "Email already registered.")
-            return
-
+    def register(name, email, pwd):
         try:
-            new_cust = Customer(name, email, pwd)
-            customers.append(new_cust)
-            users.append(new_cust)
-            dm.save_users(users)
+            # Rejects missing fields and duplicate emails
+            service.register(name, email, pwd)
             messagebox.showinfo("Success", "Registration complete—please log in.")
             show_login()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to register: {e}")
 
+    @metrics.action("gui.register")
+    def register_action():
+        name, email, pwd = name_entry.get(), email_entry.get(), pass_entry.get()
+        when_ready(lambda: register(name, email, pwd))
+
     tk.Button(root, text="Register", command=register_action).pack(pady=10)
     tk.Button(root, text="Back to Login", command=show_login).pack(pady=5)
 
@@ -117,26 +122,49 @@ def show_login():
     pass_entry = tk.Entry(root, show="*")
     pass_entry.pack()
 
-    def login_action():
-        email = email_entry.get().strip()
-        pwd   = pass_entry.get()
+    def login(email, pwd):
         try:
-            for user in customers + admins:
-                if user.get_email()==email and user.check_password(pwd):
-                    messagebox.showinfo("Welcome", f"Hello, {user.get_name()}")
-                    if isinstance(user, Customer):
-                        # Pass the events list for reservation screen
-                        show_customer_menu(user, root, tm, dm, events)
-                    else:
-                        show_admin_menu(user, root, tm, dm)
-                    return
-            raise ValueError("Invalid credentials")
+            user = service.login(email, pwd)
+            messagebox.showinfo("Welcome", f"Hello, {user.get_name()}")
+            if isinstance(user, Customer):
+                show_customer_menu(user, root, service)
+            else:
+                show_admin_menu(user, root, service)
         except Exception as e:
             messagebox.showerror("Login Failed", str(e))
 
+    @metrics.action("gui.login")
+    def login_action():
+        email, pwd = email_entry.get(), pass_entry.get()
+        when_ready(lambda: login(email, pwd))
+
     tk.Button(root, text="Login",    command=login_action).pack(pady=5)
     tk.Button(root, text="Register", command=show_registration).pack(pady=2)
 
-# Launch the app
-show_login()
-root.mainloop()
+def main(folder: str = DATA_FOLDER):
+    global root, loader
+    # Off unless TICKETING_METRICS names a file to dump metrics to
+    metrics.enable_from_env()
+
+    # The login screen comes up straight away; the store, catalog, discounts
+    # and user index load on a background thread meanwhile
+    loader = ServiceLoader(lambda: JournalDataManager(folder=folder))
+    root = tk.Tk()
+    root.title(f"{TITLE} — loading…")
+    root.geometry("500x450")
+    show_login()
+    root.after(50, check_loaded)
+    root.mainloop()
+
+    # Logout and closing the window both end the main loop; make sure every
+    # queued write reaches disk before the process exits
+    if dm is not None:
+        for failure in dm.close():
+            print(f"Could not save {failure.label}: {failure.error}", file=sys.stderr)
+    else:
+        loader.close()
+    metrics.stop_dump()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# metrics.py
+# Optional instrumentation for storage, pricing and GUI actions.
+#
+# Off by default. enable() wraps the public load/save/add/delete methods and
+# transaction() of every storage backend (DataManager, JournalDataManager,
+# SQLiteDataManager) and the TicketManager methods in place; disable() puts
+# the original functions back, so with metrics off those paths run exactly
+# as before. GUI callbacks use the @action decorator, which only checks a
+# flag when off.
+#
+# Each operation records call and error counts, a latency histogram, bytes
+# read and written, and how many objects were loaded or saved. Storage
+# metrics are named after the method: dm.load.users, dm.save.user,
+# dm.add.reservation, dm.transaction... Bytes are what the calling thread
+# read and wrote during the call (Linux only; 0 elsewhere).
+#     snapshot()                      -> dict of everything recorded so far
+#     to_prometheus() / to_json()     -> the snapshot as text
+#     start_dump("metrics.prom", 15)  -> rewrite that file every 15 seconds
+#
+# Set TICKETING_METRICS=<path> to have the GUI and server enable metrics
+# and dump to that file (JSON if it ends in .json, otherwise Prometheus).
+
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+from classes import DataManager, TicketManager
+
+# Latency histogram upper bounds in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STORE_METHODS = (
+    "load_users", "save_users", "load_reservations", "save_reservations",
+    "load_discounts", "save_discounts", "load_sales", "save_sales", "load_ledger", "save_ledger",
+    "save_user", "delete_user", "add_reservation", "delete_reservation", "save_discount",
+    "record_sales", "add_sale_entry",
+)
+TICKET_MANAGER_METHODS = (
+    "register_ticket", "get_ticket_by_name", "get_ticket_types", "add_discount",
+    "get_discounts", "get_active_discounts", "on_discount_change", "apply_discount",
+    "price_many", "quote", "record_sale", "get_sales_report", "sales_between",
+)
+
+_lock = threading.Lock()
+_stats = {}  # operation name -> _Stat
+_originals = {}  # (class, attribute) -> original function while enabled
+_enabled = False
+_dumper = None
+_depth = threading.local()  # n: 1 while a store call is being timed on this thread
+_IO_PATH = "/proc/thread-self/io"
+
+
+class _Stat:
+    __slots__ = ("calls", "errors", "seconds", "buckets", "bytes_read", "bytes_written", "objects")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.objects = 0
+
+
+def record(name: str, seconds: float, failed: bool = False, bytes_read: int = 0,
+           bytes_written: int = 0, objects: int = 0):
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = _Stat()
+        stat.calls += 1
+        stat.errors += failed
+        stat.seconds += seconds
+        stat.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        stat.bytes_read += bytes_read
+        stat.bytes_written += bytes_written
+        stat.objects += objects
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+# ----------------------------
+# Wrappers
+# ----------------------------
+
+def _timed(name: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            record(name, time.perf_counter() - start, failed=True)
+            raise
+        record(name, time.perf_counter() - start)
+        return result
+    return wrapper
+
+
+def _count(data) -> int:
+    return len(data) if isinstance(data, (list, dict)) else 1
+
+
+def _io_counters(start: bool = False) -> tuple:
+    # (bytes read, bytes written) by the calling thread so far, from Linux's
+    # per-thread I/O accounting; (0, 0) where that is not available. The
+    # kernel reports the counters as they were before this read, so a start
+    # reading adds its own size to keep it out of the call's bytes.
+    try:
+        with open(_IO_PATH, "rb") as f:
+            data = f.read()
+    except OSError:
+        return 0, 0
+    fields = dict(line.split(b":", 1) for line in data.splitlines() if b":" in line)
+    return int(fields[b"rchar"]) + (len(data) if start else 0), int(fields[b"wchar"])
+
+
+def _store_metric(method: str) -> str:
+    # load_users -> dm.load.users, add_reservation -> dm.add.reservation
+    return "dm." + method.replace("_", ".", 1)
+
+
+def _wrap_store(method: str, fn):
+    # Only the outermost store call on a thread is recorded, so a backend
+    # method built on other public methods is not counted twice
+    name = _store_metric(method)
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_depth, "n", 0):
+            return fn(self, *args, **kwargs)
+        _depth.n = 1
+        start = time.perf_counter()
+        read, written = _io_counters(start=True)
+        try:
+            result = fn(self, *args, **kwargs)
+        except BaseException:
+            record(name, time.perf_counter() - start, failed=True)
+            raise
+        finally:
+            _depth.n = 0
+        seconds = time.perf_counter() - start
+        read_after, written_after = _io_counters()
+        if method.startswith("load_"):
+            objects = _count(result)
+        else:
+            objects = _count(args[0]) if args else 0
+        record(name, seconds, bytes_read=max(read_after - read, 0),
+               bytes_written=max(written_after - written, 0), objects=objects)
+        return result
+    return wrapper
+
+
+def _wrap_transaction(fn):
+    # Times the whole block, including the writes made when it commits. A
+    # transaction a store method opens for itself is part of that method's call
+    @functools.wraps(fn)
+    @contextlib.contextmanager
+    def transaction(self, *args, **kwargs):
+        if getattr(_depth, "n", 0):
+            with fn(self, *args, **kwargs) as store:
+                yield store
+            return
+        start = time.perf_counter()
+        read, written = _io_counters(start=True)
+        failed = True
+        try:
+            with fn(self, *args, **kwargs) as store:
+                yield store
+            failed = False
+        finally:
+            read_after, written_after = _io_counters()
+            record("dm.transaction", time.perf_counter() - start, failed=failed,
+                   bytes_read=max(read_after - read, 0), bytes_written=max(written_after - written, 0))
+    return transaction
+
+
+def store_classes() -> list:
+    # The storage backends instrumented by default
+    from journal_storage import JournalDataManager
+    from sqlite_storage import SQLiteDataManager
+    return [DataManager, JournalDataManager, SQLiteDataManager]
+
+
+def _patch(cls, attr: str, wrapper):
+    original = cls.__dict__[attr]
+    _originals[(cls, attr)] = original
+    setattr(cls, attr, wrapper(original))
+
+
+def enable(stores: list = None):
+    # stores: backend classes whose public methods are timed; each class is
+    # patched only for the methods it defines itself
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+    for cls in store_classes() if stores is None else stores:
+        for method in STORE_METHODS:
+            if method in cls.__dict__:
+                _patch(cls, method, lambda fn, m=method: _wrap_store(m, fn))
+        if "transaction" in cls.__dict__:
+            _patch(cls, "transaction", _wrap_transaction)
+    for method in TICKET_MANAGER_METHODS:
+        _patch(TicketManager, method, lambda fn, m=method: _timed(f"tm.{m}", fn))
+
+
+def disable():
+    global _enabled
+    with _lock:
+        if not _enabled:
+            return
+        _enabled = False
+    for (cls, attr), original in _originals.items():
+        setattr(cls, attr, original)
+    _originals.clear()
+
+
+def action(name: str):
+    # Decorator for GUI callbacks and other entry points
+    def decorate(fn):
+        timed = _timed(name, fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            return timed(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ----------------------------
+# Export
+# ----------------------------
+
+def snapshot() -> dict:
+    with _lock:
+        stats = list(_stats.items())
+        return {
+            name: {
+                "calls": s.calls,
+                "errors": s.errors,
+                "seconds": s.seconds,
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], s.buckets)),
+                "bytes_read": s.bytes_read,
+                "bytes_written": s.bytes_written,
+                "objects": s.objects,
+            }
+            for name, s in sorted(stats)
+        }
+
+
+def to_json(snap: dict = None) -> str:
+    return json.dumps(snapshot() if snap is None else snap, indent=2)
+
+
+def to_prometheus(snap: dict = None) -> str:
+    snap = snapshot() if snap is None else snap
+    lines = []
+
+    def counter(metric: str, field: str, help_text: str):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for op, s in snap.items():
+            lines.append(f'{metric}{{op="{op}"}} {s[field]}')
+
+    counter("ticketing_calls_total", "calls", "Calls per operation.")
+    counter("ticketing_errors_total", "errors", "Calls that raised.")
+    counter("ticketing_bytes_read_total", "bytes_read", "Bytes read from data files.")
+    counter("ticketing_bytes_written_total", "bytes_written", "Bytes written to data files.")
+    counter("ticketing_objects_total", "objects", "Objects loaded or saved.")
+
+    lines.append("# HELP ticketing_latency_seconds Call latency.")
+    lines.append("# TYPE ticketing_latency_seconds histogram")
+    for op, s in snap.items():
+        cumulative = 0
+        for le, n in s["buckets"].items():
+            cumulative += n
+            lines.append(f'ticketing_latency_seconds_bucket{{op="{op}",le="{le}"}} {cumulative}')
+        lines.append(f'ticketing_latency_seconds_sum{{op="{op}"}} {s["seconds"]}')
+        lines.append(f'ticketing_latency_seconds_count{{op="{op}"}} {s["calls"]}')
+    return "\n".join(lines) + "\n"
+
+
+def dump(path: str, fmt: str = None):
+    # fmt: "json" or "prometheus"; by default picked from the file extension
+    fmt = fmt or ("json" if path.endswith(".json") else "prometheus")
+    text = to_json() if fmt == "json" else to_prometheus()
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def start_dump(path: str, interval: float = 15.0, fmt: str = None):
+    global _dumper
+    stop_dump()
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            dump(path, fmt)
+        dump(path, fmt)
+
+    thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+    _dumper = (stop, thread)
+    thread.start()
+
+
+def stop_dump():
+    # Stops the periodic dump after writing the file one last time
+    global _dumper
+    if _dumper is not None:
+        stop, thread = _dumper
+        _dumper = None
+        stop.set()
+        thread.join()
+
+
+def enable_from_env(var: str = "TICKETING_METRICS") -> bool:
+    path = os.environ.get(var)
+    if not path:
+        return False
+    enable()
+    start_dump(path, float(os.environ.get(f"{var}_INTERVAL", 15)))
+    return True
@@ -0,0 +1,35 @@
+# migrate_data.py
+# Rewrites a data folder's files in the current record format.
+#
+# Old pickle files still load as-is; migrating just makes them smaller and
+# faster to load. --compression also
+# rewrites every file with lzma, gzip or zlib, compressing any records
+# appended uncompressed since the last rewrite. --shard-by splits the
+# reservations into one file per event or event date and seals the shards
+# of events that are already over.
+#     python migrate_data.py gui_data [--compression lzma] [--shard-by event]
+
+import argparse
+
+from classes import DataManager
+from compressed_files import CODECS
+from reservation_shards import SHARD_BY
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite data files in the current format.")
+    parser.add_argument("folder", help="folder holding users.pkl, reservations.pkl, ...")
+    parser.add_argument("--compression", choices=CODECS, help="compress the rewritten files")
+    parser.add_argument("--shard-by", choices=SHARD_BY, help="split reservations into shards")
+    args = parser.parse_args()
+
+    dm = DataManager(folder=args.folder, compression=args.compression, shard_by=args.shard_by)
+    migrated = dm.migrate()
+    print(f"Migrated {', '.join(migrated) or 'nothing'} in {args.folder}")
+    sealed = dm.seal_past_shards()
+    if sealed:
+        print(f"Sealed {len(sealed)} shard(s) of past events")
+
+
+if __name__ == "__main__":
+    main()
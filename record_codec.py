@@ -0,0 +1,518 @@
+# record_codec.py
+# Versioned binary records for the domain objects, used in place of pickles
+# of whole instances.
+#
+# A payload holds one schema's records (users, reservations, tickets,
+# discounts or sales) stored column by column:
+#     _HEAD       magic, schema code, schema version, record count, column count
+#     columns     each one _COLUMN header (encoding, size) and its data
+# A single record (a line of a reservation file, a journal or SQLite row)
+# is too small for per-column headers to pay off; it is written as ROW_MAGIC,
+# schema code and version, then one pickled tuple of its plain column values
+# (every schema column holds exactly one value per record). loads_many()
+# turns runs of such rows back into columns and decodes them in bulk.
+#
+# Column encodings:
+#     _INT / _FLOAT   array("q") / array("d"), little-endian
+#     _TEXT           utf-8 strings joined with NUL
+#     _ID             16-byte packed ids back to back
+#     _ID_LISTS       a uint32 count per record, then all their ids as _ID
+#     _SYMBOL         a table of the distinct values plus one small code per
+#                     record; for payment methods, locations, ticket lines...
+#     _LIST           a pickled list of plain values, used when a column does
+#                     not fit the encoding its schema asked for (a None, a
+#                     non-uuid id, a string holding NUL)
+# Symbol tables are decoded once and shared by every payload that has the
+# same table, so repeated strings are interned across records and files.
+# Objects are built straight from the columns without __setstate__.
+#
+# Every schema has a VERSION. When its columns change, bump VERSION and add
+# MIGRATIONS[old]: a function taking (columns, record count) in the old
+# version's layout and returning the next version's columns; a new column
+# can be given as (PLAIN, values). Older payloads are upgraded as they are
+# read. Anything that is not a payload (data written before this format) is
+# read as a pickle, and objects no schema covers are still pickled.
+
+import gc
+import pickle
+import struct
+import sys
+from array import array
+from itertools import accumulate, groupby
+
+from classes import (
+    Admin, Customer, Discount, Event, GroupTicket, Reservation, SeasonMembership,
+    SingleRaceTicket, Ticket, TICKET_CATALOG, User, WeekendPass, _pack_time, _unpack_time,
+)
+
+MAGIC = b"\xc7\x01"
+ROW_MAGIC = b"\xc7\x02"
+_HEAD = struct.Struct("<2sBBII")
+_ROW_HEAD = struct.Struct("<2sBB")
+_COLUMN = struct.Struct("<BI")
+_SYMBOLS = struct.Struct("<cI")  # code typecode, table size
+_INT, _FLOAT, _TEXT, _ID, _SYMBOL, _LIST, _ID_LISTS = range(7)
+PLAIN = -1  # a column already decoded to a list of values
+_NO_TIME = -(1 << 63)
+_SWAP = sys.byteorder == "big"
+_new = object.__new__
+
+_TABLES = {}  # (table bytes or plain value, convert) -> decoded symbols
+_TABLES_MAX = 4096
+
+
+# ----------------------------
+# Columns
+# ----------------------------
+
+def _array(typecode: str, values) -> bytes:
+    a = array(typecode, values)
+    if _SWAP:
+        a.byteswap()
+    return a.tobytes()
+
+
+def _unarray(typecode: str, data) -> list:
+    a = array(typecode)
+    a.frombytes(data)
+    if _SWAP:
+        a.byteswap()
+    return a.tolist()
+
+
+def column(encoding: int, values: list) -> bytes:
+    # values encoded as asked, or as a _LIST if they do not fit
+    data = None
+    try:
+        if encoding == _INT:
+            data = _array("q", values)
+        elif encoding == _FLOAT:
+            data = _array("d", values)
+        elif encoding == _TEXT:
+            text = "\0".join(values)
+            if text.count("\0") == len(values) - 1:
+                data = text.encode("utf-8")
+        elif encoding == _ID:
+            data = b"".join(values)
+            if len(data) != 16 * len(values):
+                data = None
+        elif encoding == _ID_LISTS:
+            counts = [len(ids) for ids in values]
+            data = b"".join(i for ids in values for i in ids)
+            if len(data) == 16 * sum(counts):
+                data = _array("I", counts) + data
+            else:
+                data = None
+        elif encoding == _SYMBOL:
+            codes = {}
+            for v in values:
+                codes.setdefault(v, len(codes))
+            typecode = "B" if len(codes) <= 0xFF else "H" if len(codes) <= 0xFFFF else "I"
+            table = pickle.dumps(list(codes), pickle.HIGHEST_PROTOCOL)
+            data = (_SYMBOLS.pack(typecode.encode("ascii"), len(table)) + table
+                    + _array(typecode, [codes[v] for v in values]))
+    except (TypeError, OverflowError):
+        data = None
+    if data is None:
+        encoding = _LIST
+        data = pickle.dumps(list(values), pickle.HIGHEST_PROTOCOL)
+    return _COLUMN.pack(encoding, len(data)) + data
+
+
+def _symbol(value, convert):
+    # One shared, converted instance per distinct plain value
+    key = (value, convert)
+    found = _TABLES.get(key)
+    if found is None:
+        found = sys.intern(value) if type(value) is str else value
+        if convert is not None:
+            found = convert(found)
+        if len(_TABLES) >= _TABLES_MAX:
+            _TABLES.clear()
+        _TABLES[key] = found
+    return found
+
+
+def values(col: tuple, n: int, convert=None) -> list:
+    # The n values of an (encoding, data) column; convert is applied to each
+    # distinct symbol once
+    encoding, data = col
+    if encoding == PLAIN:
+        if convert is None:
+            return data
+        return [_symbol(v, convert) for v in data]
+    if encoding == _INT:
+        return _unarray("q", data)
+    if encoding == _FLOAT:
+        return _unarray("d", data)
+    if encoding == _TEXT:
+        return bytes(data).decode("utf-8").split("\0") if n else []
+    if encoding == _ID:
+        return list(struct.Struct("16s" * n).unpack(data)) if n else []
+    if encoding == _ID_LISTS:
+        ends = list(accumulate(_unarray("I", data[:4 * n])))
+        ids = values((_ID, data[4 * n:]), ends[-1] if ends else 0)
+        return [ids[start:end] for start, end in zip([0] + ends, ends)]
+    if encoding == _SYMBOL:
+        typecode, size = _SYMBOLS.unpack_from(data)
+        start = _SYMBOLS.size
+        raw = bytes(data[start:start + size])
+        table = _TABLES.get((raw, convert))
+        if table is None:
+            table = [sys.intern(v) if type(v) is str else v for v in pickle.loads(raw)]
+            if convert is not None:
+                table = [convert(v) for v in table]
+            if len(_TABLES) >= _TABLES_MAX:
+                _TABLES.clear()
+            _TABLES[(raw, convert)] = table
+        codes = _unarray(typecode.decode("ascii"), data[start + size:])
+        return [table[c] for c in codes]
+    if encoding == _LIST:
+        return pickle.loads(data)
+    raise ValueError(f"Unknown column encoding {encoding}")
+
+
+def _time(value) -> int:
+    return _NO_TIME if value is None else _pack_time(value)
+
+
+def _untime(value):
+    return None if value == _NO_TIME else value
+
+
+def _datetime(value):
+    return None if value == _NO_TIME else _unpack_time(value)
+
+
+# ----------------------------
+# Schemas
+# ----------------------------
+
+class _Users:
+    NAME = "users"
+    CODE = 1
+    VERSION = 1
+    KINDS = (User, Customer, Admin)
+    MIGRATIONS = {}
+
+    @staticmethod
+    def encode(users: list) -> list:
+        kinds = [_USER_KINDS[type(u)] for u in users]
+        return [
+            (_INT, kinds),
+            (_ID, [u._User__user_id for u in users]),
+            (_TEXT, [u._User__name for u in users]),
+            (_TEXT, [u._User__email for u in users]),
+            (_TEXT, [u._User__password for u in users]),
+            (_INT, [_time(u._User__created_at) for u in users]),
+            (_SYMBOL, [u._Admin__admin_code if k == 2 else None for u, k in zip(users, kinds)]),
+            (_ID_LISTS, [tuple(u._Customer__reservation_ids) if k == 1 else ()
+                         for u, k in zip(users, kinds)]),
+        ]
+
+    @staticmethod
+    def decode(cols: list, n: int) -> list:
+        classes = _Users.KINDS
+        users = []
+        for kind, uid, name, email, password, created, code, reservation_ids in zip(
+                *(values(c, n) for c in cols)):
+            u = _new(classes[kind])
+            u._User__user_id = uid
+            u._User__name = name
+            u._User__email = email
+            u._User__password = password
+            u._User__created_at = _untime(created)
+            if kind == 1:
+                u._Customer__reservation_ids = list(reservation_ids)
+                u._loaded = {}
+                u._store = None
+            elif kind == 2:
+                u._Admin__admin_code = code
+            users.append(u)
+        return users
+
+
+_USER_KINDS = {cls: i for i, cls in enumerate(_Users.KINDS)}
+
+
+def _lines(lines: tuple) -> tuple:
+    # Stored ticket lines with the catalog's shared key objects
+    return tuple((TICKET_CATALOG.key_for(key), name, price, qty) for key, name, price, qty in lines)
+
+
+class _Reservations:
+    NAME = "reservations"
+    CODE = 2
+    VERSION = 1
+    KINDS = (Reservation,)
+    MIGRATIONS = {}
+
+    @staticmethod
+    def encode(reservations: list) -> list:
+        if any(type(r) is not Reservation for r in reservations):
+            raise TypeError("not a Reservation")
+        events = [r._Reservation__event for r in reservations]
+        return [
+            (_ID, [r._Reservation__reservation_id for r in reservations]),
+            (_ID, [r._Reservation__customer_id for r in reservations]),
+            (_SYMBOL, [r._Reservation__payment_method for r in reservations]),
+            (_FLOAT, [r._Reservation__total_cost for r in reservations]),
+            (_INT, [_time(r._Reservation__reservation_time) for r in reservations]),
+            (_SYMBOL, [tuple(map(tuple, r._Reservation__lines)) for r in reservations]),
+            (_SYMBOL, [e._Event__event_id for e in events]),
+            (_SYMBOL, [e._Event__date for e in events]),
+            (_SYMBOL, [e._Event__location for e in events]),
+            (_SYMBOL, [tuple(getattr(e, "_Event__capacity", {}).items()) for e in events]),
+        ]
+
+    @staticmethod
+    def decode(cols: list, n: int) -> list:
+        reservations = []
+        for rid, cid, payment, total, reserved, lines, eid, date, location, capacity in zip(
+                values(cols[0], n), values(cols[1], n), values(cols[2], n), values(cols[3], n),
+                values(cols[4], n), values(cols[5], n, _lines), values(cols[6], n),
+                values(cols[7], n), values(cols[8], n), values(cols[9], n)):
+            event = _new(Event)
+            event._Event__event_id = eid
+            event._Event__date = date
+            event._Event__location = location
+            event._Event__capacity = dict(capacity)
+            r = _new(Reservation)
+            r._Reservation__reservation_id = rid
+            r._Reservation__customer_id = cid
+            r._Reservation__lines = lines
+            r._Reservation__event = event
+            r._Reservation__total_cost = total
+            r._Reservation__payment_method = payment
+            r._Reservation__reservation_time = _untime(reserved)
+            reservations.append(r)
+        return reservations
+
+
+class _Tickets:
+    NAME = "tickets"
+    CODE = 3
+    VERSION = 1
+    KINDS = (Ticket, SingleRaceTicket, WeekendPass, GroupTicket, SeasonMembership)
+    MIGRATIONS = {}
+
+    @staticmethod
+    def encode(tickets: list) -> list:
+        kinds = [_TICKET_KINDS[type(t)] for t in tickets]
+        return [
+            (_INT, kinds),
+            (_ID, [t._Ticket__ticket_id for t in tickets]),
+            (_TEXT, [t._Ticket__name for t in tickets]),
+            (_FLOAT, [t._Ticket__price for t in tickets]),
+            (_INT, [t._Ticket__valid_days for t in tickets]),
+            (_SYMBOL, [tuple(t._Ticket__features) for t in tickets]),
+            (_INT, [t._GroupTicket__group_size if k == 3 else 0
+                          for t, k in zip(tickets, kinds)]),
+        ]
+
+    @staticmethod
+    def decode(cols: list, n: int) -> list:
+        tickets = []
+        for kind, tid, name, price, valid_days, features, group_size in zip(
+                *(values(c, n) for c in cols)):
+            t = _new(_Tickets.KINDS[kind])
+            t._Ticket__ticket_id = tid
+            t._Ticket__name = name
+            t._Ticket__price = price
+            t._Ticket__valid_days = valid_days
+            t._Ticket__features = list(features)
+            if kind == 3:
+                t._GroupTicket__group_size = group_size
+            tickets.append(t)
+        return tickets
+
+
+_TICKET_KINDS = {cls: i for i, cls in enumerate(_Tickets.KINDS)}
+
+
+class _Discounts:
+    NAME = "discounts"
+    CODE = 4
+    VERSION = 1
+    KINDS = (Discount,)
+    MIGRATIONS = {}
+
+    @staticmethod
+    def encode(discounts: list) -> list:
+        if any(type(d) is not Discount for d in discounts):
+            raise TypeError("not a Discount")
+        return [
+            (_TEXT, [d._Discount__name for d in discounts]),
+            (_SYMBOL, [d._Discount__percentage for d in discounts]),
+            (_SYMBOL, [d._Discount__ticket_type for d in discounts]),
+            (_INT, [d._Discount__active for d in discounts]),
+            (_INT, [d._Discount__priority for d in discounts]),
+            (_SYMBOL, [d._Discount__group for d in discounts]),
+            (_INT, [_time(d._Discount__starts) for d in discounts]),
+            (_INT, [_time(d._Discount__ends) for d in discounts]),
+            (_INT, [d._Discount__min_quantity for d in discounts]),
+            (_SYMBOL, [
+                None if d._Discount__customer_ids is None else tuple(sorted(d._Discount__customer_ids))
+                for d in discounts
+            ]),
+        ]
+
+    @staticmethod
+    def decode(cols: list, n: int) -> list:
+        discounts = []
+        for name, pct, ttype, active, priority, group, starts, ends, min_qty, customers in zip(
+                *(values(c, n) for c in cols)):
+            d = _new(Discount)
+            d._Discount__name = name
+            d._Discount__percentage = pct
+            d._Discount__ticket_type = ttype
+            d._Discount__active = bool(active)
+            d._Discount__priority = priority
+            d._Discount__group = group
+            d._Discount__starts = _datetime(starts)
+            d._Discount__ends = _datetime(ends)
+            d._Discount__min_quantity = min_qty
+            d._Discount__customer_ids = None if customers is None else frozenset(customers)
+            discounts.append(d)
+        return discounts
+
+
+class _Sales:
+    # The daily ticket counts, {"2025-05-10": 7, ...}, as (day, count) records
+    NAME = "sales"
+    CODE = 5
+    VERSION = 1
+    KINDS = ()
+    MIGRATIONS = {}
+
+    @staticmethod
+    def encode(days: list) -> list:
+        return [(_TEXT, [d for d, _ in days]), (_INT, [c for _, c in days])]
+
+    @staticmethod
+    def decode(cols: list, n: int) -> list:
+        return list(zip(values(cols[0], n), values(cols[1], n)))
+
+
+SCHEMAS = {s.NAME: s for s in (_Users, _Reservations, _Tickets, _Discounts, _Sales)}
+_BY_CODE = {s.CODE: s for s in SCHEMAS.values()}
+_BY_TYPE = {cls: s for s in SCHEMAS.values() for cls in s.KINDS}
+
+
+# ----------------------------
+# Payloads
+# ----------------------------
+
+def encode(schema: str, items) -> bytes:
+    # Raises TypeError when an item is not something the schema covers
+    s = SCHEMAS[schema]
+    items = list(items.items() if isinstance(items, dict) else items)
+    try:
+        cols = s.encode(items)
+    except (KeyError, AttributeError) as e:
+        raise TypeError(f"Cannot encode {schema} record: {e!r}") from None
+    return b"".join([_HEAD.pack(MAGIC, s.CODE, s.VERSION, len(items), len(cols))]
+                    + [column(encoding, vals) for encoding, vals in cols])
+
+
+def _upgrade(s, version: int, cols: list, n: int):
+    if version > s.VERSION:
+        raise ValueError(f"{s.NAME} record version {version} is newer than this program")
+    for v in range(version, s.VERSION):
+        cols = s.MIGRATIONS[v](cols, n)
+    return s.decode(cols, n)
+
+
+def decode(data: bytes):
+    # (schema name, decoded items) of a payload written by encode()
+    _, code, version, n, count = _HEAD.unpack_from(data)
+    s = _BY_CODE[code]
+    view = memoryview(data)
+    pos = _HEAD.size
+    cols = []
+    for _ in range(count):
+        encoding, size = _COLUMN.unpack_from(data, pos)
+        pos += _COLUMN.size
+        cols.append((encoding, view[pos:pos + size]))
+        pos += size
+    # Nothing built here can form a cycle; don't let the collector rescan
+    # the heap while thousands of objects are created
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return s.NAME, _upgrade(s, version, cols, n)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def dumps(obj) -> bytes:
+    # One object as a single-record payload, or a pickle if no schema covers it
+    return dumps_many([obj])[0]
+
+
+def dumps_many(objs: list) -> list:
+    # dumps() of each object, encoding runs of the same type together
+    out = []
+    for cls, group in groupby(objs, type):
+        group = list(group)
+        s = _BY_TYPE.get(cls)
+        try:
+            if s is None:
+                raise TypeError(cls)
+            cols = s.encode(group)
+        except (AttributeError, KeyError, TypeError):
+            out.extend(pickle.dumps(obj) for obj in group)
+            continue
+        head = _ROW_HEAD.pack(ROW_MAGIC, s.CODE, s.VERSION)
+        out.extend(head + pickle.dumps(row, pickle.HIGHEST_PROTOCOL)
+                   for row in zip(*(vals for _, vals in cols)))
+    return out
+
+
+def loads(data: bytes):
+    # The object in a dumps() payload, a one-record encode() payload or a pickle
+    return loads_many([data])[0]
+
+
+def loads_many(payloads) -> list:
+    # Every object in a sequence of dumps()/encode() payloads and pickles,
+    # in order
+    out = []
+    for head, group in groupby(payloads, lambda data: data[:4]):
+        if head[:2] == ROW_MAGIC:
+            _, code, version = _ROW_HEAD.unpack(head)
+            rows = [pickle.loads(data[_ROW_HEAD.size:]) for data in group]
+            collecting = gc.isenabled()
+            gc.disable()
+            try:
+                cols = [(PLAIN, col) for col in zip(*rows)]
+                out.extend(_upgrade(_BY_CODE[code], version, cols, len(rows)))
+            finally:
+                if collecting:
+                    gc.enable()
+        elif head[:2] == MAGIC:
+            for data in group:
+                out.extend(decode(data)[1])
+        else:
+            out.extend(pickle.loads(data) for data in group)
+    return out
+
+
+def dump(schema: str, data, f):
+    # A whole list (or the sales dict) as one payload, falling back to a
+    # pickle for data the schema does not cover
+    try:
+        payload = encode(schema, data)
+    except TypeError:
+        pickle.dump(data, f)
+        return
+    f.write(payload)
+
+
+def load(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        f.seek(0)
+        return pickle.load(f)
+    name, items = decode(MAGIC + f.read())
+    return dict(items) if name == "sales" else items
@@ -0,0 +1,323 @@
+# reservation_shards.py
+# Reservations split into one record file per event or per event date.
+#
+# DataManager(shard_by="event" or "date") keeps its reservations in
+# folder/reservations/ instead of a single reservations.pkl:
+#     manifest.json   shard key -> {"file", "count", "events", "first", "last",
+#                     "sealed"}, in the order the shards were created
+#     <key>.pkl       that shard's reservations, in the reservations.pkl
+#                     record format and compression
+# A new reservation is appended to its own shard, and only the small
+# manifest is rewritten with it. Queries for one event or a range of event
+# dates open just the shards the manifest says can hold matches, and paging
+# skips whole shards by their count.
+#
+# Once every event in a shard is over, seal_past() marks it sealed and makes
+# its file read-only. Sealed shards refuse changes; their raw records are
+# kept in memory after the first read since they can no longer change.
+# Event dates are "YYYY-MM-DD" strings, so they compare as text.
+
+import json
+import os
+import re
+import stat
+import uuid
+from datetime import date
+
+import record_codec
+from classes import _RECORD_LEN, _RECORD_MAGIC, _is_record_file, _read_records
+from compressed_files import file_codec, open_read, open_write, should_recompress, tail_size
+
+MANIFEST_VERSION = 1
+SHARD_BY = ("event", "date")
+
+
+def _write_payloads(f, payloads):
+    for payload in payloads:
+        f.write(_RECORD_LEN.pack(len(payload)))
+        f.write(payload)
+
+
+class ReservationShards:
+    def __init__(self, folder: str, shard_by: str = "event", codec: str = None):
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"Unknown shard key: {shard_by}")
+        self.__folder = folder
+        self.__shard_by = shard_by
+        self.__codec = codec
+        self.__manifest_path = os.path.join(folder, "manifest.json")
+        self.__manifest = {}
+        self.__stamp = None  # (mtime, size) of the manifest last read or written
+        self.__cache = {}  # sealed shard key -> ((mtime, size), payloads)
+
+    # ----------------------------
+    # Manifest
+    # ----------------------------
+
+    def __shards(self) -> dict:
+        # The shard table, re-read whenever another instance has changed it.
+        # It is replaced, never changed in place, so callers may hold on to it.
+        try:
+            st = os.stat(self.__manifest_path)
+        except FileNotFoundError:
+            self.__manifest, self.__stamp = {}, None
+            return self.__manifest
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self.__stamp:
+            with open(self.__manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("shard_by") != self.__shard_by:
+                raise ValueError(f"{self.__folder} is sharded by {manifest.get('shard_by')}, "
+                                 f"not {self.__shard_by}")
+            self.__manifest, self.__stamp = manifest["shards"], stamp
+        return self.__manifest
+
+    def __write_manifest(self, shards: dict):
+        os.makedirs(self.__folder, exist_ok=True)
+        tmp = self.__manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "shard_by": self.__shard_by, "shards": shards},
+                      f, indent=1)
+        os.replace(tmp, self.__manifest_path)
+        st = os.stat(self.__manifest_path)
+        self.__manifest, self.__stamp = shards, (st.st_mtime_ns, st.st_size)
+
+    def __copy(self) -> dict:
+        return {key: dict(entry) for key, entry in self.__shards().items()}
+
+    @staticmethod
+    def __new_entry(shards: dict, key: str) -> dict:
+        # File names keep the key readable; keys that clean up to the same
+        # name get a numbered suffix
+        base = re.sub(r"[^\w.-]", "_", key) or "_"
+        taken = {entry["file"] for entry in shards.values()}
+        name, n = f"{base}.pkl", 1
+        while name in taken:
+            n += 1
+            name = f"{base}-{n}.pkl"
+        return {"file": name, "count": 0, "events": [], "first": None, "last": None, "sealed": False}
+
+    @staticmethod
+    def __note(entry: dict, reservations: list):
+        # Add reservations to an entry's count, event ids and date range
+        events = set(entry["events"])
+        dates = [entry["first"], entry["last"]] if entry["first"] is not None else []
+        for r in reservations:
+            event = r.get_event()
+            if event is not None:
+                events.add(event.get_event_id())
+                dates.append(event.get_date())
+        entry["events"] = sorted(events)
+        if dates:
+            entry["first"], entry["last"] = min(dates), max(dates)
+        entry["count"] += len(reservations)
+
+    @staticmethod
+    def __sealed_error(key: str) -> ValueError:
+        return ValueError(f"Reservations in shard {key} are sealed; its events are over.")
+
+    def key_of(self, reservation) -> str:
+        event = reservation.get_event()
+        if event is None:
+            return ""
+        return event.get_event_id() if self.__shard_by == "event" else event.get_date()
+
+    def __group(self, reservations: list) -> dict:
+        groups = {}
+        for r in reservations:
+            groups.setdefault(self.key_of(r), []).append(r)
+        return groups
+
+    # ----------------------------
+    # Shard files
+    # ----------------------------
+
+    def __path(self, entry: dict) -> str:
+        return os.path.join(self.__folder, entry["file"])
+
+    def __read(self, path: str) -> list:
+        if not os.path.exists(path):
+            return []
+        with open_read(path) as f:
+            return list(_read_records(f)) if _is_record_file(f) else []
+
+    def __sealed_payloads(self, key: str, path: str) -> list:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return []
+        stamp = (st.st_mtime_ns, st.st_size)
+        hit = self.__cache.get(key)
+        if hit is None or hit[0] != stamp:
+            hit = self.__cache[key] = (stamp, self.__read(path))
+        return hit[1]
+
+    def __payloads(self, key: str, entry: dict, skip: int = 0):
+        path = self.__path(entry)
+        if entry["sealed"]:
+            yield from self.__sealed_payloads(key, path)[skip:]
+            return
+        if not os.path.exists(path):
+            return
+        with open_read(path) as f:
+            if _is_record_file(f):
+                yield from _read_records(f, skip)
+
+    def __write(self, entry: dict, payloads: list):
+        # Through a temp file, so a crash never leaves a half-written shard
+        os.makedirs(self.__folder, exist_ok=True)
+        path = self.__path(entry)
+        tmp = path + ".tmp"
+        with open_write(tmp, self.__codec) as f:
+            f.write(_RECORD_MAGIC)
+            _write_payloads(f, payloads)
+        os.replace(tmp, path)
+
+    def __append(self, entry: dict, payloads: list):
+        path = self.__path(entry)
+        if os.path.exists(path) and os.path.getsize(path) and file_codec(path) != self.__codec:
+            # Compressed differently: rewrite it with the configured codec
+            self.__write(entry, self.__read(path) + payloads)
+            return
+        os.makedirs(self.__folder, exist_ok=True)
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open_write(path, self.__codec, append=True) as f:
+            if fresh:
+                f.write(_RECORD_MAGIC)
+            _write_payloads(f, payloads)
+        if self.__codec is not None and should_recompress(path):
+            self.__write(entry, self.__read(path))
+
+    # ----------------------------
+    # Reading
+    # ----------------------------
+
+    def exists(self) -> bool:
+        return os.path.exists(self.__manifest_path)
+
+    def manifest(self) -> dict:
+        return self.__copy()
+
+    def count(self) -> int:
+        return sum(entry["count"] for entry in self.__shards().values())
+
+    def select(self, event_id: str = None, start: str = None, end: str = None) -> list:
+        # Keys of the shards that can hold reservations for event_id and/or
+        # events dated start..end (inclusive)
+        keys = []
+        for key, entry in self.__shards().items():
+            if event_id is not None and event_id not in entry["events"]:
+                continue
+            if start is not None and (entry["last"] is None or entry["last"] < start):
+                continue
+            if end is not None and (entry["first"] is None or entry["first"] > end):
+                continue
+            keys.append(key)
+        return keys
+
+    def payloads(self, keys: list = None, skip: int = 0):
+        # Raw records of the given shards (all of them by default), shard by
+        # shard; the first `skip` are passed over, whole shards by count
+        shards = self.__shards()
+        for key in shards if keys is None else keys:
+            entry = shards[key]
+            if skip >= entry["count"]:
+                skip -= entry["count"]
+                continue
+            yield from self.__payloads(key, entry, skip)
+            skip = 0
+
+    # ----------------------------
+    # Writing
+    # ----------------------------
+
+    def append(self, reservations: list):
+        groups = self.__group(reservations)
+        shards = self.__copy()
+        for key in groups:
+            if key in shards and shards[key]["sealed"]:
+                raise self.__sealed_error(key)
+        new = [key for key in groups if key not in shards]
+        if new:
+            # List new shards before writing them, so a crash can't leave
+            # records the manifest doesn't know about
+            for key in new:
+                shards[key] = self.__new_entry(shards, key)
+            self.__write_manifest(shards)
+            shards = self.__copy()
+        for key, items in groups.items():
+            self.__append(shards[key], record_codec.dumps_many(items))
+            self.__note(shards[key], items)
+        self.__write_manifest(shards)
+
+    def save(self, reservations: list):
+        # Replace every reservation. Shards whose records are unchanged are
+        # not rewritten; sealed shards must come back exactly as they are.
+        old = self.__shards()
+        groups = self.__group(reservations)
+        payloads = {key: record_codec.dumps_many(items) for key, items in groups.items()}
+        for key, entry in old.items():
+            if entry["sealed"] and payloads.get(key, []) != list(self.__payloads(key, entry)):
+                raise self.__sealed_error(key)
+        shards = {}
+        for key in list(old) + [key for key in groups if key not in old]:
+            if key in old and old[key]["sealed"]:
+                shards[key] = dict(old[key])
+                continue
+            if key not in groups:
+                continue
+            entry = shards[key] = self.__new_entry({**old, **shards}, key)
+            if key in old:
+                entry["file"] = old[key]["file"]
+            self.__note(entry, groups[key])
+            path = self.__path(entry)
+            if (key not in old or not os.path.exists(path) or file_codec(path) != self.__codec
+                    or tail_size(path) or self.__read(path) != payloads[key]):
+                self.__write(entry, payloads[key])
+        self.__write_manifest(shards)
+        for key in old.keys() - shards.keys():
+            path = self.__path(old[key])
+            if os.path.exists(path):
+                os.remove(path)
+
+    def delete(self, res_id: str) -> bool:
+        # Rewrites only the shard holding res_id. Packed ids appear verbatim
+        # in the records, so only records containing them are decoded.
+        try:
+            needle = uuid.UUID(res_id).bytes
+        except ValueError:
+            needle = None
+        shards = self.__copy()
+        # Open shards first: a sealed one only matters to refuse the change
+        for key in sorted(shards, key=lambda k: shards[k]["sealed"]):
+            entry = shards[key]
+            payloads = list(self.__payloads(key, entry))
+            hits = [i for i, p in enumerate(payloads) if needle is None or needle in p]
+            found = record_codec.loads_many([payloads[i] for i in hits])
+            drop = {i for i, r in zip(hits, found) if r.get_reservation_id() == res_id}
+            if not drop:
+                continue
+            if entry["sealed"]:
+                raise self.__sealed_error(key)
+            kept = [p for i, p in enumerate(payloads) if i not in drop]
+            self.__write(entry, kept)
+            entry.update(events=[], first=None, last=None, count=0)
+            self.__note(entry, record_codec.loads_many(kept))
+            self.__write_manifest(shards)
+            return True
+        return False
+
+    def seal_past(self, today: str = None) -> list:
+        # Seal the shards whose events all took place before today
+        today = today or date.today().isoformat()
+        shards = self.__copy()
+        sealed = [key for key, entry in shards.items()
+                  if not entry["sealed"] and entry["last"] is not None and entry["last"] < today]
+        for key in sealed:
+            shards[key]["sealed"] = True
+            path = self.__path(shards[key])
+            if os.path.exists(path):
+                os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        if sealed:
+            self.__write_manifest(shards)
+        return sealed
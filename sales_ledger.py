@@ -0,0 +1,253 @@
+# sales_ledger.py
+# Column-oriented sales ledger with hour/day/week/month rollups.
+#
+# Every sale is stored once in parallel arrays (timestamp, ticket type,
+# event, quantity, revenue, payment method, discount). Names are interned to
+# small integer codes. Rollup buckets and the per-event, per-payment and
+# per-discount totals are updated as sales are recorded, so range queries
+# and the admin dashboard walk buckets instead of the raw history.
+#
+# Sale entries are (ts, ticket_type, event_id, quantity, revenue,
+# payment_method, discount); entries saved before payment methods and
+# discounts were tracked have only the first five fields.
+
+from array import array
+from datetime import datetime, date, timedelta
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(value)
+
+
+def _as_end(value) -> datetime:
+    # A bare date as the end of a range covers that whole day
+    if isinstance(value, str) and len(value) == 10:
+        value = date.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day, 23, 59, 59, 999999)
+    return _as_datetime(value)
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _next_bucket(start: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return start + timedelta(hours=1)
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def _add(totals: dict, code: int, quantity: int, revenue: float):
+    pair = totals.get(code)
+    if pair is None:
+        totals[code] = [quantity, revenue]
+    else:
+        pair[0] += quantity
+        pair[1] += revenue
+
+
+class _Bucket:
+    __slots__ = ("tickets", "revenue", "by_type")
+
+    def __init__(self):
+        self.tickets = 0
+        self.revenue = 0.0
+        self.by_type = {}  # type code -> [tickets, revenue]
+
+    def add(self, type_code: int, quantity: int, revenue: float):
+        self.tickets += quantity
+        self.revenue += revenue
+        _add(self.by_type, type_code, quantity, revenue)
+
+
+class SalesLedger:
+    def __init__(self):
+        self.__timestamps = array("d")
+        self.__type_codes = array("I")
+        self.__event_codes = array("I")
+        self.__quantities = array("I")
+        self.__revenues = array("d")
+        self.__payment_codes = array("I")
+        self.__discount_codes = array("I")
+        self.__type_names = []
+        self.__type_index = {}
+        self.__event_ids = []
+        self.__event_index = {}
+        self.__payment_names = []
+        self.__payment_index = {}
+        self.__discount_names = []
+        self.__discount_index = {}
+        self.__rollups = {g: {} for g in GRANULARITIES}
+        self.__overall = _Bucket()
+        self.__by_event = {}  # event code -> [tickets, revenue]
+        self.__by_payment = {}  # payment code -> [tickets, revenue]
+        self.__by_discount = {}  # discount code -> [tickets, revenue]
+        self.__first = None
+        self.__last = None
+
+    @classmethod
+    def from_entries(cls, entries) -> "SalesLedger":
+        ledger = cls()
+        for entry in entries:
+            ledger.add_entry(entry)
+        return ledger
+
+    def __setstate__(self, state: dict):
+        # Ledgers pickled before payment methods and discounts were tracked
+        # are replayed so the new columns and totals exist
+        self.__dict__.update(state)
+        if "_SalesLedger__payment_codes" not in state:
+            old = list(zip(
+                self.__timestamps,
+                (self.__type_names[c] for c in self.__type_codes),
+                (self.__event_ids[c] for c in self.__event_codes),
+                self.__quantities,
+                self.__revenues,
+            ))
+            self.__init__()
+            for entry in old:
+                self.add_entry(entry)
+
+    def add_entry(self, entry: tuple) -> tuple:
+        ts, ticket_type, event_id, quantity, revenue = entry[:5]
+        payment_method, discount = (tuple(entry[5:]) + ("", ""))[:2]
+        return self.record(ticket_type, event_id, quantity, revenue,
+                           when=datetime.fromtimestamp(ts),
+                           payment_method=payment_method, discount=discount)
+
+    @staticmethod
+    def __intern(names: list, index: dict, value: str) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(names)
+            names.append(value)
+        return code
+
+    def record(self, ticket_type: str, event_id: str, quantity: int = 1,
+               revenue: float = 0.0, when: datetime = None,
+               payment_method: str = "", discount: str = "") -> tuple:
+        # discount: name of the discount applied, "" for full price
+        when = when or datetime.now()
+        ts = when.timestamp()
+        type_code = self.__intern(self.__type_names, self.__type_index, ticket_type)
+        event_code = self.__intern(self.__event_ids, self.__event_index, event_id)
+        payment_code = self.__intern(self.__payment_names, self.__payment_index, payment_method)
+        discount_code = self.__intern(self.__discount_names, self.__discount_index, discount)
+        self.__timestamps.append(ts)
+        self.__type_codes.append(type_code)
+        self.__event_codes.append(event_code)
+        self.__quantities.append(quantity)
+        self.__revenues.append(revenue)
+        self.__payment_codes.append(payment_code)
+        self.__discount_codes.append(discount_code)
+
+        for granularity, buckets in self.__rollups.items():
+            key = bucket_start(when, granularity)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _Bucket()
+            bucket.add(type_code, quantity, revenue)
+        self.__overall.add(type_code, quantity, revenue)
+        _add(self.__by_event, event_code, quantity, revenue)
+        _add(self.__by_payment, payment_code, quantity, revenue)
+        _add(self.__by_discount, discount_code, quantity, revenue)
+        if self.__first is None or when < self.__first:
+            self.__first = when
+        if self.__last is None or when > self.__last:
+            self.__last = when
+        return (ts, ticket_type, event_id, quantity, revenue, payment_method, discount)
+
+    def __len__(self) -> int:
+        return len(self.__timestamps)
+
+    def entries(self):
+        for i in range(len(self.__timestamps)):
+            yield (
+                self.__timestamps[i],
+                self.__type_names[self.__type_codes[i]],
+                self.__event_ids[self.__event_codes[i]],
+                self.__quantities[i],
+                self.__revenues[i],
+                self.__payment_names[self.__payment_codes[i]],
+                self.__discount_names[self.__discount_codes[i]],
+            )
+
+    @staticmethod
+    def __named(names: list, totals: dict) -> dict:
+        return {
+            names[code]: {"tickets": q, "revenue": round(r, 2)}
+            for code, (q, r) in totals.items()
+        }
+
+    def __breakdown(self, by_type: dict) -> dict:
+        return self.__named(self.__type_names, by_type)
+
+    def sales_between(self, start, end, group_by: str = "day") -> list:
+        # One row per non-empty bucket whose start falls in [start, end]
+        buckets = self.__rollups.get(group_by)
+        if buckets is None:
+            raise ValueError(f"Unknown granularity: {group_by}")
+        rows = []
+        if self.__first is None:
+            return rows
+        # Clamp to the recorded span so open-ended ranges stay cheap
+        key = bucket_start(max(_as_datetime(start), self.__first), group_by)
+        end = min(_as_end(end), self.__last)
+        while key <= end:
+            bucket = buckets.get(key)
+            if bucket is not None:
+                rows.append({
+                    "period": key,
+                    "tickets": bucket.tickets,
+                    "revenue": round(bucket.revenue, 2),
+                    "by_ticket_type": self.__breakdown(bucket.by_type),
+                })
+            key = _next_bucket(key, group_by)
+        return rows
+
+    def totals(self) -> dict:
+        return {
+            "tickets": self.__overall.tickets,
+            "revenue": round(self.__overall.revenue, 2),
+            "by_ticket_type": self.__breakdown(self.__overall.by_type),
+        }
+
+    def dashboard(self) -> dict:
+        # Every figure comes from the maintained totals and day buckets, so
+        # the cost depends on the number of days and names, not on sales
+        days = self.__rollups["day"]
+        return {
+            "tickets": self.__overall.tickets,
+            "revenue": round(self.__overall.revenue, 2),
+            "by_day": [
+                {"date": key.strftime("%Y-%m-%d"), "tickets": days[key].tickets,
+                 "revenue": round(days[key].revenue, 2)}
+                for key in sorted(days)
+            ],
+            "by_event": self.__named(self.__event_ids, self.__by_event),
+            "by_ticket_type": self.__breakdown(self.__overall.by_type),
+            "by_payment_method": self.__named(self.__payment_names, self.__by_payment),
+            "by_discount": self.__named(self.__discount_names, self.__by_discount),
+        }
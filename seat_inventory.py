@@ -0,0 +1,195 @@
+# seat_inventory.py
+# Per-event seat inventory by seating tier.
+#
+# Each (event, tier) pair has a capacity and a live count of seats left.
+# Holds and purchases check and decrement under a lock picked by hashing the
+# event id (lock striping), so bookings for different events rarely wait on
+# each other while two bookings for the same event can never oversell it.
+# Holds that pass their expiry time are returned to the inventory the next
+# time that event's seats are held, counted or confirmed.
+
+import threading
+import time
+import uuid
+
+TIERS = ("standard", "premium", "vip", "paddock")
+
+# Ticket features that take a seat in a tier
+_FEATURE_TIERS = {
+    "Standard seating": "standard",
+    "Group seating": "standard",
+    "Premium seating": "premium",
+    "VIP seating": "vip",
+    "Paddock access": "paddock",
+}
+
+
+class SoldOutError(ValueError):
+    pass
+
+
+def seats_for_ticket(ticket, quantity: int = 1) -> dict:
+    # tier -> seats needed for `quantity` of this ticket
+    per_ticket = ticket.get_group_size() if hasattr(ticket, "get_group_size") else 1
+    seats = {}
+    for feature in ticket.get_features():
+        tier = _FEATURE_TIERS.get(feature)
+        if tier is not None:
+            seats[tier] = per_ticket * quantity
+    return seats
+
+
+def seats_for_tickets(tickets: list) -> dict:
+    seats = {}
+    for ticket in tickets:
+        for tier, n in seats_for_ticket(ticket).items():
+            seats[tier] = seats.get(tier, 0) + n
+    return seats
+
+
+class SeatInventory:
+    def __init__(self, stripes: int = 64):
+        self.__locks = [threading.Lock() for _ in range(stripes)]
+        self.__capacity = {}  # (event_id, tier) -> seats
+        self.__available = {}  # (event_id, tier) -> seats left
+        self.__holds = {}  # hold_id -> (event_id, {tier: seats}, expires_at)
+        self.__event_holds = {}  # event_id -> {hold_id, ...} still held
+
+    def __lock_for(self, event_id: str) -> threading.Lock:
+        return self.__locks[hash(event_id) % len(self.__locks)]
+
+    def __drop(self, hold_id: str) -> bool:
+        # Give a hold's seats back; the caller holds its event's lock
+        hold = self.__holds.pop(hold_id, None)
+        if hold is None:
+            return False
+        event_id, seats, _ = hold
+        self.__event_holds[event_id].discard(hold_id)
+        for tier, n in seats.items():
+            key = (event_id, tier)
+            if key in self.__available:
+                self.__available[key] += n
+        return True
+
+    def __reap(self, event_id: str, now: float = None) -> int:
+        # Release the event's expired holds; the caller holds its lock
+        held = self.__event_holds.get(event_id)
+        if not held:
+            return 0
+        now = time.monotonic() if now is None else now
+        expired = [h for h in held if self.__holds[h][2] <= now]
+        for hold_id in expired:
+            self.__drop(hold_id)
+        return len(expired)
+
+    def set_capacity(self, event_id: str, tier: str, seats: int):
+        # Changing capacity keeps seats already sold or held
+        if tier not in TIERS:
+            raise ValueError(f"Unknown seating tier: {tier}")
+        key = (event_id, tier)
+        with self.__lock_for(event_id):
+            taken = self.__capacity.get(key, 0) - self.__available.get(key, 0)
+            self.__capacity[key] = seats
+            self.__available[key] = seats - taken
+
+    def add_event(self, event):
+        for tier, seats in event.get_capacity().items():
+            self.set_capacity(event.get_event_id(), tier, seats)
+
+    def record_sold(self, event_id: str, seats: dict):
+        # Seats taken by bookings made before this inventory was built
+        with self.__lock_for(event_id):
+            for tier, n in seats.items():
+                key = (event_id, tier)
+                if key in self.__available:
+                    self.__available[key] -= n
+
+    def add_reservations(self, reservations, ticket_for=None):
+        # Count seats already sold for the events this inventory tracks.
+        # ticket_for(name) -> Ticket or None, e.g. TicketManager's
+        # get_ticket_by_name, resolves each ticket line by name, so product
+        # tickets that are built on demand (group sizes) still take seats.
+        for res in reservations:
+            event_id = res.get_event().get_event_id()
+            if ticket_for is None:
+                self.record_sold(event_id, seats_for_tickets(res.get_tickets()))
+                continue
+            seats = {}
+            for _, name, _, quantity in res.get_ticket_lines():
+                ticket = ticket_for(name)
+                if ticket is None:
+                    continue
+                for tier, n in seats_for_ticket(ticket, quantity).items():
+                    seats[tier] = seats.get(tier, 0) + n
+            self.record_sold(event_id, seats)
+
+    def get_capacity(self, event_id: str, tier: str):
+        return self.__capacity.get((event_id, tier))
+
+    def available(self, event_id: str, tier: str):
+        # Seats left, or None when the tier has no capacity limit
+        with self.__lock_for(event_id):
+            self.__reap(event_id)
+            return self.__available.get((event_id, tier))
+
+    def is_sold_out(self, event_id: str, tier: str) -> bool:
+        left = self.available(event_id, tier)
+        return left is not None and left <= 0
+
+    def hold(self, event_id: str, seats: dict, ttl: float = 600.0) -> str:
+        # Reserve seats in every requested tier, or none of them
+        with self.__lock_for(event_id):
+            self.__reap(event_id)
+            for tier, n in seats.items():
+                left = self.__available.get((event_id, tier))
+                if left is not None and left < n:
+                    raise SoldOutError(f"Not enough {tier} seats left for this event.")
+            for tier, n in seats.items():
+                key = (event_id, tier)
+                if key in self.__available:
+                    self.__available[key] -= n
+            hold_id = str(uuid.uuid4())
+            self.__holds[hold_id] = (event_id, dict(seats), time.monotonic() + ttl)
+            self.__event_holds.setdefault(event_id, set()).add(hold_id)
+        return hold_id
+
+    def release(self, hold_id: str):
+        hold = self.__holds.get(hold_id)
+        if hold is None:
+            return
+        with self.__lock_for(hold[0]):
+            self.__drop(hold_id)
+
+    def extend(self, hold_id: str, ttl: float = 600.0):
+        # Keep a live hold for another ttl seconds from now
+        hold = self.__holds.get(hold_id)
+        if hold is None:
+            raise KeyError(f"Unknown or expired hold: {hold_id}")
+        with self.__lock_for(hold[0]):
+            self.__reap(hold[0])
+            hold = self.__holds.get(hold_id)
+            if hold is None:
+                raise KeyError(f"Unknown or expired hold: {hold_id}")
+            self.__holds[hold_id] = (hold[0], hold[1], time.monotonic() + ttl)
+
+    def confirm(self, hold_id: str):
+        # The held seats become sold
+        hold = self.__holds.get(hold_id)
+        if hold is None:
+            raise KeyError(f"Unknown or expired hold: {hold_id}")
+        with self.__lock_for(hold[0]):
+            self.__reap(hold[0])
+            if self.__holds.pop(hold_id, None) is None:
+                raise KeyError(f"Unknown or expired hold: {hold_id}")
+            self.__event_holds[hold[0]].discard(hold_id)
+
+    def purchase(self, event_id: str, seats: dict):
+        self.confirm(self.hold(event_id, seats))
+
+    def expire_holds(self, now: float = None) -> int:
+        # Release every expired hold now, whichever event it is for
+        expired = 0
+        for event_id in list(self.__event_holds):
+            with self.__lock_for(event_id):
+                expired += self.__reap(event_id, now)
+        return expired
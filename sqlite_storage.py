@@ -0,0 +1,384 @@
+# sqlite_storage.py
+# SQLite-backed DataManager with indexed lookup queries.
+#
+# Records are kept as record_codec blobs next to the columns we search on, so
+# the domain classes do not need to change while callers can fetch a single
+# user or one customer's reservations without loading everything. Rows
+# written before that format hold pickles and still load.
+#
+# Migrate existing pickle data with:
+#     python sqlite_storage.py gui_data [--db-folder DIR]
+
+import argparse
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import record_codec
+from classes import DataManager, User, Admin, Customer, Reservation, Discount
+from sales_ledger import SalesLedger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id         TEXT PRIMARY KEY,
+    email      TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    data       BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_users_email ON users (email COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS reservations (
+    id          TEXT PRIMARY KEY,
+    seq         INTEGER NOT NULL,
+    customer_id TEXT NOT NULL,
+    event_id    TEXT NOT NULL,
+    event_date  TEXT NOT NULL,
+    reserved_at TEXT NOT NULL,
+    total_cost  REAL NOT NULL,
+    data        BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_reservations_customer ON reservations (customer_id);
+CREATE INDEX IF NOT EXISTS ix_reservations_event ON reservations (event_id);
+CREATE INDEX IF NOT EXISTS ix_reservations_reserved_at ON reservations (reserved_at);
+CREATE INDEX IF NOT EXISTS ix_reservations_seq ON reservations (seq);
+
+CREATE TABLE IF NOT EXISTS discounts (
+    name        TEXT PRIMARY KEY,
+    seq         INTEGER NOT NULL,
+    ticket_type TEXT NOT NULL,
+    active      INTEGER NOT NULL,
+    data        BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sales (
+    date  TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sale_entries (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts          REAL NOT NULL,
+    ticket_type TEXT NOT NULL,
+    event_id    TEXT NOT NULL,
+    quantity    INTEGER NOT NULL,
+    revenue     REAL NOT NULL,
+    payment_method TEXT NOT NULL DEFAULT '',
+    discount    TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS ix_sale_entries_ts ON sale_entries (ts);
+"""
+
+
+def _user_kind(user: User) -> str:
+    if isinstance(user, Admin):
+        return "admin"
+    if isinstance(user, Customer):
+        return "customer"
+    return "user"
+
+
+class SQLiteDataManager(DataManager):
+    def __init__(self, folder: str = ".", filename: str = "ticketing.db"):
+        super().__init__(folder)
+        self.__path = os.path.join(folder, filename)
+        self.__lock = threading.RLock()
+        self.__depth = 0
+        self.__conn = sqlite3.connect(self.__path, check_same_thread=False, isolation_level=None)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute("PRAGMA synchronous=NORMAL")
+        self.__conn.executescript(SCHEMA)
+        self.__upgrade()
+
+    def __upgrade(self):
+        # Databases created before sales recorded payment method and discount
+        columns = {row[1] for row in self.__conn.execute("PRAGMA table_info(sale_entries)")}
+        for column in ("payment_method", "discount"):
+            if column not in columns:
+                self.__conn.execute(
+                    f"ALTER TABLE sale_entries ADD COLUMN {column} TEXT NOT NULL DEFAULT ''"
+                )
+
+    def get_path(self) -> str:
+        return self.__path
+
+    def close(self):
+        with self.__lock:
+            self.__conn.close()
+
+    @contextmanager
+    def transaction(self):
+        with self.__lock:
+            self.__depth += 1
+            if self.__depth == 1:
+                self.__conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self
+            except BaseException:
+                self.__depth -= 1
+                if self.__depth == 0:
+                    self.__conn.execute("ROLLBACK")
+                raise
+            self.__depth -= 1
+            if self.__depth == 0:
+                self.__conn.execute("COMMIT")
+
+    def __query(self, sql: str, params=()) -> list:
+        with self.__lock:
+            return self.__conn.execute(sql, params).fetchall()
+
+    def __next_seq(self, table: str) -> int:
+        row = self.__conn.execute(f"SELECT COALESCE(MAX(seq), 0) + 1 FROM {table}").fetchone()
+        return row[0]
+
+    # ----------------------------
+    # Row writers (must run inside a transaction)
+    # ----------------------------
+
+    def __put_user(self, user: User):
+        self.__conn.execute(
+            "INSERT OR REPLACE INTO users (id, email, kind, name, data) VALUES (?, ?, ?, ?, ?)",
+            (user.get_id(), user.get_email(), _user_kind(user), user.get_name(), record_codec.dumps(user)),
+        )
+
+    def __put_reservation(self, res: Reservation):
+        existing = self.__conn.execute(
+            "SELECT seq FROM reservations WHERE id = ?", (res.get_reservation_id(),)
+        ).fetchone()
+        seq = existing[0] if existing else self.__next_seq("reservations")
+        event = res.get_event()
+        self.__conn.execute(
+            "INSERT OR REPLACE INTO reservations "
+            "(id, seq, customer_id, event_id, event_date, reserved_at, total_cost, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                res.get_reservation_id(), seq, res.get_customer_id(),
+                event.get_event_id(), event.get_date(),
+                res.get_reservation_time().isoformat(), res.get_total_cost(),
+                record_codec.dumps(res),
+            ),
+        )
+
+    def __put_discount(self, discount: Discount):
+        existing = self.__conn.execute(
+            "SELECT seq FROM discounts WHERE name = ?", (discount.get_name(),)
+        ).fetchone()
+        seq = existing[0] if existing else self.__next_seq("discounts")
+        self.__conn.execute(
+            "INSERT OR REPLACE INTO discounts (name, seq, ticket_type, active, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (discount.get_name(), seq, discount.get_ticket_type(),
+             int(discount.is_active()), record_codec.dumps(discount)),
+        )
+
+    # ----------------------------
+    # DataManager API
+    # ----------------------------
+
+    def save_users(self, users: list):
+        with self.transaction():
+            self.__conn.execute("DELETE FROM users")
+            for u in users:
+                self.__put_user(u)
+
+    def load_users(self) -> list:
+        rows = self.__query("SELECT data FROM users ORDER BY rowid")
+        return self._attach(record_codec.loads_many([r[0] for r in rows]))
+
+    def save_reservations(self, reservations: list):
+        with self.transaction():
+            self.__conn.execute("DELETE FROM reservations")
+            for r in reservations:
+                self.__put_reservation(r)
+
+    def load_reservations(self) -> list:
+        rows = self.__query("SELECT data FROM reservations ORDER BY seq")
+        return record_codec.loads_many([r[0] for r in rows])
+
+    def save_discounts(self, discounts: list):
+        with self.transaction():
+            self.__conn.execute("DELETE FROM discounts")
+            for d in discounts:
+                self.__put_discount(d)
+
+    def load_discounts(self) -> list:
+        rows = self.__query("SELECT data FROM discounts ORDER BY seq")
+        return record_codec.loads_many([r[0] for r in rows])
+
+    def save_sales(self, sales: dict):
+        with self.transaction():
+            self.__conn.execute("DELETE FROM sales")
+            self.__conn.executemany("INSERT INTO sales (date, count) VALUES (?, ?)", sales.items())
+
+    def load_sales(self) -> dict:
+        return dict(self.__query("SELECT date, count FROM sales ORDER BY date"))
+
+    def save_ledger(self, ledger: SalesLedger):
+        with self.transaction():
+            self.__conn.execute("DELETE FROM sale_entries")
+            self.__conn.executemany(
+                "INSERT INTO sale_entries "
+                "(ts, ticket_type, event_id, quantity, revenue, payment_method, discount) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ledger.entries(),
+            )
+
+    def load_ledger(self) -> SalesLedger:
+        return SalesLedger.from_entries(self.__query(
+            "SELECT ts, ticket_type, event_id, quantity, revenue, payment_method, discount "
+            "FROM sale_entries ORDER BY id"
+        ))
+
+    def save_user(self, user: User):
+        with self.transaction():
+            self.__put_user(user)
+
+    def delete_user(self, user_id: str):
+        with self.transaction():
+            self.__conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+
+    def add_reservation(self, reservation: Reservation):
+        with self.transaction():
+            self.__put_reservation(reservation)
+
+    def delete_reservation(self, res_id: str):
+        with self.transaction():
+            self.__conn.execute("DELETE FROM reservations WHERE id = ?", (res_id,))
+
+    def save_discount(self, discount: Discount):
+        with self.transaction():
+            self.__put_discount(discount)
+
+    def record_sales(self, date_str: str, quantity: int = 1):
+        with self.transaction():
+            self.__conn.execute(
+                "INSERT INTO sales (date, count) VALUES (?, ?) "
+                "ON CONFLICT(date) DO UPDATE SET count = count + excluded.count",
+                (date_str, quantity),
+            )
+
+    def add_sale_entry(self, entry: tuple):
+        with self.transaction():
+            self.__conn.execute(
+                "INSERT INTO sale_entries "
+                "(ts, ticket_type, event_id, quantity, revenue, payment_method, discount) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (tuple(entry) + ("", ""))[:7],
+            )
+
+    # ----------------------------
+    # Indexed queries
+    # ----------------------------
+
+    def get_user(self, user_id: str):
+        rows = self.__query("SELECT data FROM users WHERE id = ?", (user_id,))
+        return self._attach([record_codec.loads(rows[0][0])])[0] if rows else None
+
+    def find_user_by_email(self, email: str):
+        rows = self.__query(
+            "SELECT data FROM users WHERE email = ? COLLATE NOCASE LIMIT 1", (email.strip(),)
+        )
+        return self._attach([record_codec.loads(rows[0][0])])[0] if rows else None
+
+    def count_users(self) -> int:
+        return self.__query("SELECT COUNT(*) FROM users")[0][0]
+
+    def iter_reservations(self, filter=None, batch_size: int = 1000):
+        # Pages through the table by seq so no cursor is held between batches
+        last_seq = 0
+        while True:
+            rows = self.__query(
+                "SELECT seq, data FROM reservations WHERE seq > ? ORDER BY seq LIMIT ?",
+                (last_seq, batch_size),
+            )
+            if not rows:
+                return
+            last_seq = rows[-1][0]
+            for res in record_codec.loads_many([data for _, data in rows]):
+                if filter is None or filter(res):
+                    yield res
+
+    def page_reservations(self, offset: int, limit: int) -> list:
+        rows = self.__query(
+            "SELECT data FROM reservations ORDER BY seq LIMIT ? OFFSET ?", (limit, offset)
+        )
+        return record_codec.loads_many([r[0] for r in rows])
+
+    def count_reservations(self) -> int:
+        return self.__query("SELECT COUNT(*) FROM reservations")[0][0]
+
+    def get_reservations_by_ids(self, ids: list) -> list:
+        found = {}
+        ids = list(ids)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.__query(
+                f"SELECT id, data FROM reservations WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            found.update(zip([r[0] for r in rows], record_codec.loads_many([r[1] for r in rows])))
+        return [found[i] for i in ids if i in found]
+
+    def reservations_for_customer(self, customer_id: str) -> list:
+        rows = self.__query(
+            "SELECT data FROM reservations WHERE customer_id = ? ORDER BY seq", (customer_id,)
+        )
+        return record_codec.loads_many([r[0] for r in rows])
+
+    def reservations_for_event(self, event_id: str) -> list:
+        rows = self.__query(
+            "SELECT data FROM reservations WHERE event_id = ? ORDER BY seq", (event_id,)
+        )
+        return record_codec.loads_many([r[0] for r in rows])
+
+    def reservations_between(self, start: str, end: str) -> list:
+        # Inclusive range on the reservation date, "YYYY-MM-DD" strings
+        rows = self.__query(
+            "SELECT data FROM reservations "
+            "WHERE reserved_at >= ? AND reserved_at < date(?, '+1 day') ORDER BY reserved_at",
+            (start, end),
+        )
+        return record_codec.loads_many([r[0] for r in rows])
+
+    def sales_between(self, start: str, end: str) -> dict:
+        # Inclusive range of "YYYY-MM-DD" dates
+        return dict(self.__query(
+            "SELECT date, count FROM sales WHERE date >= ? AND date <= ? ORDER BY date", (start, end)
+        ))
+
+    def get_active_discounts(self) -> list:
+        rows = self.__query("SELECT data FROM discounts WHERE active = 1 ORDER BY seq")
+        return record_codec.loads_many([r[0] for r in rows])
+
+
+def migrate_pickles(src_folder: str, db_folder: str = None, filename: str = "ticketing.db") -> SQLiteDataManager:
+    """Import users/reservations/discounts/sales pickles from src_folder."""
+    source = DataManager(folder=src_folder)
+    target = SQLiteDataManager(folder=db_folder or src_folder, filename=filename)
+    users = source.load_users()
+    reservations = source.load_reservations()
+    with target.transaction():
+        target.save_users(users)
+        target.save_reservations(reservations + source.embedded_reservations(users, reservations))
+        target.save_discounts(source.load_discounts())
+        target.save_sales(source.load_sales())
+        target.save_ledger(source.load_ledger())
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import pickle data files into SQLite.")
+    parser.add_argument("folder", help="folder holding users.pkl, reservations.pkl, ...")
+    parser.add_argument("--db-folder", default=None, help="where to create the database (default: same folder)")
+    parser.add_argument("--filename", default="ticketing.db")
+    args = parser.parse_args()
+
+    dm = migrate_pickles(args.folder, args.db_folder, args.filename)
+    print(f"Imported {dm.count_users()} users, {len(dm.load_reservations())} reservations, "
+          f"{len(dm.load_discounts())} discounts into {dm.get_path()}")
+    dm.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,43 @@
 import os
+import gzip
+import json
 import shutil
+import stat
+import time
 import uuid
 import pickle
 import unittest
+from unittest import mock
 from datetime import datetime, timedelta
 
 from classes import (
     User, Customer, Admin,
-    Ticket, SingleRaceTicket, WeekendPass, GroupTicket,
+    Ticket, SingleRaceTicket, WeekendPass, GroupTicket, SeasonMembership,
     Event, Reservation, Discount,
-    TicketManager, DataManager
+    TicketManager, DataManager, UserRegistry, GroupTicketProduct, TICKET_CATALOG
 )
+from journal_storage import JournalDataManager
+from sqlite_storage import SQLiteDataManager, migrate_pickles
+from sales_ledger import SalesLedger
+from discount_rules import DiscountRules
+import compressed_files
+from compressed_files import CODECS, file_codec
+import record_codec
+from booking_service import BookingService
+from booking_server import BookingServer
+from write_behind import WriteBehindDataManager
+from seat_inventory import SeatInventory, SoldOutError, seats_for_ticket
+
+try:
+    import numpy
+except ImportError:  # analytics needs NumPy
+    numpy = None
+
+try:
+    from virtual_list import PageCache
+    from admin_views import discount_row, filter_discounts
+except ImportError:  # the Tk views need tkinter
+    PageCache = None
 
 class TestUserAndCustomer(unittest.TestCase):
     def setUp(self):
@@ -63,6 +90,83 @@ class TestAdmin(unittest.TestCase):
         self.admin.set_password("xyz")
         self.assertTrue(self.admin.check_password("xyz"))
 
+class TestCompactModel(unittest.TestCase):
+    def test_slots_and_pickle_round_trip(self):
+        cust = Customer("Bob", "bob@example.com", "secret")
+        res = Reservation(cust.get_id(), [SingleRaceTicket()], Event("2025-12-01", "Dubai"), "card")
+        cust.add_reservation(res)
+        for obj in (cust, res, res.get_event(), res.get_tickets()[0], Discount("D", 5, "X")):
+            self.assertFalse(hasattr(obj, "__dict__"))
+        clone = pickle.loads(pickle.dumps(cust))
+        self.assertEqual(clone.get_id(), cust.get_id())
+        self.assertEqual(clone.get_created_at(), cust.get_created_at())
+        self.assertTrue(clone.check_password("secret"))
+        self.assertEqual(clone.get_reservation_ids(), [res.get_reservation_id()])
+        cres = pickle.loads(pickle.dumps(res))
+        self.assertEqual(cres.get_reservation_id(), res.get_reservation_id())
+        self.assertEqual(cres.get_customer_id(), cust.get_id())
+        self.assertEqual(cres.get_reservation_time(), res.get_reservation_time())
+
+    def test_loads_legacy_dict_state(self):
+        # State as pickled by the old dict-based classes
+        created = datetime(2025, 5, 7, 19, 3, 9, 718111)
+        admin = Admin.__new__(Admin)
+        admin.__setstate__({
+            "_User__user_id": "e9471c6d-9179-4cd0-a5c7-6e907770088d",
+            "_User__name": "Admin", "_User__email": "admin@example.com",
+            "_User__password": "admin123", "_User__created_at": created,
+            "_Admin__admin_code": "ADMIN001", "_Admin__removed_field": 1,
+        })
+        self.assertEqual(admin.get_id(), "e9471c6d-9179-4cd0-a5c7-6e907770088d")
+        self.assertEqual(admin.get_created_at(), created)
+        self.assertEqual(admin.get_admin_code(), "ADMIN001")
+        self.assertLess(len(pickle.dumps(admin)), 300)
+
+    def test_migrate_rewrites_files(self):
+        folder = "test_migrate"
+        shutil.copytree("test_data", folder)
+        try:
+            dm = DataManager(folder=folder)
+            before = [u.get_id() for u in dm.load_users()]
+            self.assertEqual(dm.migrate(), ["users", "reservations", "discounts", "sales"])
+            self.assertEqual([u.get_id() for u in dm.load_users()], before)
+        finally:
+            shutil.rmtree(folder)
+
+class TestUserRegistry(unittest.TestCase):
+    def setUp(self):
+        self.cust = Customer("Bob", "Bob@Example.com", "secret")
+        self.admin = Admin("Manager", "mgr@example.com", "adm1n", "CODEX")
+        self.registry = UserRegistry([self.cust, self.admin])
+
+    def test_lookup_and_views(self):
+        self.assertIs(self.registry.find_by_email(" bob@example.COM "), self.cust)
+        self.assertIs(self.registry.get(self.admin.get_id()), self.admin)
+        self.assertIs(self.registry.authenticate("BOB@example.com", "secret"), self.cust)
+        self.assertIsNone(self.registry.authenticate("bob@example.com", "wrong"))
+        self.assertEqual(list(self.registry.customers()), [self.cust])
+        self.assertEqual(list(self.registry.admins()), [self.admin])
+
+        new_cust = Customer("Eve", "eve@example.com", "pw")
+        customers = self.registry.customers()
+        self.registry.add(new_cust)
+        self.assertEqual(len(customers), 2)
+        with self.assertRaises(ValueError):
+            self.registry.add(Customer("Eve2", "EVE@example.com", "pw"))
+
+    def test_index_follows_set_email(self):
+        self.cust.set_email("robert@example.com")
+        self.assertIsNone(self.registry.find_by_email("bob@example.com"))
+        self.assertIs(self.registry.find_by_email("robert@example.com"), self.cust)
+        with self.assertRaises(ValueError):
+            self.cust.set_email("mgr@example.com")
+        self.assertEqual(self.cust.get_email(), "robert@example.com")
+
+        # observers are not persisted
+        clone = pickle.loads(pickle.dumps(self.cust))
+        clone.set_email("clone@example.com")
+        self.assertIs(self.registry.find_by_email("robert@example.com"), self.cust)
+
 class TestTicketTypes(unittest.TestCase):
     def test_generic_ticket(self):
         t = Ticket("Test", 100.0, 2, ["A", "B"])
@@ -121,8 +225,8 @@ class TestEventAndReservation(unittest.TestCase):
         res = Reservation("cust123", [self.t1, self.t2], self.event, "wallet")
         rid = uuid.UUID(res.get_reservation_id())
         self.assertEqual(res.get_customer_id(), "cust123")
-        self.assertListEqual([t.get_ticket_id() for t in res.get_tickets()],
-                             [self.t1.get_ticket_id(), self.t2.get_ticket_id()])
+        self.assertListEqual([t.get_type_id() for t in res.get_tickets()],
+                             [self.t1.get_type_id(), self.t2.get_type_id()])
         # total cost = 300 + 750
         self.assertEqual(res.get_total_cost(), 1050.0)
         # change tickets
@@ -136,6 +240,65 @@ class TestEventAndReservation(unittest.TestCase):
         # reservation_time is recent
         self.assertTrue(datetime.now() - res.get_reservation_time() < timedelta(seconds=1))
 
+class TestTicketCatalog(unittest.TestCase):
+    def test_reservations_reference_ticket_types(self):
+        ev = Event("2025-11-05", "Abu Dhabi")
+        group = GroupTicket(4)
+        res = Reservation("cust", [group, group, WeekendPass()], ev, "card")
+        lines = res.get_ticket_lines()
+        self.assertEqual([(name, qty) for _, name, _, qty in lines],
+                         [("Group Ticket (4)", 2), ("Weekend Pass", 1)])
+        self.assertEqual(lines[0][0], GroupTicket(4).get_type_id())
+        self.assertNotEqual(lines[0][0], GroupTicket(10).get_type_id())
+        self.assertEqual(res.get_total_cost(), 1120.0 * 2 + 750.0)
+
+        # Reloaded reservations resolve to one shared ticket per type
+        tickets = pickle.loads(pickle.dumps(res)).get_tickets()
+        self.assertEqual(len(tickets), 3)
+        self.assertIs(tickets[0], tickets[1])
+        self.assertEqual(tickets[0].get_name(), "Group Ticket (4)")
+
+    def test_serialized_size_and_legacy_reservations(self):
+        ev = Event("2025-11-05", "Abu Dhabi")
+        new = [Reservation("c", [SingleRaceTicket()], ev, "card") for _ in range(200)]
+        legacy = []
+        for r in new:
+            state = r.__getstate__()
+            del state["_Reservation__lines"]
+            state["_Reservation__tickets"] = [SingleRaceTicket()]
+            legacy.append(state)
+        self.assertLess(len(pickle.dumps(new)), len(pickle.dumps(legacy)) * 0.75)
+
+        old = Reservation.__new__(Reservation)
+        old.__setstate__(legacy[0])
+        self.assertEqual(old.get_tickets()[0].get_name(), "Single Race Ticket")
+        self.assertEqual(old.get_ticket_lines()[0][3], 1)
+
+    def test_managers_own_their_catalogs(self):
+        ev = Event("2025-11-05", "Abu Dhabi")
+        first, second = TicketManager(), TicketManager()
+        mine, theirs = WeekendPass(), WeekendPass()
+        first.register_ticket(mine)
+        second.register_ticket(theirs)
+        type_id = mine.get_type_id()
+        self.assertIs(first.get_ticket_by_type_id(type_id), mine)
+        self.assertIs(second.get_ticket_by_type_id(type_id), theirs)
+
+        # Building a reservation never replaces a catalogued ticket
+        shared = TICKET_CATALOG.get(type_id)
+        stray = WeekendPass()
+        res = Reservation("c", [stray], ev, "card")
+        res.set_tickets([stray, stray])
+        self.assertIs(TICKET_CATALOG.get(type_id), shared)
+        self.assertIs(first.get_ticket_by_type_id(type_id), mine)
+        self.assertIs(res.get_tickets(first.get_catalog())[0], mine)
+        self.assertIs(res.get_tickets(second.get_catalog())[0], theirs)
+
+        first.register_product(GroupTicketProduct())
+        group = first.get_ticket_by_name("Group Ticket (6)")
+        self.assertIs(first.get_ticket_by_type_id(group.get_type_id()), group)
+        self.assertIsNone(second.get_ticket_by_type_id(group.get_type_id()))
+
 class TestDiscount(unittest.TestCase):
     def setUp(self):
         self.disc = Discount("EarlyBird", 20, "Single Race Ticket")
@@ -195,6 +358,165 @@ class TestTicketManager(unittest.TestCase):
         rpt2 = self.tm.get_sales_report()
         self.assertEqual(rpt2.get(today), 5)
 
+    def test_indexes_follow_renames_and_toggles(self):
+        self.t1.set_name("Race Day")
+        self.assertIsNone(self.tm.get_ticket_by_name("Single Race Ticket"))
+        self.assertIs(self.tm.get_ticket_by_name("Race Day"), self.t1)
+
+        self.disc.deactivate()
+        self.assertEqual(self.tm.apply_discount(self.t2), 750.0)
+        self.disc.activate()
+        self.assertEqual(self.tm.apply_discount(self.t2), 675.0)
+        self.disc.set_ticket_type("Race Day")
+        self.assertEqual(self.tm.apply_discount(self.t2), 750.0)
+        self.assertEqual(self.tm.apply_discount(self.t1), 270.0)
+
+    def test_best_discount_and_price_many(self):
+        self.tm.add_discount(Discount("Bigger", 30, self.t2.get_name()))
+        self.tm.add_discount(Discount("Smaller", 5, self.t2.get_name()))
+        self.assertEqual(self.tm.apply_discount(self.t2), 525.0)
+        basket = [self.t1, self.t2, WeekendPass(), self.t1]
+        self.assertEqual(self.tm.price_many(basket), [300.0, 525.0, 525.0, 300.0])
+        self.assertEqual(len(self.tm.get_discounts()), 3)
+
+    def test_discount_rules(self):
+        name = self.t2.get_name()
+        may = datetime(2025, 5, 10)
+        self.tm.add_discount(Discount("Loyalty", 5, name, group="loyalty", customer_ids=["vip"]))
+        self.tm.add_discount(Discount("Bulk", 20, name, min_quantity=4))
+        self.tm.add_discount(Discount("May Flash", 15, name, priority=1,
+                                      starts=datetime(2025, 5, 1), ends=datetime(2025, 6, 1)))
+        basket = [(self.t2, 1), (self.t2, 4), (self.t1, 4)]
+        # In May the higher-priority flash sale beats the bigger bulk discount
+        lines = self.tm.quote(basket, at_time=may)
+        self.assertEqual([l["unit_price"] for l in lines], [637.5, 637.5, 300.0])
+        self.assertEqual(lines[0]["discounts"], ["May Flash"])
+        # Outside the window bulk applies from 4 tickets; loyalty stacks on top
+        lines = self.tm.quote(basket, customer="vip", at_time=datetime(2025, 7, 1))
+        self.assertEqual(lines[0]["discounts"], ["GroupSale", "Loyalty"])
+        self.assertEqual(lines[1]["discounts"], ["Bulk", "Loyalty"])
+        self.assertEqual(lines[1]["unit_price"], round(750 * 0.8 * 0.95, 2))
+        self.assertEqual(lines[1]["total"], round(lines[1]["unit_price"] * 4, 2))
+
+    def test_rule_changes_invalidate_only_their_ticket_type(self):
+        rules = self.tm.get_discount_rules()
+        self.tm.apply_discount(self.t1)
+        self.tm.apply_discount(self.t2)
+        self.assertEqual(rules.compiled_count(), 2)
+        self.disc.deactivate()
+        self.assertEqual(rules.compiled_count(), 1)
+        self.assertEqual(self.tm.apply_discount(self.t2), 750.0)
+        self.disc.activate()
+        self.disc.set_min_quantity(2)
+        self.assertEqual(self.tm.quote([(self.t2, 2)])[0]["unit_price"], 675.0)
+        self.assertEqual(self.tm.apply_discount(self.t2), 750.0)
+
+    def test_group_product_any_size(self):
+        self.tm.register_product(GroupTicketProduct(min_size=2, max_size=20))
+        seven = self.tm.get_ticket_by_name("Group Ticket (7)")
+        self.assertIs(self.tm.get_ticket_by_name("Group Ticket (7)"), seven)
+        self.assertEqual(seven.get_price(), GroupTicket(7).get_price())
+        self.assertEqual(seven.get_type_id(), GroupTicket(7).get_type_id())
+        self.assertIsNone(self.tm.get_ticket_by_name("Group Ticket (21)"))
+        self.assertIsNone(self.tm.get_ticket_by_name("Group Ticket (x)"))
+
+        # A product-wide rule covers every size; a size-specific one stacks on it
+        self.tm.add_discount(Discount("Groups", 10, "Group Ticket"))
+        self.tm.add_discount(Discount("Sevens", 5, "Group Ticket (7)", group="sevens"))
+        five = self.tm.get_ticket_by_name("Group Ticket (5)")
+        self.assertEqual(self.tm.apply_discount(five), round(five.get_price() * 0.9, 2))
+        self.assertEqual(sorted(self.tm.quote([(seven, 1)])[0]["discounts"]), ["Groups", "Sevens"])
+
+    def test_quote_cache(self):
+        self.tm.register_product(GroupTicketProduct())
+        rules = self.tm.get_discount_rules()
+        promo = Discount("Groups", 10, "Group Ticket")
+        self.tm.add_discount(promo)
+        six = self.tm.get_ticket_by_name("Group Ticket (6)")
+        first = self.tm.quote([(six, 2), (self.t2, 1)])
+        self.assertEqual(rules.cache_info()["size"], 2)
+        self.assertEqual(self.tm.quote([(six, 2), (self.t2, 1)]), first)
+        self.assertEqual(rules.cache_info()["size"], 2)
+        # Toggling the product rule drops only the group ticket's prices
+        promo.deactivate()
+        self.assertEqual(rules.cache_info()["size"], 1)
+        self.assertEqual(self.tm.apply_discount(six), six.get_price())
+        # A new base price is a new cache key
+        self.t2.set_price(800.0)
+        self.assertEqual(self.tm.apply_discount(self.t2), 720.0)
+
+        small = DiscountRules(cache_size=2)
+        for price in (1.0, 2.0, 3.0):
+            small.price("T", price)
+        self.assertEqual(small.cache_info(), {"size": 2, "max_size": 2})
+
+    def test_discounts_saved_before_rules_load_with_defaults(self):
+        legacy = Discount.__new__(Discount)
+        legacy.__setstate__({"_Discount__name": "Old", "_Discount__percentage": 10,
+                             "_Discount__ticket_type": "Weekend Pass", "_Discount__active": True})
+        self.assertEqual(legacy.get_group(), "default")
+        self.assertFalse(legacy.is_conditional())
+        self.assertEqual(pickle.loads(pickle.dumps(legacy)).get_min_quantity(), 1)
+
+    def test_record_sale_feeds_ledger(self):
+        ev = Event("2025-05-10", "Yas")
+        self.tm.record_sale(2, ticket=self.t2, event=ev, revenue=1350.0)
+        today = datetime.now().strftime("%Y-%m-%d")
+        rows = self.tm.sales_between(today, today)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["tickets"], 2)
+        self.assertEqual(rows[0]["revenue"], 1350.0)
+        self.assertEqual(rows[0]["by_ticket_type"]["Weekend Pass"]["tickets"], 2)
+
+class TestSalesLedger(unittest.TestCase):
+    def setUp(self):
+        self.ledger = SalesLedger()
+        base = datetime(2025, 5, 5, 9, 30)  # a Monday
+        for day in range(10):
+            self.ledger.record("Weekend Pass", "ev1", 1, 750.0, when=base + timedelta(days=day))
+            self.ledger.record("Single Race Ticket", "ev2", 2, 600.0, when=base + timedelta(days=day, hours=3))
+
+    def test_rollups(self):
+        days = self.ledger.sales_between("2025-05-06", "2025-05-07", group_by="day")
+        self.assertEqual([r["period"].day for r in days], [6, 7])
+        self.assertEqual(days[0]["tickets"], 3)
+        self.assertEqual(days[0]["revenue"], 1350.0)
+
+        hours = self.ledger.sales_between("2025-05-06", "2025-05-06", group_by="hour")
+        self.assertEqual([r["period"].hour for r in hours], [9, 12])
+
+        weeks = self.ledger.sales_between("2025-05-01", "2025-05-31", group_by="week")
+        self.assertEqual([r["tickets"] for r in weeks], [21, 9])
+
+        months = self.ledger.sales_between("2025-01-01", "2025-12-31", group_by="month")
+        self.assertEqual(len(months), 1)
+        self.assertEqual(months[0]["by_ticket_type"]["Single Race Ticket"],
+                         {"tickets": 20, "revenue": 6000.0})
+        with self.assertRaises(ValueError):
+            self.ledger.sales_between("2025-01-01", "2025-12-31", group_by="year")
+
+    def test_entries_round_trip(self):
+        copy = SalesLedger.from_entries(self.ledger.entries())
+        self.assertEqual(len(copy), 20)
+        self.assertEqual(copy.totals(), self.ledger.totals())
+        self.assertEqual(pickle.loads(pickle.dumps(self.ledger)).totals()["revenue"], 13500.0)
+
+    def test_dashboard_totals(self):
+        self.ledger.record("Weekend Pass", "ev1", 1, 600.0, when=datetime(2025, 5, 20),
+                           payment_method="Apple Pay", discount="Weekend Promo")
+        # Entries saved before payment method and discount were recorded
+        self.ledger.add_entry((datetime(2025, 5, 21).timestamp(), "Weekend Pass", "ev2", 1, 750.0))
+        data = self.ledger.dashboard()
+        self.assertEqual(data["tickets"], 32)
+        self.assertEqual(len(data["by_day"]), 12)
+        self.assertEqual(data["by_day"][-2], {"date": "2025-05-20", "tickets": 1, "revenue": 600.0})
+        self.assertEqual(data["by_event"]["ev1"], {"tickets": 11, "revenue": 8100.0})
+        self.assertEqual(data["by_payment_method"]["Apple Pay"], {"tickets": 1, "revenue": 600.0})
+        self.assertEqual(data["by_discount"], {"": {"tickets": 31, "revenue": 14250.0},
+                                               "Weekend Promo": {"tickets": 1, "revenue": 600.0}})
+        copy = SalesLedger.from_entries(self.ledger.entries())
+        self.assertEqual(copy.dashboard(), data)
+
 class TestDataManager(unittest.TestCase):
     TEST_DIR = "test_data_mgr"
 
@@ -237,6 +559,1222 @@ class TestDataManager(unittest.TestCase):
         self.assertIsInstance(loaded, dict)
         self.assertEqual(loaded.get("2025-05-10"), 7)
 
+    def test_single_record_operations(self):
+        cust = Customer("C", "c@c.com", "pw")
+        self.dm.save_user(cust)
+        cust.set_name("Changed")
+        self.dm.save_user(cust)
+        loaded = self.dm.load_users()
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(loaded[0].get_name(), "Changed")
+
+        res = Reservation(cust.get_id(), [SingleRaceTicket()], Event("2025-01-01", "X"), "card")
+        with self.dm.transaction():
+            self.dm.add_reservation(res)
+            self.dm.record_sales("2025-05-10", 2)
+        self.assertEqual(len(self.dm.load_reservations()), 1)
+        self.assertEqual(self.dm.load_sales(), {"2025-05-10": 2})
+
+    def test_ledger_persistence(self):
+        tm = TicketManager()
+        self.dm.add_sale_entry(tm.record_sale(1, ticket=WeekendPass(), revenue=600.0))
+        self.dm.add_sale_entry(tm.record_sale(1, ticket=SingleRaceTicket(), revenue=300.0))
+        self.assertEqual(self.dm.load_ledger().totals(), tm.get_ledger().totals())
+
+    def test_streaming_and_paged_reservations(self):
+        ev = Event("2025-01-01", "X")
+        reservations = [Reservation(f"c{i % 3}", [SingleRaceTicket()], ev, "card") for i in range(25)]
+        self.dm.save_reservations(reservations[:20])
+        path = os.path.join(self.TEST_DIR, "reservations.pkl")
+        size = os.path.getsize(path)
+        for r in reservations[20:]:
+            self.dm.add_reservation(r)
+        self.assertGreater(os.path.getsize(path), size)
+
+        ids = [r.get_reservation_id() for r in reservations]
+        self.assertEqual([r.get_reservation_id() for r in self.dm.iter_reservations(batch_size=4)], ids)
+        self.assertEqual(len(list(self.dm.iter_reservations(lambda r: r.get_customer_id() == "c1"))), 8)
+        self.assertEqual([r.get_reservation_id() for r in self.dm.page_reservations(10, 5)], ids[10:15])
+        self.assertEqual(self.dm.page_reservations(24, 10)[0].get_reservation_id(), ids[24])
+        self.assertEqual(self.dm.page_reservations(30, 10), [])
+        self.assertEqual(self.dm.count_reservations(), 25)
+        self.assertEqual(len(self.dm.load_reservations()), 25)
+
+    def test_old_reservation_file_is_converted_on_append(self):
+        shutil.rmtree(self.TEST_DIR)
+        shutil.copytree("test_data", self.TEST_DIR)
+        self.assertEqual(len(self.dm.page_reservations(0, 10)), 1)
+        self.dm.add_reservation(Reservation("c", [SingleRaceTicket()], Event("2025-01-01", "X"), "card"))
+        self.assertEqual(self.dm.count_reservations(), 2)
+        self.assertEqual(self.dm.load_reservations()[0].get_customer_id(),
+                         "cf6de2a4-019e-484f-918e-dfd5399f005a")
+
+    def test_users_store_only_reservation_ids(self):
+        cust = Customer("C", "c@c.com", "pw")
+        ev = Event("2025-01-01", "X")
+        for _ in range(50):
+            res = Reservation(cust.get_id(), [SingleRaceTicket()], ev, "card")
+            cust.add_reservation(res)
+            self.dm.add_reservation(res)
+        self.dm.save_user(cust)
+        size_with_history = os.path.getsize(os.path.join(self.TEST_DIR, "users.pkl"))
+        self.assertLess(size_with_history, 1500)
+
+        loaded = self.dm.load_users()[0]
+        self.assertEqual(len(loaded.get_reservation_ids()), 50)
+        self.assertEqual(loaded.get_loaded_reservations(), [])
+        self.assertEqual(len(loaded.get_reservations()), 50)
+        self.assertEqual(len(self.dm.reservations_for_customer(cust.get_id())), 50)
+
+    def test_legacy_embedded_reservations_are_kept(self):
+        cust = Customer("C", "c@c.com", "pw")
+        res = Reservation(cust.get_id(), [SingleRaceTicket()], Event("2025-01-01", "X"), "card")
+        state = cust.__getstate__()
+        del state["_Customer__reservation_ids"]
+        state["_Customer__reservations"] = [res]
+        legacy = Customer.__new__(Customer)
+        legacy.__setstate__(state)
+        self.assertEqual(legacy.get_reservations()[0].get_reservation_id(), res.get_reservation_id())
+
+        # gui_data still has reservations embedded in users.pkl
+        shutil.rmtree(self.TEST_DIR)
+        shutil.copytree("gui_data", self.TEST_DIR)
+        os.remove(os.path.join(self.TEST_DIR, "reservations.pkl"))
+        self.dm.migrate()
+        customer = [u for u in self.dm.load_users() if isinstance(u, Customer)][0]
+        self.assertEqual(len(customer.get_reservations()), 2)
+        self.assertEqual(len(self.dm.load_reservations()), 2)
+
+    def test_compressed_files(self):
+        ev = Event("2025-01-01", "X")
+        reservations = [Reservation(f"c{i % 3}", [SingleRaceTicket()], ev, "card") for i in range(30)]
+        ids = [r.get_reservation_id() for r in reservations]
+        plain_size = None
+        for codec in (None,) + CODECS:
+            folder = os.path.join(self.TEST_DIR, codec or "plain")
+            os.mkdir(folder)
+            dm = DataManager(folder=folder, compression=codec)
+            dm.save_users([Customer("C", "c@c.com", "pw")])
+            dm.save_reservations(reservations[:20])
+            for r in reservations[20:]:
+                dm.add_reservation(r)
+            path = os.path.join(folder, "reservations.pkl")
+            self.assertEqual(file_codec(path), codec)
+            if codec is None:
+                plain_size = os.path.getsize(path)
+            else:
+                self.assertLess(os.path.getsize(path), plain_size)
+
+            # Read back by a store configured without compression
+            reader = DataManager(folder=folder)
+            self.assertEqual(reader.load_users()[0].get_email(), "c@c.com")
+            self.assertEqual([r.get_reservation_id() for r in reader.iter_reservations(batch_size=7)], ids)
+            self.assertEqual([r.get_reservation_id() for r in reader.page_reservations(18, 5)], ids[18:23])
+            self.assertEqual(reader.count_reservations(), 30)
+
+        # Appending with another codec rewrites the file in that codec first
+        dm = DataManager(folder=os.path.join(self.TEST_DIR, "gzip"), compression={"reservations": "lzma"})
+        dm.add_reservation(Reservation("c", [SingleRaceTicket()], ev, "card"))
+        path = os.path.join(self.TEST_DIR, "gzip", "reservations.pkl")
+        self.assertEqual(file_codec(path), "lzma")
+        self.assertEqual(dm.count_reservations(), 31)
+        self.assertEqual(dm.get_compression()["users"], None)
+
+        # migrate() converts plain files to the configured codec
+        folder = os.path.join(self.TEST_DIR, "plain")
+        self.assertEqual(DataManager(folder=folder, compression="zlib").migrate(), ["users", "reservations"])
+        self.assertEqual(file_codec(os.path.join(folder, "users.pkl")), "zlib")
+        self.assertEqual(DataManager(folder=folder).count_reservations(), 30)
+
+        with self.assertRaises(ValueError):
+            DataManager(folder=self.TEST_DIR, compression="bz2")
+        with self.assertRaises(ValueError):
+            DataManager(folder=self.TEST_DIR, compression={"tickets": "lzma"})
+
+    def test_compressed_appends_stay_plain_until_rewritten(self):
+        ev = Event("2025-01-01", "X")
+        reservations = [Reservation(f"c{i}", [SingleRaceTicket()], ev, "card") for i in range(40)]
+        ids = [r.get_reservation_id() for r in reservations]
+        plain = DataManager(folder=self.TEST_DIR)
+        for r in reservations[:20]:
+            plain.add_reservation(r)
+        plain_size = os.path.getsize(os.path.join(self.TEST_DIR, "reservations.pkl"))
+        for codec in CODECS:
+            folder = os.path.join(self.TEST_DIR, codec)
+            os.mkdir(folder)
+            path = os.path.join(folder, "reservations.pkl")
+            dm = DataManager(folder=folder, compression=codec)
+            for r in reservations[:20]:
+                dm.add_reservation(r)
+            # Appends cost a header, not a compressed member each
+            self.assertEqual(file_codec(path), codec)
+            self.assertLess(os.path.getsize(path) - plain_size, 64)
+            self.assertGreater(compressed_files.tail_size(path), 0)
+
+            dm.save_reservations(dm.load_reservations())
+            self.assertEqual(compressed_files.tail_size(path), 0)
+            with mock.patch.object(compressed_files, "TAIL_LIMIT", 0):
+                for r in reservations[20:]:
+                    dm.add_reservation(r)
+            self.assertLess(compressed_files.tail_size(path), os.path.getsize(path))
+            reader = DataManager(folder=folder)
+            self.assertEqual([r.get_reservation_id() for r in reader.load_reservations()], ids)
+            self.assertEqual([r.get_reservation_id() for r in reader.page_reservations(15, 10)], ids[15:25])
+
+        # Files written before the body length was stored still read and append
+        path = os.path.join(self.TEST_DIR, "legacy.bin")
+        with open(path, "wb") as f:
+            f.write(b"GPZ1 gzip\n" + gzip.compress(b"old"))
+        with compressed_files.open_write(path, "gzip", append=True) as f:
+            f.write(b" new")
+        with compressed_files.open_read(path) as f:
+            self.assertEqual(f.read(), b"old new")
+
+    def test_sharded_reservations(self):
+        past, other, future = Event("2020-05-10", "X"), Event("2020-05-11", "X"), Event("2099-05-10", "X")
+        events = [past, other, future]
+        reservations = [Reservation(f"c{i}", [SingleRaceTicket()], events[i % 3], "card") for i in range(30)]
+        ids = [r.get_reservation_id() for r in reservations]
+        # An unsharded store seeds the shards on first use
+        DataManager(folder=self.TEST_DIR).save_reservations(reservations[:12])
+        dm = DataManager(folder=self.TEST_DIR, shard_by="event")
+        self.assertEqual(dm.count_reservations(), 12)
+        shard_dir = os.path.join(self.TEST_DIR, "reservations")
+        for r in reservations[12:]:
+            before = {f: os.path.getmtime(os.path.join(shard_dir, f)) for f in os.listdir(shard_dir)}
+            dm.add_reservation(r)
+            # Only the reservation's own shard and the manifest change
+            shard = dm.get_shards()[r.get_event().get_event_id()]["file"]
+            changed = {f for f, t in before.items() if os.path.getmtime(os.path.join(shard_dir, f)) != t}
+            self.assertLessEqual(changed, {shard, "manifest.json"})
+
+        reader = DataManager(folder=self.TEST_DIR, shard_by="event")
+        self.assertEqual(reader.count_reservations(), 30)
+        self.assertEqual(sorted(r.get_reservation_id() for r in reader.load_reservations()), sorted(ids))
+        by_event = [r.get_reservation_id() for r in reader.reservations_for_event(past.get_event_id())]
+        self.assertEqual(by_event, ids[::3])
+        self.assertEqual(len(reader.reservations_for_event_dates("2020-05-11", "2020-12-31")), 10)
+        order = [r.get_reservation_id() for r in reader.iter_reservations()]
+        self.assertEqual([r.get_reservation_id() for r in reader.page_reservations(8, 6)], order[8:14])
+
+        # Past events are sealed: read-only on disk and refusing changes
+        self.assertEqual(sorted(reader.seal_past_shards("2025-01-01")),
+                         sorted([past.get_event_id(), other.get_event_id()]))
+        sealed = os.path.join(shard_dir, reader.get_shards()[past.get_event_id()]["file"])
+        self.assertFalse(os.stat(sealed).st_mode & stat.S_IWUSR)
+        with self.assertRaises(ValueError):
+            reader.delete_reservation(ids[0])
+        with self.assertRaises(ValueError):
+            reader.add_reservation(Reservation("c", [SingleRaceTicket()], past, "card"))
+        reader.delete_reservation(ids[2])
+        self.assertEqual(reader.count_reservations(), 29)
+        self.assertEqual(len(reader.reservations_for_event(past.get_event_id())), 10)
+        self.assertEqual(DataManager(folder=self.TEST_DIR, shard_by="event").migrate(), ["reservations"])
+
+        # Date shards group every event of a day
+        folder = os.path.join(self.TEST_DIR, "by_date")
+        os.mkdir(folder)
+        dm = DataManager(folder=folder, shard_by="date", compression="zlib")
+        dm.save_reservations(reservations + [Reservation("c", [SingleRaceTicket()], Event("2020-05-10", "Y"), "card")])
+        self.assertEqual(sorted(dm.get_shards()), ["2020-05-10", "2020-05-11", "2099-05-10"])
+        self.assertEqual(dm.get_shards()["2020-05-10"]["count"], 11)
+        self.assertEqual(len(dm.reservations_for_event(past.get_event_id())), 10)
+        with self.assertRaises(ValueError):
+            DataManager(folder=folder, shard_by="event").load_reservations()
+        with self.assertRaises(ValueError):
+            DataManager(folder=folder, shard_by="customer")
+
+class TestJournalDataManager(unittest.TestCase):
+    TEST_DIR = "test_journal"
+
+    def setUp(self):
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        self.dm = JournalDataManager(folder=self.TEST_DIR, fsync=False)
+
+    def tearDown(self):
+        self.dm.close()
+        shutil.rmtree(self.TEST_DIR)
+
+    def reopen(self, **kwargs):
+        self.dm.close()
+        self.dm = JournalDataManager(folder=self.TEST_DIR, fsync=False, **kwargs)
+
+    def test_closed_journal_fails_cleanly(self):
+        self.dm.save_user(Customer("C", "c@c.com", "pw"))
+        self.dm.close()
+        with self.assertRaises(ValueError):
+            self.dm.compact()
+        with self.assertRaises(ValueError):
+            self.dm.save_user(Customer("D", "d@d.com", "pw"))
+        self.dm.close()  # closing twice is fine
+        self.reopen()
+        self.assertEqual([u.get_email() for u in self.dm.load_users()], ["c@c.com"])
+
+    def test_booking_is_one_append_and_replays(self):
+        cust = Customer("C", "c@c.com", "pw")
+        self.dm.save_users([cust, Admin("A", "a@a.com", "pw", "X")])
+        log = os.path.join(self.TEST_DIR, "journal.log")
+        size_before = os.path.getsize(log)
+
+        res = Reservation(cust.get_id(), [WeekendPass()], Event("2025-05-10", "Yas"), "card")
+        cust.add_reservation(res)
+        with self.dm.transaction():
+            self.dm.save_user(cust)
+            self.dm.add_reservation(res)
+            self.dm.record_sales("2025-05-10", 1)
+            self.dm.record_sales("2025-05-10", 1)
+        self.assertGreater(os.path.getsize(log), size_before)
+
+        self.reopen()
+        users = {u.get_id(): u for u in self.dm.load_users()}
+        self.assertEqual(len(users), 2)
+        self.assertEqual(len(users[cust.get_id()].get_reservations()), 1)
+        self.assertEqual(self.dm.load_reservations()[0].get_reservation_id(), res.get_reservation_id())
+        self.assertEqual(self.dm.load_sales(), {"2025-05-10": 2})
+
+    def test_ledger_entries_replay(self):
+        tm = TicketManager()
+        with self.dm.transaction():
+            self.dm.add_sale_entry(tm.record_sale(1, ticket=WeekendPass(), revenue=600.0))
+            self.dm.add_sale_entry(tm.record_sale(3, ticket=SingleRaceTicket(), revenue=900.0))
+        self.reopen()
+        self.assertEqual(self.dm.load_ledger().totals(), tm.get_ledger().totals())
+
+    def test_paged_reservations(self):
+        ev = Event("2025-01-01", "X")
+        reservations = [Reservation("c", [SingleRaceTicket()], ev, "card") for _ in range(7)]
+        self.dm.save_reservations(reservations)
+        ids = [r.get_reservation_id() for r in reservations]
+        self.assertEqual([r.get_reservation_id() for r in self.dm.iter_reservations(batch_size=3)], ids)
+        self.assertEqual([r.get_reservation_id() for r in self.dm.page_reservations(5, 5)], ids[5:])
+        self.assertEqual(self.dm.count_reservations(), 7)
+
+    def test_save_list_diffs_and_deletes(self):
+        d1, d2 = Discount("A", 10, "Weekend Pass"), Discount("B", 20, "Weekend Pass")
+        self.dm.save_discounts([d1, d2])
+        d1.deactivate()
+        self.dm.save_discounts([d1])
+        self.reopen()
+        loaded = self.dm.load_discounts()
+        self.assertEqual([d.get_name() for d in loaded], ["A"])
+        self.assertFalse(loaded[0].is_active())
+
+    def test_compaction_and_torn_tail(self):
+        self.reopen(compact_every=3)
+        for i in range(5):
+            self.dm.record_sales(f"2025-05-{10 + i}", i + 1)
+        self.assertTrue(os.path.exists(os.path.join(self.TEST_DIR, "snapshot.pkl")))
+        self.dm.close()
+        # Simulate a crash halfway through writing a frame
+        with open(os.path.join(self.TEST_DIR, "journal.log"), "ab") as f:
+            f.write(b"\x00\x00\x01\x00garbage")
+        self.reopen()
+        self.assertEqual(len(self.dm.load_sales()), 5)
+        self.assertEqual(self.dm.load_sales()["2025-05-14"], 5)
+
+    def test_imports_legacy_pickles(self):
+        self.dm.close()
+        shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        DataManager(folder=self.TEST_DIR).save_sales({"2025-05-07": 4})
+        self.dm = JournalDataManager(folder=self.TEST_DIR, fsync=False)
+        self.assertEqual(self.dm.load_sales(), {"2025-05-07": 4})
+
+class TestRecordCodec(unittest.TestCase):
+    @staticmethod
+    def state(obj):
+        # Persisted fields, with nested events and line tuples made comparable
+        state = obj.__getstate__()
+        for key, value in state.items():
+            if isinstance(value, Event):
+                state[key] = value.__getstate__()
+            elif key.endswith("__lines") or key.endswith("__reservation_ids"):
+                state[key] = [tuple(v) if isinstance(v, (list, tuple)) else v for v in value]
+        return state
+
+    def assertRoundTrip(self, schema, items):
+        name, decoded = record_codec.decode(record_codec.encode(schema, items))
+        self.assertEqual(name, schema)
+        rows = record_codec.loads_many(record_codec.dumps_many(items))
+        single = [record_codec.loads(record_codec.dumps(item)) for item in items]
+        for copies in (decoded, rows, single):
+            self.assertEqual([type(c) for c in copies], [type(i) for i in items])
+            self.assertEqual([self.state(c) for c in copies], [self.state(i) for i in items])
+
+    def test_round_trip_every_schema(self):
+        cust = Customer("C", "c@c.com", "pw")
+        event = Event("2025-05-10", "Yas", {"grandstand": 100})
+        reservations = [
+            Reservation(cust.get_id(), [SingleRaceTicket(), GroupTicket(4)], event, "Credit Card"),
+            Reservation(cust.get_id(), [WeekendPass()] * 2, Event("2025-05-11", "Yas"), "Apple Pay", 99.5),
+            Reservation("cid", [SeasonMembership()], event, "Credit Card"),  # non-uuid id
+        ]
+        for r in reservations:
+            cust.add_reservation(r)
+        self.assertRoundTrip("users", [
+            User("U", "u@u.com", "pw"), cust, Admin("A", "a@a.com", "pw", "A1"), Customer("E", "e\0@x", ""),
+        ])
+        self.assertRoundTrip("reservations", reservations)
+        self.assertRoundTrip("tickets", [
+            SingleRaceTicket(), WeekendPass(), GroupTicket(7), SeasonMembership(), Ticket("T", 1.5, 2, ["a"]),
+        ])
+        rule = Discount("Loyal", 10, "Weekend Pass", priority=2, group="loyalty",
+                        starts=datetime(2025, 1, 1), min_quantity=2, customer_ids=[cust.get_id()])
+        rule.deactivate()
+        self.assertRoundTrip("discounts", [Discount("D", "20", "Single Race Ticket"), rule])
+
+        sales = {"2025-05-10": 7, "2025-05-11": 2}
+        self.assertEqual(record_codec.decode(record_codec.encode("sales", sales))[1], list(sales.items()))
+
+        loaded = record_codec.loads(record_codec.dumps(reservations[0]))
+        self.assertEqual(loaded.get_ticket_lines(), reservations[0].get_ticket_lines())
+        self.assertEqual(loaded.get_event().get_capacity(), {"grandstand": 100})
+
+    def test_pickles_still_load(self):
+        cust = Customer("C", "c@c.com", "pw")
+        ledger = SalesLedger()
+        self.assertEqual(record_codec.loads(pickle.dumps(cust)).get_email(), "c@c.com")
+        # Objects without a schema are pickled
+        self.assertEqual(record_codec.dumps(ledger)[:2], pickle.dumps(ledger)[:2])
+        mixed = record_codec.loads_many([record_codec.dumps(cust), pickle.dumps(cust), pickle.dumps(ledger)])
+        self.assertEqual([type(m) for m in mixed], [Customer, Customer, SalesLedger])
+
+        folder = "test_record_codec"
+        shutil.rmtree(folder, ignore_errors=True)
+        shutil.copytree("test_data", folder)
+        try:
+            dm = DataManager(folder=folder)
+            users = dm.load_users()
+            self.assertEqual(dm.migrate(), ["users", "reservations", "discounts", "sales"])
+            with open(os.path.join(folder, "users.pkl"), "rb") as f:
+                self.assertEqual(f.read(2), record_codec.MAGIC)
+            self.assertEqual([self.state(u) for u in dm.load_users()], [self.state(u) for u in users])
+        finally:
+            shutil.rmtree(folder)
+
+    def test_schema_migration(self):
+        payload = record_codec.encode("sales", {"2025-05-10": 7})
+
+        def double_counts(cols, n):
+            return [cols[0], (record_codec.PLAIN, [c * 2 for c in record_codec.values(cols[1], n)])]
+
+        sales = record_codec.SCHEMAS["sales"]
+        with mock.patch.object(sales, "VERSION", 2), mock.patch.object(sales, "MIGRATIONS", {1: double_counts}):
+            self.assertEqual(record_codec.decode(payload)[1], [("2025-05-10", 14)])
+        with mock.patch.object(sales, "VERSION", 0):
+            with self.assertRaises(ValueError):
+                record_codec.decode(payload)
+
+class TestSQLiteDataManager(unittest.TestCase):
+    TEST_DIR = "test_sqlite"
+
+    def setUp(self):
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        self.dm = SQLiteDataManager(folder=self.TEST_DIR)
+
+    def tearDown(self):
+        self.dm.close()
+        shutil.rmtree(self.TEST_DIR)
+
+    def test_compatible_save_load(self):
+        users = [Customer("X", "x@x.com", "pw"), Admin("Y", "y@y.com", "pw", "A1")]
+        self.dm.save_users(users)
+        self.assertEqual([u.get_email() for u in self.dm.load_users()], ["x@x.com", "y@y.com"])
+        self.dm.save_sales({"2025-05-10": 7})
+        self.assertEqual(self.dm.load_sales(), {"2025-05-10": 7})
+
+    def test_indexed_queries(self):
+        cust = Customer("X", "X@Example.com", "pw")
+        self.dm.save_user(cust)
+        self.assertEqual(self.dm.find_user_by_email("x@example.com").get_id(), cust.get_id())
+        self.assertIsNone(self.dm.find_user_by_email("nobody@example.com"))
+
+        ev = Event("2025-05-10", "Yas")
+        for _ in range(3):
+            self.dm.add_reservation(Reservation(cust.get_id(), [SingleRaceTicket()], ev, "card"))
+        self.dm.add_reservation(Reservation("other", [SingleRaceTicket()], Event("2025-05-11", "Yas"), "card"))
+        self.assertEqual(len(self.dm.reservations_for_customer(cust.get_id())), 3)
+        self.assertEqual(len(self.dm.reservations_for_event(ev.get_event_id())), 3)
+        today = datetime.now().strftime("%Y-%m-%d")
+        self.assertEqual(len(self.dm.reservations_between(today, today)), 4)
+
+        self.dm.record_sales("2025-05-09", 1)
+        self.dm.record_sales("2025-05-10", 2)
+        self.dm.record_sales("2025-05-10", 3)
+        self.assertEqual(self.dm.sales_between("2025-05-10", "2025-05-31"), {"2025-05-10": 5})
+
+        tm = TicketManager()
+        self.dm.add_sale_entry(tm.record_sale(2, ticket=WeekendPass(), event=ev, revenue=1500.0))
+        self.assertEqual(self.dm.load_ledger().totals(), tm.get_ledger().totals())
+
+    def test_paged_reservations(self):
+        ev = Event("2025-01-01", "X")
+        reservations = [Reservation("c", [SingleRaceTicket()], ev, "card") for _ in range(7)]
+        self.dm.save_reservations(reservations)
+        ids = [r.get_reservation_id() for r in reservations]
+        self.assertEqual([r.get_reservation_id() for r in self.dm.iter_reservations(batch_size=3)], ids)
+        self.assertEqual([r.get_reservation_id() for r in self.dm.page_reservations(2, 3)], ids[2:5])
+        self.assertEqual(self.dm.count_reservations(), 7)
+
+    def test_migrate_pickles(self):
+        src = os.path.join(self.TEST_DIR, "pickles")
+        os.mkdir(src)
+        legacy = DataManager(folder=src)
+        legacy.save_users([Customer("X", "x@x.com", "pw")])
+        legacy.save_discounts([Discount("D", 20, "Weekend Pass")])
+        legacy.save_sales({"2025-05-07": 3})
+        migrated = migrate_pickles(src, self.TEST_DIR, filename="migrated.db")
+        self.assertEqual(migrated.find_user_by_email("x@x.com").get_name(), "X")
+        self.assertEqual(migrated.get_active_discounts()[0].get_name(), "D")
+        self.assertEqual(migrated.load_sales(), {"2025-05-07": 3})
+        migrated.close()
+
+class TestBookingService(unittest.TestCase):
+    TEST_DIR = "test_booking"
+
+    def setUp(self):
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        self.dm = DataManager(folder=self.TEST_DIR)
+        self.tm = TicketManager()
+        self.tm.register_ticket(SingleRaceTicket())
+        self.tm.register_ticket(WeekendPass())
+        self.tm.add_discount(Discount("Weekend Promo", 20, "Weekend Pass"))
+        self.service = BookingService(self.tm, self.dm)
+        self.cust = Customer("Bob", "bob@example.com", "pw")
+        self.ev1 = Event("2025-05-10", "Yas")
+        self.ev2 = Event("2025-05-11", "Yas")
+
+    def tearDown(self):
+        shutil.rmtree(self.TEST_DIR)
+
+    def test_reserve_batch(self):
+        reservations = self.service.reserve_batch(self.cust, [
+            (self.ev1, "Weekend Pass", 4),
+            (self.ev2, self.tm.get_ticket_by_name("Single Race Ticket"), 2),
+        ], "Credit Card")
+        self.assertEqual([r.get_total_cost() for r in reservations], [2400.0, 600.0])
+        self.assertEqual(len(reservations[0].get_tickets()), 4)
+        self.assertEqual(len(self.cust.get_reservations()), 2)
+
+        self.assertEqual(len(self.dm.load_reservations()), 2)
+        self.assertEqual(len(self.dm.load_users()[0].get_reservations()), 2)
+        self.assertEqual(sum(self.dm.load_sales().values()), 6)
+        self.assertEqual(self.dm.load_ledger().totals()["revenue"], 3000.0)
+        self.assertEqual(self.tm.get_ledger().totals()["tickets"], 6)
+
+        data = self.service.dashboard()
+        self.assertEqual(data["by_payment_method"], {"Credit Card": {"tickets": 6, "revenue": 3000.0}})
+        self.assertEqual(data["by_discount"]["Weekend Promo"], {"tickets": 4, "revenue": 2400.0})
+        self.assertEqual(self.dm.load_ledger().dashboard()["by_discount"], self.tm.get_ledger().dashboard()["by_discount"])
+
+    def test_dashboard_keeps_legacy_daily_counts(self):
+        # Counts from a sales.pkl written before the ledger existed
+        self.tm.set_sales_log({"2025-05-07": 2})
+        data = self.service.dashboard()
+        self.assertEqual(data["tickets"], 2)
+        self.assertEqual(data["by_day"], [{"date": "2025-05-07", "tickets": 2, "revenue": None}])
+
+        self.service.reserve_batch(self.cust, [(self.ev1, "Single Race Ticket", 1)], "Cash")
+        data = self.service.dashboard()
+        self.assertEqual(data["tickets"], 3)
+        self.assertEqual([d["date"] for d in data["by_day"]],
+                         [d["date"] for d in self.service.sales_report()["days"]])
+        self.assertEqual(data["by_day"][-1]["revenue"], 300.0)
+
+    def test_invalid_batch_changes_nothing(self):
+        with self.assertRaises(ValueError):
+            self.service.reserve_batch(self.cust, [
+                (self.ev1, "Weekend Pass", 1),
+                (self.ev1, "No Such Ticket", 1),
+            ], "Credit Card")
+        with self.assertRaises(ValueError):
+            self.service.reserve_batch(self.cust, [(self.ev1, "Weekend Pass", 0)], "Credit Card")
+        self.assertEqual(self.cust.get_reservations(), [])
+        self.assertEqual(self.dm.load_reservations(), [])
+        self.assertEqual(self.tm.get_sales_report(), {})
+
+    def test_failed_write_leaves_sales_alone(self):
+        self.service.reserve_batch(self.cust, [(self.ev1, "Single Race Ticket", 1)], "Cash")
+        before = self.tm.get_ledger().totals()
+        with mock.patch.object(self.dm, "add_reservation", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.service.reserve_batch(self.cust, [(self.ev1, "Weekend Pass", 2)], "Cash")
+        self.assertEqual(self.tm.get_ledger().totals(), before)
+        self.assertEqual(len(self.tm.get_ledger()), 1)
+        self.assertEqual(sum(self.tm.get_sales_report().values()), 1)
+        self.assertEqual(len(self.cust.get_reservations()), 1)
+        self.assertEqual(self.dm.load_ledger().totals(), before)
+
+    def test_transaction_buffers_writes(self):
+        with self.assertRaises(RuntimeError):
+            with self.dm.transaction():
+                self.dm.save_user(self.cust)
+                self.assertEqual(len(self.dm.load_users()), 1)
+                self.assertFalse(os.path.exists(os.path.join(self.TEST_DIR, "users.pkl")))
+                raise RuntimeError("abort")
+        self.assertEqual(self.dm.load_users(), [])
+
+    def test_reservations_page(self):
+        self.dm.save_user(self.cust)
+        for i in range(12):
+            payment = "Cash" if i % 4 == 0 else "Credit Card"
+            self.service.reserve_batch(self.cust, [(self.ev2 if i % 2 else self.ev1, "Single Race Ticket", 1 + i % 3)],
+                                       payment)
+        ids = self.cust.get_reservation_ids()
+        # A reloaded customer fetches only the page it shows
+        cust = self.dm.load_users()[0]
+        page = self.service.reservations_page(cust, 0, 5)
+        self.assertEqual(page["total"], 12)
+        self.assertEqual([r["reservation_id"] for r in page["reservations"]], ids[::-1][:5])
+        self.assertEqual(len(cust.get_loaded_reservations()), 5)
+        page = self.service.reservations_page(cust, 10, 5, sort="oldest")
+        self.assertEqual([r["reservation_id"] for r in page["reservations"]], ids[10:])
+
+        page = self.service.reservations_page(cust, 0, 10, sort="total", query="cash")
+        self.assertEqual(page["total"], 3)
+        totals = [r["total_cost"] for r in page["reservations"]]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+        dates = [r["date"] for r in self.service.reservations_page(cust, 0, 12, sort="event date")["reservations"]]
+        self.assertEqual(dates, ["2025-05-10"] * 6 + ["2025-05-11"] * 6)
+        with self.assertRaises(ValueError):
+            self.service.reservations_page(cust, 0, 5, sort="price")
+
+class TestSeatInventory(unittest.TestCase):
+    def setUp(self):
+        self.inv = SeatInventory(stripes=4)
+        self.ev = Event("2025-05-10", "Yas", capacity={"standard": 10, "vip": 2})
+        self.inv.add_event(self.ev)
+        self.eid = self.ev.get_event_id()
+
+    def test_seats_for_ticket(self):
+        self.assertEqual(seats_for_ticket(SingleRaceTicket(), 3), {"standard": 3})
+        self.assertEqual(seats_for_ticket(GroupTicket(4), 2), {"standard": 8})
+        self.assertEqual(seats_for_ticket(SeasonMembership()), {"vip": 1, "paddock": 1})
+
+    def test_hold_release_confirm(self):
+        hold = self.inv.hold(self.eid, {"standard": 4, "vip": 2})
+        self.assertEqual(self.inv.available(self.eid, "standard"), 6)
+        self.assertTrue(self.inv.is_sold_out(self.eid, "vip"))
+        # All-or-nothing: the standard seats are not taken either
+        with self.assertRaises(SoldOutError):
+            self.inv.hold(self.eid, {"standard": 1, "vip": 1})
+        self.assertEqual(self.inv.available(self.eid, "standard"), 6)
+        self.inv.release(hold)
+        self.assertEqual(self.inv.available(self.eid, "vip"), 2)
+        self.inv.confirm(self.inv.hold(self.eid, {"vip": 1}))
+        self.assertEqual(self.inv.available(self.eid, "vip"), 1)
+        # Tiers without a capacity are unlimited
+        self.inv.purchase(self.eid, {"paddock": 50})
+        self.assertIsNone(self.inv.available(self.eid, "paddock"))
+
+    def test_expired_holds_are_released(self):
+        self.inv.hold(self.eid, {"standard": 10}, ttl=0)
+        self.assertEqual(self.inv.expire_holds(), 1)
+        self.assertEqual(self.inv.available(self.eid, "standard"), 10)
+
+    def test_abandoned_holds_expire_on_their_own(self):
+        # No release() or expire_holds(): the next look at the event reaps them
+        stale = self.inv.hold(self.eid, {"standard": 10}, ttl=0)
+        self.assertEqual(self.inv.available(self.eid, "standard"), 10)
+        self.inv.hold(self.eid, {"vip": 2}, ttl=0)
+        self.inv.purchase(self.eid, {"vip": 2})
+        self.assertTrue(self.inv.is_sold_out(self.eid, "vip"))
+        with self.assertRaises(KeyError):
+            self.inv.confirm(stale)
+        live = self.inv.hold(self.eid, {"standard": 4})
+        self.assertEqual(self.inv.available(self.eid, "standard"), 6)
+        self.inv.confirm(live)
+        self.assertEqual(self.inv.expire_holds(), 0)
+
+    def test_extend_keeps_a_hold_alive(self):
+        hold = self.inv.hold(self.eid, {"standard": 4}, ttl=0)
+        with self.assertRaises(KeyError):
+            self.inv.extend(hold)
+        hold = self.inv.hold(self.eid, {"standard": 4}, ttl=60)
+        self.inv.extend(hold, ttl=120)
+        self.assertEqual(self.inv.expire_holds(now=time.monotonic() + 90), 0)
+        self.inv.confirm(hold)
+        self.assertEqual(self.inv.available(self.eid, "standard"), 6)
+
+    def test_concurrent_purchases_never_oversell(self):
+        import threading
+        inv = SeatInventory()
+        inv.set_capacity("ev", "standard", 100)
+        sold = []
+
+        def buyer():
+            for _ in range(10):
+                try:
+                    inv.purchase("ev", {"standard": 1})
+                    sold.append(1)
+                except SoldOutError:
+                    pass
+
+        threads = [threading.Thread(target=buyer) for _ in range(32)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(sold), 100)
+        self.assertEqual(inv.available("ev", "standard"), 0)
+
+    def test_reserve_batch_rejects_sold_out_tier(self):
+        folder = "test_seats"
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+        os.mkdir(folder)
+        try:
+            dm = DataManager(folder=folder)
+            tm = TicketManager()
+            tm.register_ticket(SingleRaceTicket())
+            tm.set_seat_inventory(self.inv)
+            cust = Customer("Bob", "bob@example.com", "pw")
+            service = BookingService(tm, dm)
+            service.reserve_batch(cust, [(self.ev, "Single Race Ticket", 8)], "Credit Card")
+            with self.assertRaises(SoldOutError):
+                service.reserve_batch(cust, [(self.ev, "Single Race Ticket", 3)], "Credit Card")
+            self.assertEqual(self.inv.available(self.eid, "standard"), 2)
+            self.assertEqual(len(dm.load_reservations()), 1)
+
+            # A hold that lapsed before the commit fails the order unsaved
+            hold = self.inv.hold
+            with mock.patch.object(self.inv, "hold", lambda event_id, seats: hold(event_id, seats, ttl=0)):
+                with self.assertRaises(KeyError):
+                    service.reserve_batch(cust, [(self.ev, "Single Race Ticket", 1)], "Credit Card")
+            self.assertEqual(self.inv.available(self.eid, "standard"), 2)
+            self.assertEqual(len(dm.load_reservations()), 1)
+
+            # One that lapses after the commit still takes the seats
+            def lapsed(hold_id):
+                self.inv.release(hold_id)
+                raise KeyError(hold_id)
+            with mock.patch.object(self.inv, "confirm", side_effect=lapsed):
+                service.reserve_batch(cust, [(self.ev, "Single Race Ticket", 1)], "Credit Card")
+            self.assertEqual(self.inv.available(self.eid, "standard"), 1)
+            self.assertEqual(len(dm.load_reservations()), 2)
+            service.reserve_batch(cust, [(self.ev, "Single Race Ticket", 1)], "Credit Card")
+
+            # A fresh inventory seeded from stored reservations agrees
+            rebuilt = SeatInventory()
+            rebuilt.add_event(self.ev)
+            rebuilt.add_reservations(dm.iter_reservations())
+            self.assertEqual(rebuilt.available(self.eid, "standard"), 0)
+        finally:
+            shutil.rmtree(folder)
+
+class TestWriteBehind(unittest.TestCase):
+    TEST_DIR = "test_write_behind"
+
+    def setUp(self):
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        self.store = JournalDataManager(folder=self.TEST_DIR)
+        self.dm = WriteBehindDataManager(self.store)
+
+    def tearDown(self):
+        self.dm.close()
+        shutil.rmtree(self.TEST_DIR)
+
+    def test_writes_are_snapshotted_and_flushed(self):
+        cust = Customer("Ann", "ann@example.com", "pw")
+        self.dm.save_user(cust)
+        cust.set_name("Changed later")
+        self.assertEqual(self.dm.flush(), [])
+        self.assertEqual(self.dm.pending_count(), 0)
+        self.assertEqual(self.dm.load_users()[0].get_name(), "Ann")
+
+    def test_booking_through_write_behind(self):
+        tm = TicketManager()
+        tm.register_ticket(SingleRaceTicket())
+        cust = Customer("Ann", "ann@example.com", "pw")
+        BookingService(tm, self.dm).reserve_batch(
+            cust, [(Event("2025-05-10", "Yas"), "Single Race Ticket", 2)], "Credit Card")
+        self.dm.flush()
+        self.assertEqual(len(self.store.load_reservations()), 1)
+        self.assertEqual(self.store.load_sales()[datetime.now().strftime("%Y-%m-%d")], 2)
+        self.assertEqual(self.store.load_users()[0].get_reservation_ids(),
+                         cust.get_reservation_ids())
+
+    def test_failed_write_is_reported_and_retried(self):
+        self.dm.save_discount(Discount("Promo", 10, "Weekend Pass"))
+        self.dm.submit("broken", [("no_such_method", ())])
+        failures = self.dm.flush()
+        self.assertEqual([f.label for f in failures], ["broken"])
+        # The good write in the same group still went through
+        self.assertEqual(len(self.store.load_discounts()), 1)
+
+        class Root:
+            def __init__(self):
+                self.callbacks = []
+
+            def after(self, ms, fn):
+                self.callbacks.append(fn)
+
+        root, seen, statuses = Root(), [], []
+        self.dm.attach(root, on_status=lambda p, f: statuses.append((p, f)), on_failure=seen.append)
+        root.callbacks.pop(0)()
+        self.assertEqual(statuses, [(0, 1)])
+        self.assertEqual([f.label for f in seen], ["broken"])
+        root.callbacks.pop(0)()
+        self.assertEqual(len(seen), 1)
+
+        self.assertEqual(self.dm.retry_failed(), 1)
+        self.assertEqual(len(self.dm.flush()), 1)
+
+    def test_close_drains_queue(self):
+        for i in range(50):
+            self.dm.save_user(Customer(f"C{i}", f"c{i}@example.com", "pw"))
+        self.assertEqual(self.dm.close(), [])
+        reopened = JournalDataManager(folder=self.TEST_DIR)
+        self.assertEqual(len(reopened.load_users()), 50)
+        reopened.close()
+        with self.assertRaises(RuntimeError):
+            self.dm.save_user(Customer("Late", "late@example.com", "pw"))
+
+class TestBookingServer(unittest.TestCase):
+    TEST_DIR = "test_server"
+
+    def setUp(self):
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        self.dm = JournalDataManager(folder=self.TEST_DIR)
+        tm = TicketManager()
+        tm.register_ticket(SingleRaceTicket())
+        tm.register_ticket(WeekendPass())
+        tm.add_discount(Discount("Weekend Promo", 20, "Weekend Pass"))
+        admin = Admin("Admin", "admin@example.com", "admin123", admin_code="A1")
+        self.event = Event("2025-05-10", "Yas", capacity={"premium": 3})
+        inventory = SeatInventory()
+        inventory.add_event(self.event)
+        tm.set_seat_inventory(inventory)
+        self.service = BookingService(tm, self.dm, registry=UserRegistry([admin]), events=[self.event])
+
+    def tearDown(self):
+        self.dm.close()
+        shutil.rmtree(self.TEST_DIR)
+
+    def test_service_layer(self):
+        cust = self.service.register("Ann", "ann@example.com", "pw")
+        with self.assertRaises(ValueError):
+            self.service.register("Ann again", "ANN@example.com", "pw")
+        with self.assertRaises(ValueError):
+            self.service.login("ann@example.com", "wrong")
+        self.assertIs(self.service.login(" ann@example.com ", "pw"), cust)
+        # Only the case of one's own address changes
+        self.service.update_details(cust, "Ann", "Ann@Example.com", "")
+        self.assertEqual(cust.get_email(), "Ann@Example.com")
+        with self.assertRaises(ValueError):
+            self.service.update_details(cust, "Ann", "ADMIN@example.com", "")
+        self.assertEqual(self.service.quote("Weekend Pass", 2)["total"], 1200.0)
+        self.service.reserve(cust, self.event.get_event_id(), "Weekend Pass", 2, "Credit Card")
+        [summary] = self.service.list_reservations(cust)
+        self.assertEqual(summary["tickets"], [{"ticket": "Weekend Pass", "quantity": 2, "price": 750.0}])
+        report = self.service.sales_report()
+        self.assertEqual(report["revenue"], 1200.0)
+        self.assertEqual(report["days"][0]["tickets"], 2)
+        self.assertFalse(self.service.toggle_discount("Weekend Promo").is_active())
+        self.assertEqual(self.service.quote("Weekend Pass")["unit_price"], 750.0)
+
+    def test_http_round_trip(self):
+        import asyncio
+        import json
+
+        async def call(port, method, path, body=None, token=None):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            data = json.dumps(body).encode() if body is not None else b""
+            head = f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\nConnection: close\r\n"
+            if token:
+                head += f"Authorization: Bearer {token}\r\n"
+            writer.write(head.encode() + b"\r\n" + data)
+            response = await reader.read()
+            writer.close()
+            status_line, _, rest = response.partition(b"\r\n")
+            return int(status_line.split()[1]), json.loads(rest.split(b"\r\n\r\n", 1)[1])
+
+        async def scenario():
+            server = BookingServer(self.service, workers=4)
+            _, port = await server.start("127.0.0.1", 0)
+            try:
+                status, _ = await call(port, "POST", "/register",
+                                       {"name": "Ann", "email": "ann@example.com", "password": "pw"})
+                self.assertEqual(status, 201)
+                status, login = await call(port, "POST", "/login", {"email": "ann@example.com", "password": "pw"})
+                self.assertEqual(status, 200)
+                token = login["token"]
+
+                status, quote = await call(port, "GET", "/quote?ticket=Weekend%20Pass&quantity=2")
+                self.assertEqual(quote["total"], 1200.0)
+                status, _ = await call(port, "POST", "/reservations", {"event_id": self.event.get_event_id()})
+                self.assertEqual(status, 401)
+
+                # Many clients at once; premium only has 3 seats
+                order = {"event_id": self.event.get_event_id(), "ticket": "Weekend Pass",
+                         "quantity": 1, "payment_method": "Credit Card"}
+                results = await asyncio.gather(*[
+                    call(port, "POST", "/reservations", order, token) for _ in range(10)
+                ])
+                self.assertEqual(sorted(s for s, _ in results), [201] * 3 + [400] * 7)
+                status, mine = await call(port, "GET", "/reservations", token=token)
+                self.assertEqual(len(mine), 3)
+
+                status, _ = await call(port, "GET", "/sales-report", token=token)
+                self.assertEqual(status, 403)
+                _, admin = await call(port, "POST", "/login", {"email": "admin@example.com", "password": "admin123"})
+                status, report = await call(port, "GET", "/sales-report", token=admin["token"])
+                self.assertEqual(report["revenue"], 1800.0)
+                status, _ = await call(port, "GET", "/nowhere")
+                self.assertEqual(status, 404)
+
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b"GET /events HTTP/1.1\r\nContent-Length: lots\r\n\r\n")
+                response = await reader.read()
+                writer.close()
+                self.assertTrue(response.startswith(b"HTTP/1.1 400"))
+
+                for items in ([1], "x", [{"event_id": self.event.get_event_id()}, None]):
+                    status, error = await call(port, "POST", "/reservations",
+                                               {"items": items, "payment_method": "Cash"}, token)
+                    self.assertEqual(status, 400)
+                    self.assertIn("items", error["error"])
+
+                # A header line past the stream limit gets an answer, not a dropped task
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b"GET /events HTTP/1.1\r\nX-Big: " + b"a" * 70000 + b"\r\n\r\n")
+                response = await reader.read()
+                writer.close()
+                self.assertTrue(response.startswith(b"HTTP/1.1 431"))
+
+                # Tokens stop working once their time is up
+                with mock.patch("booking_server.time.monotonic", return_value=time.monotonic() + 13 * 3600):
+                    status, _ = await call(port, "GET", "/reservations", token=token)
+                self.assertEqual(status, 401)
+            finally:
+                await server.stop()
+
+        asyncio.run(scenario())
+        self.assertEqual(len(self.dm.load_reservations()), 3)
+
+class TestLoadHarness(unittest.TestCase):
+    def test_small_run_reports_every_operation(self):
+        import load_test
+        result = load_test.run(users=200, customers=4, reservations=2, history=0.5, backend="journal")
+        ops = result["operations"]
+        self.assertEqual(list(ops), ["register", "login", "reserve", "view_reservations"])
+        self.assertEqual(ops["reserve"]["count"], 8)
+        for stats in ops.values():
+            self.assertEqual(stats["errors"], 0)
+            self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+            self.assertGreater(stats["throughput_per_s"], 0)
+            self.assertIsNotNone(stats["peak_memory_bytes"])
+
+class TestBenchmarks(unittest.TestCase):
+    def test_compare_scales_by_calibration(self):
+        import benchmarks
+        baselines = {"a": {"seconds": 1.0, "calibration": 1.0}, "b": {"seconds": 1.0, "calibration": 1.0}}
+        # This machine is twice as slow: "a" kept pace, "b" regressed by 50%
+        results = {"a": {"seconds": 2.0, "calibration": 2.0}, "b": {"seconds": 3.0, "calibration": 2.0},
+                   "new": {"seconds": 1.0, "calibration": 1.0}}
+        rows = {name: (change, regressed) for name, _, _, change, regressed
+                in benchmarks.compare(results, baselines, 0.25)}
+        self.assertEqual(rows, {"a": (0.0, False), "b": (0.5, True)})
+
+        # Sub-microsecond jitter stays under the noise floor
+        tiny = {"t": {"seconds": 1e-7, "calibration": 1.0}}
+        rows = benchmarks.compare({"t": {"seconds": 2e-7, "calibration": 1.0}}, tiny, 0.25)
+        self.assertEqual([r[4] for r in rows], [False])
+        rows = benchmarks.compare({"t": {"seconds": 1e-5, "calibration": 1.0}}, tiny, 0.25)
+        self.assertEqual([r[4] for r in rows], [True])
+
+    def test_every_hot_path_has_a_baseline(self):
+        import benchmarks
+        self.assertEqual(set(benchmarks.build_benchmarks()), set(benchmarks.load_baselines()))
+        result = benchmarks.run(["get_ticket_by_name"], repeat=1, min_time=0.001)
+        self.assertEqual(list(result), ["tm.get_ticket_by_name"])
+        self.assertGreater(result["tm.get_ticket_by_name"]["seconds"], 0)
+
+class TestMetrics(unittest.TestCase):
+    TEST_DIR = "test_metrics"
+
+    def setUp(self):
+        import metrics
+        self.metrics = metrics
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        metrics.reset()
+
+    def tearDown(self):
+        self.metrics.disable()
+        self.metrics.stop_dump()
+        self.metrics.reset()
+        shutil.rmtree(self.TEST_DIR)
+
+    def test_disabled_leaves_originals_in_place(self):
+        from journal_storage import JournalDataManager
+        original = DataManager.__dict__["load_users"]
+        journal_add = JournalDataManager.__dict__["add_reservation"]
+        calls = []
+        wrapped = self.metrics.action("gui.test")(lambda: calls.append(1))
+        wrapped()
+        self.metrics.enable()
+        self.assertIsNot(DataManager.__dict__["load_users"], original)
+        self.assertIsNot(JournalDataManager.__dict__["add_reservation"], journal_add)
+        self.metrics.disable()
+        self.assertIs(DataManager.__dict__["load_users"], original)
+        self.assertIs(JournalDataManager.__dict__["add_reservation"], journal_add)
+        self.assertEqual(calls, [1])
+        self.assertEqual(self.metrics.snapshot(), {})
+
+    def test_records_storage_and_pricing(self):
+        self.metrics.enable()
+        dm = DataManager(folder=self.TEST_DIR)
+        dm.save_users([Customer("A", "a@example.com", "pw"), Customer("B", "b@example.com", "pw")])
+        self.assertEqual(len(dm.load_users()), 2)
+        dm.add_reservation(Reservation(str(uuid.uuid4()), [SingleRaceTicket()], Event("2025-05-10", "Yas"), "Cash"))
+        tm = TicketManager()
+        tm.register_ticket(WeekendPass())
+        tm.apply_discount(tm.get_ticket_by_name("Weekend Pass"))
+        self.metrics.action("gui.confirm")(lambda: None)()
+
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap["dm.load.users"]["objects"], 2)
+        self.assertEqual(snap["dm.save.users"]["objects"], 2)
+        self.assertEqual(snap["dm.add.reservation"]["calls"], 1)
+        if os.path.exists(self.metrics._IO_PATH):
+            size = os.path.getsize(os.path.join(self.TEST_DIR, "users.pkl"))
+            self.assertGreaterEqual(snap["dm.save.users"]["bytes_written"], size)
+            self.assertGreaterEqual(snap["dm.load.users"]["bytes_read"], size)
+            self.assertGreater(snap["dm.add.reservation"]["bytes_written"], 0)
+        self.assertEqual(snap["tm.get_ticket_by_name"]["calls"], 1)
+        self.assertEqual(snap["gui.confirm"]["calls"], 1)
+        self.assertEqual(sum(snap["tm.apply_discount"]["buckets"].values()), 1)
+
+        text = self.metrics.to_prometheus(snap)
+        self.assertIn('ticketing_calls_total{op="tm.apply_discount"} 1', text)
+        self.assertIn('ticketing_latency_seconds_bucket{op="gui.confirm",le="+Inf"} 1', text)
+
+        path = os.path.join(self.TEST_DIR, "metrics.json")
+        self.metrics.start_dump(path, interval=60)
+        self.metrics.stop_dump()
+        with open(path) as f:
+            self.assertIn("dm.save.users", json.load(f))
+
+    def test_records_every_backend(self):
+        from journal_storage import JournalDataManager
+        from sqlite_storage import SQLiteDataManager
+        self.metrics.enable()
+        event = Event("2025-05-10", "Yas")
+        for dm in (JournalDataManager(folder=self.TEST_DIR), SQLiteDataManager(folder=self.TEST_DIR)):
+            with dm.transaction():
+                dm.save_user(Customer("A", "a@example.com", "pw"))
+                dm.add_reservation(Reservation(str(uuid.uuid4()), [SingleRaceTicket()], event, "Cash"))
+            self.assertEqual(len(dm.load_reservations()), 1)
+            with self.assertRaises(RuntimeError):
+                with dm.transaction():
+                    raise RuntimeError("rolled back")
+            dm.close()
+
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap["dm.save.user"]["calls"], 2)
+        self.assertEqual(snap["dm.add.reservation"]["calls"], 2)
+        self.assertEqual(snap["dm.load.reservations"]["objects"], 2)
+        self.assertEqual(snap["dm.transaction"]["calls"], 4)
+        self.assertEqual(snap["dm.transaction"]["errors"], 2)
+        if os.path.exists(self.metrics._IO_PATH):
+            self.assertGreater(snap["dm.transaction"]["bytes_written"], 0)
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestAnalytics(unittest.TestCase):
+    TEST_DIR = "test_analytics"
+
+    def setUp(self):
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+        self.dm = DataManager(folder=self.TEST_DIR)
+        self.ev = Event("2025-05-10", "Yas")
+        reservations = []
+        # Three customers: two book in April and again in May, one only in May
+        for cust, month, tickets, total in [("a", 4, [WeekendPass()], 600.0),
+                                            ("a", 5, [SingleRaceTicket()] * 2, 600.0),
+                                            ("b", 4, [SingleRaceTicket()], 300.0),
+                                            ("b", 5, [SingleRaceTicket()], 300.0),
+                                            ("c", 5, [WeekendPass(), SingleRaceTicket()], 1050.0)]:
+            res = Reservation(cust, tickets, self.ev, "Cash", total_cost=total)
+            res._Reservation__reservation_time = datetime(2025, month, 1, 10)
+            reservations.append(res)
+        self.dm.save_reservations(reservations)
+
+    def tearDown(self):
+        shutil.rmtree(self.TEST_DIR)
+
+    def test_aggregates(self):
+        from analytics import ReservationHistory
+        history = ReservationHistory.from_data_manager(self.dm, batch_size=2)
+        self.assertEqual(len(history), 5)
+        self.assertEqual(history.line_count(), 6)
+        self.assertEqual(history.group_by("month"), {"2025-04": 900.0, "2025-05": 1950.0})
+        self.assertEqual(history.group_by("ticket_type", "tickets"),
+                         {"Weekend Pass": 2, "Single Race Ticket": 5})
+        self.assertEqual(history.group_by("event", "reservations"), {self.ev.get_event_id(): 5})
+        # "c" paid 1050 for 750 + 300 listed; the total is split by list price
+        self.assertEqual(history.percentiles("revenue", q=(0, 100)), {0: 300.0, 100: 750.0})
+        self.assertEqual(history.percentiles("price", q=(50,), by="ticket_type"),
+                         {"Weekend Pass": {50: 750.0}, "Single Race Ticket": {50: 300.0}})
+        self.assertEqual(history.repeat_customer_rate(), round(2 / 3, 4))
+
+        curve = history.booking_curve(max_days=40)
+        self.assertEqual(curve["tickets"][9], 5)
+        self.assertEqual(curve["tickets"][39], 2)
+        self.assertEqual(curve["cumulative_share"][10], round(2 / 7, 4))
+
+        cohorts = history.cohort_retention()
+        self.assertEqual(cohorts["cohorts"], ["2025-04", "2025-05"])
+        self.assertEqual(cohorts["sizes"], [2, 1])
+        self.assertEqual(cohorts["retention"], [[1.0, 1.0], [1.0, 0.0]])
+
+    def test_empty_history(self):
+        from analytics import ReservationHistory
+        history = ReservationHistory.from_reservations([])
+        self.assertEqual(len(history), 0)
+        self.assertEqual(history.group_by("day"), {})
+        self.assertEqual(history.repeat_customer_rate(), 0.0)
+        self.assertEqual(history.cohort_retention()["cohorts"], [])
+
+class TestStartup(unittest.TestCase):
+    TEST_DIR = "test_startup"
+
+    def setUp(self):
+        if os.path.exists(self.TEST_DIR):
+            shutil.rmtree(self.TEST_DIR)
+        os.mkdir(self.TEST_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(self.TEST_DIR)
+
+    def test_importing_main_gui_has_no_side_effects(self):
+        import main_gui
+        self.assertIsNone(main_gui.root)
+        self.assertIsNone(main_gui.service)
+
+    def test_seeds_only_on_first_run_and_keeps_toggles(self):
+        from app_setup import ServiceLoader
+        loader = ServiceLoader(lambda: JournalDataManager(folder=self.TEST_DIR, fsync=False))
+        service = loader.wait(timeout=10)
+        dm = service.get_data_manager()
+        discounts = dm.load_discounts()
+        self.assertEqual([d.get_name() for d in discounts], ["Weekend Promo", "Group Saver"])
+        discounts[0].deactivate()
+        dm.save_discounts(discounts)
+        loader.close()
+
+        loader = ServiceLoader(lambda: JournalDataManager(folder=self.TEST_DIR, fsync=False))
+        dm = loader.wait(timeout=10).get_data_manager()
+        self.assertFalse(dm.load_discounts()[0].is_active())
+        self.assertEqual(len([u for u in dm.load_users() if isinstance(u, Admin)]), 1)
+        loader.close()
+
+    def test_group_seats_stay_taken_after_restart(self):
+        from app_setup import build_service
+        import classes
+        dm = DataManager(folder=self.TEST_DIR)
+        service = build_service(dm)
+        event = service.get_events()[0]
+        inventory = service.get_ticket_manager().get_seat_inventory()
+        service.reserve_batch(service.register("G", "g@example.com", "pw"), [
+            (event, "Group Ticket (10)", 3),
+            (event, "Single Race Ticket", 2),
+        ], "Cash")
+        left = inventory.available(event.get_event_id(), "standard")
+        self.assertEqual(left, 5000 - 32)
+
+        # A new process has no group tickets catalogued until one is built
+        with mock.patch.object(classes, "TICKET_CATALOG", classes.TicketCatalog()):
+            group = [r for r in dm.load_reservations()
+                     if r.get_ticket_lines()[0][1] == "Group Ticket (10)"][0]
+            type_id = group.get_ticket_lines()[0][0]
+            self.assertEqual(group.get_tickets()[0].get_features(), [])
+            self.assertIsNone(classes.TICKET_CATALOG.get(type_id))
+
+            rebuilt = build_service(DataManager(folder=self.TEST_DIR))
+            rebuilt_inventory = rebuilt.get_ticket_manager().get_seat_inventory()
+            self.assertEqual(rebuilt_inventory.available(event.get_event_id(), "standard"), left)
+            self.assertEqual(classes.TICKET_CATALOG.get(type_id).get_group_size(), 10)
+
+    def test_group_saver_covers_every_group_size(self):
+        from app_setup import build_service
+        service = build_service(DataManager(folder=self.TEST_DIR))
+        for size in (2, 4, 7, 50):
+            quote = service.quote(f"Group Ticket ({size})")
+            self.assertEqual(quote["discounts"], ["Group Saver"])
+        self.assertEqual(service.quote("Single Race Ticket")["discounts"], [])
+
+        # Stores seeded with the size-4 default are widened on the next start
+        dm = DataManager(folder=os.path.join(self.TEST_DIR, "old"))
+        os.mkdir(os.path.join(self.TEST_DIR, "old"))
+        dm.save_discounts([Discount("Group Saver", 15, "Group Ticket (4)")])
+        service = build_service(dm)
+        self.assertEqual(service.quote("Group Ticket (9)")["discounts"], ["Group Saver"])
+        self.assertEqual(dm.load_discounts()[0].get_ticket_type(), "Group Ticket")
+
+    def test_loader_reraises_load_errors(self):
+        from app_setup import ServiceLoader
+        def broken():
+            raise OSError("disk gone")
+        loader = ServiceLoader(broken)
+        with self.assertRaises(OSError):
+            loader.wait(timeout=10)
+        self.assertTrue(loader.is_ready())
+        loader.close()
+
+
+@unittest.skipIf(PageCache is None, "tkinter is not installed")
+class TestVirtualList(unittest.TestCase):
+    def test_page_cache(self):
+        calls = []
+
+        def source(offset, limit):
+            calls.append(offset)
+            return 250, [(str(i), (i,)) for i in range(offset, min(offset + limit, 250))]
+
+        cache = PageCache(source, page_size=100, max_pages=2)
+        self.assertEqual(cache.total(), 250)
+        self.assertEqual([k for k, _ in cache.rows(95, 10)], [str(i) for i in range(95, 105)])
+        self.assertEqual([k for k, _ in cache.rows(240, 20)], [str(i) for i in range(240, 250)])
+        self.assertEqual(calls, [0, 100, 200])
+        cache.rows(120, 5)  # cached
+        self.assertEqual(calls, [0, 100, 200])
+        cache.rows(0, 5)  # dropped as least recently used
+        self.assertEqual(calls, [0, 100, 200, 0])
+
+        self.assertTrue(cache.update("3", ("three",)))
+        self.assertEqual(cache.rows(3, 1), [("3", ("three",))])
+        self.assertFalse(cache.update("999", ()))
+        cache.clear()
+        self.assertEqual(cache.rows(3, 1), [("3", (3,))])
+
+    def test_filter_discounts(self):
+        promo = Discount("Weekend Promo", 20, "Weekend Pass")
+        saver = Discount("Group Saver", 15, "Group Ticket (4)")
+        early = Discount("Early Bird", 5, "Single Race Ticket")
+        saver.deactivate()
+        discounts = [promo, saver, early]
+        names = lambda found: [d.get_name() for d in found]
+        self.assertEqual(names(filter_discounts(discounts)), ["Weekend Promo", "Early Bird", "Group Saver"])
+        self.assertEqual(names(filter_discounts(discounts, status="Inactive")), ["Group Saver"])
+        self.assertEqual(names(filter_discounts(discounts, query="PASS")), ["Weekend Promo"])
+        self.assertEqual(names(filter_discounts(discounts, sort="percentage", descending=True)),
+                         ["Weekend Promo", "Group Saver", "Early Bird"])
+        self.assertEqual(discount_row(saver)[1:4], ("15%", "Group Ticket (4)", "Inactive"))
+
 
 if __name__ == "__main__":
     unittest.main()
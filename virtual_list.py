@@ -0,0 +1,168 @@
+# virtual_list.py
+# A ttk.Treeview list that stays fast however many rows it has.
+#
+# Only the rows that fit in the view exist as Treeview items; scrolling
+# refills them from a PageCache, which asks the source for one page at a
+# time and keeps the pages used most recently.
+#
+# source(offset, limit) -> (total, rows), each row a (key, values) tuple.
+# The key is the row's Treeview id, used by selected() and update_row().
+
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+PAGE_SIZE = 100
+MAX_PAGES = 8
+
+
+class PageCache:
+    def __init__(self, source, page_size: int = PAGE_SIZE, max_pages: int = MAX_PAGES):
+        self.__source = source
+        self.__page_size = page_size
+        self.__max_pages = max_pages
+        self.__pages = OrderedDict()  # page number -> rows, least recently used first
+        self.__total = None
+
+    def __page(self, number: int) -> list:
+        rows = self.__pages.get(number)
+        if rows is not None:
+            self.__pages.move_to_end(number)
+            return rows
+        self.__total, rows = self.__source(number * self.__page_size, self.__page_size)
+        rows = self.__pages[number] = list(rows)
+        if len(self.__pages) > self.__max_pages:
+            self.__pages.popitem(last=False)
+        return rows
+
+    def total(self) -> int:
+        if self.__total is None:
+            self.__page(0)
+        return self.__total
+
+    def rows(self, offset: int, limit: int) -> list:
+        first = offset // self.__page_size
+        found = []
+        number = first
+        while len(found) < offset - first * self.__page_size + limit:
+            rows = self.__page(number)
+            found += rows
+            if len(rows) < self.__page_size:
+                break
+            number += 1
+        start = offset - first * self.__page_size
+        return found[start:start + limit]
+
+    def update(self, key: str, values) -> bool:
+        # Replace a cached row in place; False if it isn't cached
+        for rows in self.__pages.values():
+            for i, (k, _) in enumerate(rows):
+                if k == key:
+                    rows[i] = (key, values)
+                    return True
+        return False
+
+    def clear(self):
+        self.__pages.clear()
+        self.__total = None
+
+
+class VirtualList(tk.Frame):
+    # columns: [(name, heading, width)]; height: rows shown at once.
+    # on_sort(name) is called when a column heading is clicked.
+    def __init__(self, master, columns: list, source, height: int = 15, on_sort=None):
+        super().__init__(master)
+        self.__height = height
+        self.__offset = 0
+        self.__cache = PageCache(source)
+        self.__tree = ttk.Treeview(self, columns=[c[0] for c in columns], show="headings",
+                                   height=height, selectmode="browse")
+        for name, heading, width in columns:
+            self.__tree.column(name, width=width, anchor="w")
+            if on_sort is not None:
+                self.__tree.heading(name, text=heading, command=lambda n=name: on_sort(n))
+            else:
+                self.__tree.heading(name, text=heading)
+        self.__bar = ttk.Scrollbar(self, orient="vertical", command=self.__scroll)
+        self.__tree.pack(side="left", fill="both", expand=True)
+        self.__bar.pack(side="right", fill="y")
+
+        self.__tree.bind("<MouseWheel>", self.__wheel)
+        self.__tree.bind("<Button-4>", lambda e: self.__step(-3))
+        self.__tree.bind("<Button-5>", lambda e: self.__step(3))
+        self.__tree.bind("<Up>", lambda e: self.__edge(-1))
+        self.__tree.bind("<Down>", lambda e: self.__edge(1))
+        self.__tree.bind("<Prior>", lambda e: self.__step(-height))
+        self.__tree.bind("<Next>", lambda e: self.__step(height))
+        self.__render()
+
+    def get_tree(self) -> ttk.Treeview:
+        return self.__tree
+
+    def total(self) -> int:
+        return self.__cache.total()
+
+    def selected(self):
+        # Key of the selected row, None when nothing (visible) is selected
+        selection = self.__tree.selection()
+        return selection[0] if selection else None
+
+    def refresh(self):
+        # Drop cached pages (e.g. after a sort or filter change) and go to the top
+        self.__cache.clear()
+        self.__offset = 0
+        self.__render()
+
+    def update_row(self, key: str, values):
+        # Redraw one row without refetching anything
+        self.__cache.update(key, values)
+        if self.__tree.exists(key):
+            self.__tree.item(key, values=values)
+
+    def scroll_to(self, offset: int):
+        self.__offset = offset
+        self.__render()
+
+    def __render(self):
+        total = self.__cache.total()
+        self.__offset = max(0, min(self.__offset, total - self.__height))
+        rows = self.__cache.rows(self.__offset, self.__height)
+        selected = self.selected()
+        self.__tree.delete(*self.__tree.get_children())
+        for key, values in rows:
+            self.__tree.insert("", "end", iid=key, values=values)
+        if selected is not None and self.__tree.exists(selected):
+            self.__tree.selection_set(selected)
+            self.__tree.focus(selected)
+        if total:
+            self.__bar.set(self.__offset / total, (self.__offset + len(rows)) / total)
+        else:
+            self.__bar.set(0, 1)
+
+    def __scroll(self, action, amount, unit=None):
+        # Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" | "pages")
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.__cache.total()))
+        else:
+            self.__step(int(amount) * (self.__height if unit == "pages" else 1))
+
+    def __step(self, rows: int):
+        self.scroll_to(self.__offset + rows)
+        return "break"
+
+    def __wheel(self, event):
+        # Windows reports multiples of 120, macOS small steps
+        return self.__step(-3 if event.delta > 0 else 3)
+
+    def __edge(self, direction: int):
+        # Arrow keys past the first or last visible row scroll the list
+        items = self.__tree.get_children()
+        edge = items[-1 if direction > 0 else 0] if items else None
+        if edge is None or self.__tree.focus() != edge:
+            return None
+        self.__step(direction)
+        items = self.__tree.get_children()
+        target = items[-1 if direction > 0 else 0]
+        self.__tree.selection_set(target)
+        self.__tree.focus(target)
+        return "break"
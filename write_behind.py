@@ -0,0 +1,251 @@
+# write_behind.py
+# Write-behind persistence for the GUI.
+#
+# WriteBehindDataManager wraps any DataManager backend. Write calls take a
+# snapshot of their arguments and return at once; a background thread
+# applies them to the real store. Whatever has queued up by the time the
+# worker gets to it is committed in one transaction. Reads go straight to
+# the wrapped store, so they may not yet show writes that are still queued
+# (call flush() first when that matters).
+#
+# Tk is not thread safe, so the worker never touches widgets. attach(root)
+# polls for finished writes with root.after and reports pending and failed
+# writes on the Tk thread.
+
+import queue
+import threading
+from contextlib import contextmanager
+
+import record_codec
+
+_STOP = object()
+
+
+def _snapshot(value):
+    # Domain objects keep changing on the Tk thread after a write is queued,
+    # so the worker gets a copy taken at call time
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    if isinstance(value, list):
+        return record_codec.loads_many(record_codec.dumps_many(value))
+    return record_codec.loads(record_codec.dumps(value))
+
+
+class WriteFailure:
+    __slots__ = ("label", "ops", "error")
+
+    def __init__(self, label: str, ops: list, error: Exception):
+        self.label = label
+        self.ops = ops
+        self.error = error
+
+
+class WriteBehindDataManager:
+    def __init__(self, dm, max_batch: int = 500):
+        self.__dm = dm
+        self.__max_batch = max_batch
+        self.__queue = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__pending = 0
+        self.__failed = []  # WriteFailure, oldest first
+        self.__reported = 0  # failures already passed to the failure callback
+        self.__batch = None  # ops collected by an open transaction()
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__run, name="write-behind", daemon=True)
+        self.__thread.start()
+
+    def __getattr__(self, name):
+        # Reads and anything else go to the wrapped store
+        if name.startswith("_WriteBehindDataManager__"):
+            raise AttributeError(name)
+        return getattr(self.__dm, name)
+
+    def get_store(self):
+        return self.__dm
+
+    # ----------------------------
+    # Queueing
+    # ----------------------------
+
+    def __write(self, method: str, args: tuple):
+        op = (method, tuple(_snapshot(a) for a in args))
+        if self.__batch is not None:
+            self.__batch.append(op)
+        else:
+            self.submit(method, [op])
+
+    def submit(self, label: str, ops: list):
+        # ops: [(DataManager method name, args), ...], applied in one transaction
+        if self.__closed:
+            raise RuntimeError("Write-behind store is closed.")
+        with self.__lock:
+            self.__pending += 1
+        self.__queue.put((label, ops))
+
+    @contextmanager
+    def transaction(self):
+        # Everything written inside the block is queued as one unit
+        if self.__batch is not None:
+            yield self
+            return
+        self.__batch = []
+        try:
+            yield self
+        except BaseException:
+            self.__batch = None
+            raise
+        ops, self.__batch = self.__batch, None
+        if ops:
+            self.submit(", ".join(dict.fromkeys(m for m, _ in ops)), ops)
+
+    # ----------------------------
+    # DataManager write API (queued)
+    # ----------------------------
+
+    def save_users(self, users: list):
+        self.__write("save_users", (users,))
+
+    def save_reservations(self, reservations: list):
+        self.__write("save_reservations", (reservations,))
+
+    def save_discounts(self, discounts: list):
+        self.__write("save_discounts", (discounts,))
+
+    def save_sales(self, sales: dict):
+        self.__write("save_sales", (sales,))
+
+    def save_ledger(self, ledger):
+        self.__write("save_ledger", (ledger,))
+
+    def save_user(self, user):
+        self.__write("save_user", (user,))
+
+    def delete_user(self, user_id: str):
+        self.__write("delete_user", (user_id,))
+
+    def add_reservation(self, reservation):
+        self.__write("add_reservation", (reservation,))
+
+    def delete_reservation(self, res_id: str):
+        self.__write("delete_reservation", (res_id,))
+
+    def save_discount(self, discount):
+        self.__write("save_discount", (discount,))
+
+    def record_sales(self, date_str: str, quantity: int = 1):
+        self.__write("record_sales", (date_str, quantity))
+
+    def add_sale_entry(self, entry: tuple):
+        self.__write("add_sale_entry", (entry,))
+
+    # ----------------------------
+    # Worker thread
+    # ----------------------------
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            if item is _STOP:
+                self.__queue.task_done()
+                return
+            tasks = [item]
+            stop = False
+            # Group commit: take whatever else is already waiting
+            while len(tasks) < self.__max_batch:
+                try:
+                    item = self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                tasks.append(item)
+            self.__apply(tasks)
+            for _ in tasks:
+                self.__queue.task_done()
+            if stop:
+                self.__queue.task_done()
+                return
+
+    def __apply(self, tasks: list):
+        try:
+            with self.__dm.transaction():
+                for _, ops in tasks:
+                    self.__apply_ops(ops)
+            failures = []
+        except Exception:
+            # Nothing from the group was committed; redo each task on its own
+            # so one bad write does not take the others down with it
+            failures = []
+            for label, ops in tasks:
+                try:
+                    with self.__dm.transaction():
+                        self.__apply_ops(ops)
+                except Exception as e:
+                    failures.append(WriteFailure(label, ops, e))
+        with self.__lock:
+            self.__pending -= len(tasks)
+            self.__failed.extend(failures)
+
+    def __apply_ops(self, ops: list):
+        for method, args in ops:
+            getattr(self.__dm, method)(*args)
+
+    # ----------------------------
+    # Status
+    # ----------------------------
+
+    def pending_count(self) -> int:
+        with self.__lock:
+            return self.__pending
+
+    def get_failures(self) -> list:
+        with self.__lock:
+            return list(self.__failed)
+
+    def retry_failed(self) -> int:
+        with self.__lock:
+            failed, self.__failed = self.__failed, []
+            self.__reported = 0
+        for failure in failed:
+            self.submit(failure.label, failure.ops)
+        return len(failed)
+
+    def flush(self):
+        # Block until every queued write has been applied (or has failed)
+        self.__queue.join()
+        return self.get_failures()
+
+    def close(self) -> list:
+        # Durable shutdown: drain the queue, stop the worker and close the
+        # wrapped store. Returns the writes that could not be applied.
+        if not self.__closed:
+            self.__closed = True
+            self.__queue.put(_STOP)
+            self.__thread.join()
+            if hasattr(self.__dm, "close"):
+                self.__dm.close()
+        return self.get_failures()
+
+    def attach(self, root, on_status=None, on_failure=None, interval_ms: int = 100):
+        # Poll from the Tk event loop. on_status(pending, failed) runs when
+        # either count changes; on_failure(WriteFailure) once per new failure.
+        last = [None]
+
+        def poll():
+            with self.__lock:
+                status = (self.__pending, len(self.__failed))
+                new_failures = self.__failed[self.__reported:]
+                self.__reported = len(self.__failed)
+            if status != last[0]:
+                last[0] = status
+                if on_status is not None:
+                    on_status(*status)
+            if on_failure is not None:
+                for failure in new_failures:
+                    on_failure(failure)
+            if not self.__closed:
+                root.after(interval_ms, poll)
+
+        root.after(interval_ms, poll)
+